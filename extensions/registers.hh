@@ -32,6 +32,9 @@
  * define custom register names and its addresses
  */
 
+#ifndef __REGISTERS_HH__
+#define __REGISTERS_HH__
+
 #include <cstdint>
 
 #define c0 0x800
@@ -39,3 +42,5 @@
 
 uint32_t READ_CUSTOM_REG(uint32_t reg);
 void WRITE_CUSTOM_REG(uint32_t reg, uint32_t val);
+
+#endif // __REGISTERS_HH__
@@ -32,9 +32,19 @@ import argparse
 import ConfigParser
 import logging
 import logging.handlers
+import multiprocessing
 import os
 import shutil
+import socket
+import sys
+from modelparsing.allocator import lockpath
 from modelparsing.parser import Parser
+from modelparsing.profiler import Profiler
+from modelparsing.output import makedirs, write_if_changed
+from modelparsing.server import SOCKET_NAME, TARGETS, ParseServer, \
+    request
+from modelparsing.validator import Validator
+from modelparsing.watcher import Watcher
 
 # get root logger
 root_logger = logging.getLogger()
@@ -76,24 +86,59 @@ class ModelParser():
             os.path.dirname(os.path.realpath(__file__)), '../config.ini')
         config.read(conffile)
 
-        self.modelpath = os.path.expanduser(config.get("DEFAULT", "MODELPATH"))
+        # several model roots are separated like in PATH
+        self.modelpath = [
+            os.path.expanduser(path)
+            for path in config.get("DEFAULT", "MODELPATH").split(os.pathsep)
+            if path]
         self.tcpath = os.path.expanduser(config.get("DEFAULT", "TOOLCHAIN"))
 
         assert(self.modelpath)
         assert(self.tcpath)
 
     def parse(self):
-        modelparser = Parser(self.tcpath, self.modelpath)
-
         buildpath = os.path.join(
             os.path.dirname(os.path.realpath(__file__)), '../build')
 
-        if not os.path.exists(buildpath):
-            os.makedirs(buildpath)
+        if self.request(os.path.join(buildpath, SOCKET_NAME)):
+            return
+
+        # encodings are allocated, once a lock file was created
+        locked = lockpath(self.modelpath)
+        modelparser = Parser(self.tcpath,
+                             self.modelpath,
+                             os.path.join(buildpath, 'cache'),
+                             depspath=os.path.join(buildpath, 'deps.json'),
+                             lockpath=locked if os.path.exists(locked)
+                             else None)
+
+        makedirs(buildpath)
 
         modelparser.parse_models()
-        modelparser.extend_compiler()
-        modelparser.extend_gem5()
+        modelparser.save_bundle(os.path.join(buildpath, 'bundle.json'))
+        modelparser.extend()
+
+    def request(self, sockpath):
+        '''
+        Let a running parse server bring the artifacts up to date.
+        Returns False, if the artifacts have to be generated in process.
+        '''
+        try:
+            answer = request(sockpath, 'parse',
+                             modelpath=self.modelpath,
+                             toolchain=self.tcpath,
+                             targets=TARGETS)
+        except socket.error as e:
+            logger.info('No parse server: {}'.format(e))
+            return False
+
+        if answer['status'] != 'ok':
+            logger.warn('Parse server failed: {}'.format(answer['error']))
+            return False
+
+        logger.info('Artifacts from parse server, changed: {}'.format(
+            answer['changed']))
+        return True
 
 
 def main():
@@ -107,24 +152,81 @@ def main():
         description='Parse reference implementations of custom extension ' +
         'models.')
 
+    parser.add_argument('-a',
+                        '--allocate',
+                        nargs='?',
+                        const='',
+                        metavar='LOCKFILE',
+                        help='If set, models may omit opc, funct3 and ' +
+                        'funct7 and free encodings are assigned to them. ' +
+                        'The assignments are kept in the lock file, ' +
+                        'which defaults to opcodes.lock in the first ' +
+                        'model path.')
     parser.add_argument('-b',
                         '--build',
                         action='store_true',
                         help='If set, the toolchain and Gem5 will be ' +
                         'rebuild.')
+    parser.add_argument('-f',
+                        '--fast-scan',
+                        action='store_true',
+                        help='If set, models are scanned without ' +
+                        'libclang, if they match the model format. ' +
+                        'Their diagnostics are only checked with --strict.')
+    parser.add_argument('--from-bundle',
+                        action='store_true',
+                        help='If set, the models are restored from the ' +
+                        'bundle of a previous run instead of parsing them.')
+    parser.add_argument('-j',
+                        '--jobs',
+                        type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='Number of models, that are parsed in ' +
+                        'parallel. Defaults to the number of cores.')
     parser.add_argument('-m',
                         '--modelpath',
                         type=str,
-                        default=os.path.join(
+                        nargs='+',
+                        default=[os.path.join(
                             os.path.dirname(__file__),
-                            '../extensions'),
-                        help='Path to model definition. ' +
-                        'Can be a folder or a single file.')
+                            '../extensions')],
+                        help='Paths to model definitions. ' +
+                        'Each can be a folder or a single file. ' +
+                        'A folder with a models.manifest only uses the ' +
+                        'listed files, a .modelignore excludes files.')
+    parser.add_argument('--no-cache',
+                        action='store_true',
+                        help='If set, all models are parsed again ' +
+                        'instead of restoring them from the cache.')
+    parser.add_argument('--profile',
+                        action='store_true',
+                        help='If set, the wall and cpu times of all ' +
+                        'stages and models are written to ' +
+                        'build/profile.json.')
+    parser.add_argument('--profile-trace',
+                        action='store_true',
+                        help='If set, the timings are also written as ' +
+                        'Chrome trace events to build/profile-trace.json.')
+    parser.add_argument('--profile-cprofile',
+                        action='store_true',
+                        help='If set, all function calls are profiled ' +
+                        'with cProfile and dumped to build/profile.prof.')
     parser.add_argument('-r',
                         '--restore',
                         action='store_true',
                         help='If set, the toolchain will be restored ' +
                         'to its default.')
+    parser.add_argument('--serve',
+                        action='store_true',
+                        help='If set, the parser keeps running and ' +
+                        'regenerates the artifacts on request of the ' +
+                        'SConscript on the socket build/' + SOCKET_NAME +
+                        '.')
+    parser.add_argument('-s',
+                        '--strict',
+                        action='store_true',
+                        help='If set, models are additionally ' +
+                        'compiled with g++.')
     parser.add_argument('-t',
                         '--toolchain',
                         default=os.path.abspath(
@@ -135,6 +237,20 @@ def main():
     parser.add_argument('--gem5-only',
                         action='store_true',
                         help='If set, only gem5 is extended')
+    parser.add_argument('-w',
+                        '--watch',
+                        action='store_true',
+                        help='If set, the parser keeps running and ' +
+                        'regenerates the artifacts, whenever a model ' +
+                        'or register file changes.')
+    parser.add_argument('--validate',
+                        nargs='?',
+                        const='text',
+                        choices=['text', 'json'],
+                        help='If set, all models, encodings and registers ' +
+                        'are only checked and every problem is reported ' +
+                        'as text or json. The json report is also ' +
+                        'written to build/validation.json.')
     parser.add_argument('-v',
                         '--verbose',
                         default=3,
@@ -144,11 +260,41 @@ def main():
     args = parser.parse_args()
     set_log_level_from_verbose(args)
 
-    logger.info('Start parsing models')
-    modelparser = Parser(args.toolchain, args.modelpath)
-
     buildpath = os.path.join(
         os.path.dirname(os.path.realpath(__file__)), '../build')
+    cachepath = None if args.no_cache else os.path.join(buildpath, 'cache')
+    locked = None
+    if args.allocate is not None:
+        locked = args.allocate or lockpath(args.modelpath)
+
+    if args.validate:
+        validator = Validator(args.modelpath, args.strict, lockpath=locked)
+        validator.validate()
+        write_if_changed(os.path.join(buildpath, 'validation.json'),
+                         validator.report_json())
+        if args.validate == 'json':
+            sys.stdout.write(validator.report_json())
+        else:
+            sys.stdout.write(validator.report())
+        sys.exit(1 if validator.errors else 0)
+
+    # the stages are only recorded, if a profile is written
+    profiler = None
+    if args.profile or args.profile_trace or args.profile_cprofile:
+        profiler = Profiler()
+    if args.profile_cprofile:
+        profiler.enable_cprofile()
+
+    logger.info('Start parsing models')
+    modelparser = Parser(args.toolchain,
+                         args.modelpath,
+                         cachepath,
+                         args.jobs,
+                         args.strict,
+                         args.fast_scan,
+                         profiler,
+                         os.path.join(buildpath, 'deps.json'),
+                         locked)
 
     if args.restore:
         if os.path.exists(buildpath):
@@ -159,20 +305,54 @@ def main():
                 logger.error("Error: %s - %s" % (e.filename, e.strerror))
         modelparser.restore()
     else:
-        if not os.path.exists(buildpath):
-            os.makedirs(buildpath)
+        makedirs(buildpath)
 
-        modelparser.parse_models()
+        bundlepath = os.path.join(buildpath, 'bundle.json')
+
+        def regenerate(modelparser):
+            modelparser.parse_models()
+            modelparser.save_bundle(bundlepath)
+            extend(modelparser)
 
-        if not args.gem5_only:
-            # extend compiler with models
-            modelparser.extend_compiler()
-        if not args.tc_only:
-            # extend gem5
-            modelparser.extend_gem5()
+        def extend(modelparser):
+            # extend compiler and gem5 with models at the same time
+            modelparser.extend(compiler=not args.gem5_only,
+                               gem5=not args.tc_only)
+
+        if args.watch:
+            # parsed models and libclang are kept between the changes
+            Watcher(modelparser, regenerate).run()
+        elif args.serve:
+            # the artifacts of extend
+            targets = [target for (target, skip) in
+                       zip(TARGETS, [args.gem5_only, args.tc_only])
+                       if not skip]
+            ParseServer(modelparser, regenerate,
+                        os.path.join(buildpath, SOCKET_NAME),
+                        update=extend, targets=targets).serve()
+        else:
+            bundled = False
+            if args.from_bundle:
+                try:
+                    modelparser.load_bundle(bundlepath)
+                    bundled = True
+                except ValueError as e:
+                    logger.warn('Bundle not used: {}'.format(e))
+
+            if bundled:
+                extend(modelparser)
+            else:
+                regenerate(modelparser)
 
     # modelparser.remove_models()
 
+    if profiler is not None:
+        profiler.write_json(os.path.join(buildpath, 'profile.json'))
+    if args.profile_trace:
+        profiler.write_trace(os.path.join(buildpath, 'profile-trace.json'))
+    if args.profile_cprofile:
+        profiler.write_cprofile(os.path.join(buildpath, 'profile.prof'))
+
 
 def set_log_level_from_verbose(args):
     if not args.verbose:
@@ -0,0 +1,230 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+import json
+import logging
+import os
+
+from discovery import modelpaths
+from exceptions import OpcodeError
+from model import OPCODES, Model
+from output import read_file, write_if_changed
+
+logger = logging.getLogger(__name__)
+
+# lock file of the assigned encodings in the first model root
+LOCKFILE = 'opcodes.lock'
+# format of the lock file, other versions are not used
+LOCK_VERSION = 1
+# all funct7 values of a funct3 slot, taken by an I-Type instruction
+FULL = (1 << 128) - 1
+
+
+def lockpath(modelpath):
+    '''
+    Default lock file of one or more model roots.
+    '''
+    root = modelpaths(modelpath)[0]
+    if not os.path.isdir(root):
+        root = os.path.dirname(root)
+    return os.path.join(root, LOCKFILE)
+
+
+class Allocator:
+    '''
+    Assigns free encodings of the custom opcodes to models, that omit opc,
+    funct3 or funct7. The occupancy is kept per opcode and funct3 as a
+    bitmap of the used funct7 values. Instructions of the same model file
+    are packed under a shared opcode and funct3, so that the decoder stays
+    shallow. The assignments are recorded in a lock file and reused, so
+    that they do not move between runs.
+    '''
+
+    def __init__(self, path=None):
+        self._path = os.path.abspath(path) if path else None
+        self._assigned = {}
+        self._locked = {}
+        self._slots = {}
+
+        content = read_file(self._path) if self._path else None
+        if content is not None:
+            try:
+                lock = json.loads(content)
+                if lock.get('version') == LOCK_VERSION:
+                    self._locked = lock['instructions']
+                else:
+                    logger.warn('Lock file {} has another version'.format(
+                        self._path))
+            except (ValueError, KeyError, AttributeError) as e:
+                logger.warn('Lock file {} not used: {}'.format(
+                    self._path, e))
+
+    def free(self, form, opc, funct3, funct7=None):
+        '''
+        Check whether an encoding is not taken yet.
+        '''
+        used = self._slots.get((opc, funct3), 0)
+        if form == 'I':
+            return used == 0
+        return not used & (1 << funct7)
+
+    def occupy(self, form, opc, funct3, funct7=None):
+        slot = (opc, funct3)
+        if form == 'I':
+            self._slots[slot] = FULL
+        else:
+            self._slots[slot] = self._slots.get(slot, 0) | (1 << funct7)
+
+    def matches(self, model, encoding):
+        '''
+        Check whether a locked encoding fits the fields of the model.
+        '''
+        for (field, value) in zip(['opc', 'funct3', 'funct7'], encoding):
+            given = getattr(model, field)
+            if field == 'funct7' and model.form != 'R':
+                if value is not None:
+                    return False
+            elif value is None or given not in (None, value):
+                return False
+        return True
+
+    def find(self, model, related):
+        '''
+        Find a free encoding for the unset fields of the model.
+        Slots of related instructions are tried first, then slots, that
+        are already partially used by R-Type instructions, then empty ones.
+        '''
+        opcs = OPCODES if model.opc is None else [model.opc]
+        functs3 = range(8) if model.funct3 is None else [model.funct3]
+        opcodes = set(opc for (opc, funct3) in related)
+
+        if model.form == 'I':
+            slots = sorted(((opc, funct3) for opc in opcs for funct3 in functs3
+                            if self.free('I', opc, funct3)),
+                           key=lambda slot: (slot[0] not in opcodes, slot))
+            if slots:
+                return slots[0] + (model.funct7,)
+            return None
+
+        functs7 = range(128) if model.funct7 is None else [model.funct7]
+        slots = sorted(((opc, funct3) for opc in opcs for funct3 in functs3
+                        if self._slots.get((opc, funct3), 0) != FULL),
+                       key=lambda slot: (slot not in related,
+                                         self._slots.get(slot, 0) == 0,
+                                         slot[0] not in opcodes, slot))
+        for (opc, funct3) in slots:
+            for funct7 in functs7:
+                if self.free('R', opc, funct3, funct7):
+                    return (opc, funct3, funct7)
+        return None
+
+    def allocate(self, models, files=None):
+        '''
+        Assign encodings to all models with unset fields. Models of the
+        same file in files are related. Complete models keep their
+        encoding, then the locked encodings are assigned and at last the
+        new ones. Returns the models with all fields set.
+        '''
+        files = files or range(len(models))
+        self._assigned = {}
+        self._slots = {}
+        encodings = [None] * len(models)
+        related = dict((file, []) for file in files)
+
+        def assign(i, encoding):
+            (opc, funct3, funct7) = encoding
+            self.occupy(models[i].form, opc, funct3, funct7)
+            encodings[i] = encoding
+            related[files[i]].append((opc, funct3))
+
+        pending = []
+        for (i, model) in enumerate(models):
+            if model.allocated:
+                assign(i, (model.opc, model.funct3, model.funct7))
+            else:
+                pending.append(i)
+
+        remaining = []
+        for i in pending:
+            model = models[i]
+            locked = self._locked.get(model.name)
+            if locked is not None and self.matches(model, locked) and \
+                    self.free(model.form, *locked):
+                assign(i, tuple(locked))
+            else:
+                if locked is not None:
+                    logger.warn('Locked encoding of {} is not used'.format(
+                        model.name))
+                remaining.append(i)
+
+        for i in remaining:
+            encoding = self.find(models[i], related[files[i]])
+            if encoding is None:
+                raise OpcodeError('No free encoding for {}'.format(
+                    models[i].name))
+            logger.info('Assign opc {} funct3 {} to {}'.format(
+                hex(encoding[0]), hex(encoding[1]), models[i].name))
+            assign(i, encoding)
+
+        allocated = []
+        for (model, encoding) in zip(models, encodings):
+            if model.allocated:
+                allocated.append(model)
+                continue
+            # the funct7 of an I-Type instruction is not part of it
+            (opc, funct3, funct7) = encoding
+            if model.form != 'R':
+                funct7 = model.funct7
+            self._assigned[model.name] = [
+                opc, funct3, funct7 if model.form == 'R' else None]
+            allocated.append(Model(metadata=dict(model.metadata, opc=opc,
+                                                 funct3=funct3,
+                                                 funct7=funct7)))
+        return allocated
+
+    def save(self):
+        '''
+        Record the assignments of the last allocation in the lock file.
+        '''
+        self._locked = dict(self._assigned)
+        if self._path is None:
+            return False
+        return write_if_changed(self._path, json.dumps(
+            {'version': LOCK_VERSION, 'instructions': self._assigned},
+            indent=1, sort_keys=True) + '\n')
+
+    @property
+    def assigned(self):
+        return self._assigned
+
+    @property
+    def locked(self):
+        return self._locked
+
+    @property
+    def path(self):
+        return self._path
@@ -0,0 +1,134 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import hashlib
+import json
+import logging
+import os
+
+from discovery import Discovery, modelpaths
+from extensions import Extensions
+from frontend import includes
+from instruction import Instruction
+from model import Model
+from output import write_file
+from registers import Registers
+
+logger = logging.getLogger(__name__)
+
+# increased, whenever the layout of the bundle changes
+BUNDLE_VERSION = 3
+
+
+def sources(modelpath):
+    '''
+    Hash of every model and register file of the model roots and of the
+    headers they include, by path.
+    '''
+    (models, registers) = Discovery(modelpath).discover()
+    hashes = {}
+    for impl in models + registers:
+        for file in includes(impl)[0]:
+            if file in hashes:
+                continue
+            try:
+                with open(file, 'r') as fh:
+                    hashes[file] = hashlib.sha1(fh.read()).hexdigest()
+            except IOError:
+                hashes[file] = None
+    return hashes
+
+
+class Bundle:
+    '''
+    Serialized result of the parser: the models, the custom registers,
+    the instruction encodings and the custom opcode header.
+    The compiler and gem5 can be extended from a bundle, without parsing
+    the models or running parse-opcodes again.
+    '''
+
+    def __init__(self, path):
+        self._path = os.path.abspath(path)
+
+    def save(self, modelpath, exts, regs):
+        '''
+        Write the bundle of the parsed models.
+        '''
+        bundle = {
+            'version': BUNDLE_VERSION,
+            'modelpath': modelpaths(modelpath),
+            'sources': sources(modelpath),
+            'models': [model.metadata for model in exts.models],
+            'regmap': regs.regmap,
+            'instructions': [{'cycles': inst.cycles,
+                              'form': inst.form,
+                              'mask': inst.mask,
+                              'match': inst.match,
+                              'name': inst.name}
+                             for inst in exts.instructions],
+            'header': exts.cust_header}
+
+        logger.info('Write bundle {}'.format(self._path))
+        write_file(self._path, json.dumps(bundle, indent=1, sort_keys=True))
+
+    def load(self, modelpath):
+        '''
+        Read the bundle, that was written for the models in modelpath.
+        Returns the extensions and registers or raises a ValueError,
+        if the bundle can not be used, e.g. because a model, a register
+        file or an included header was added, removed or changed since.
+        '''
+        logger.info('Read bundle {}'.format(self._path))
+        try:
+            with open(self._path, 'r') as fh:
+                bundle = json.load(fh)
+        except IOError as e:
+            raise ValueError(self._path, e.strerror)
+
+        if bundle.get('version') != BUNDLE_VERSION:
+            raise ValueError(self._path, 'Unsupported bundle version.')
+        if bundle['modelpath'] != modelpaths(modelpath):
+            raise ValueError(self._path, 'Bundle of other models.')
+        if bundle['sources'] != sources(modelpath):
+            raise ValueError(self._path, 'Models changed since the bundle.')
+
+        models = [Model(metadata=metadata) for metadata in bundle['models']]
+        insts = [Instruction(inst['cycles'],
+                             str(inst['form']),
+                             str(inst['mask']),
+                             str(inst['match']),
+                             str(inst['name']))
+                 for inst in bundle['instructions']]
+        exts = Extensions(models, insts, bundle['header'])
+        regs = Registers(bundle['regmap'])
+
+        return exts, regs
+
+    @property
+    def path(self):
+        return self._path
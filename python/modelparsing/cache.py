@@ -0,0 +1,116 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import hashlib
+import json
+import logging
+import os
+
+from frontend import CLANG_ARGS, includes, libclang_id
+from model import GCC_ARGS, Model, gcc_id
+from output import write_file
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCache:
+    '''
+    Persistent cache of parsed models.
+    Every entry is addressed by a hash over the model source, all headers
+    it includes, the compiler flags and the used libclang. Unchanged models
+    are restored from the cache, without calling g++ or libclang.
+    '''
+
+    def __init__(self, cachepath, strict=False, fast=False, allocate=False):
+        self._allocate = allocate
+        self._cachepath = os.path.abspath(cachepath)
+
+        # all parts of the key, that do not depend on the model
+        # models checked with g++ are cached separately per g++
+        # as well as models, that were scanned without libclang
+        # and models, whose encoding may be allocated
+        self._salt = '\n'.join([' '.join(CLANG_ARGS),
+                                ' '.join(GCC_ARGS) if strict else '',
+                                gcc_id() if strict else '',
+                                'fast-scan' if fast else '',
+                                'allocate' if allocate else '',
+                                libclang_id()])
+
+    def key(self, impl):
+        '''
+        Compute the cache key of a model file.
+        '''
+        sha = hashlib.sha1(self._salt)
+
+        # model and included headers, every file hashed only once
+        # system headers are covered by the compiler version
+        for file in includes(impl)[0]:
+            sha.update('\0' + file + '\0')
+            try:
+                with open(file, 'r') as fh:
+                    sha.update(fh.read())
+            except IOError:
+                # a missing header is part of the key as well
+                sha.update('missing')
+
+        return sha.hexdigest()
+
+    def entry(self, key):
+        return os.path.join(self._cachepath, key + '.json')
+
+    def load(self, impl):
+        '''
+        Return the cached models of a file or None, if the file is not cached.
+        '''
+        entry = self.entry(self.key(impl))
+        try:
+            with open(entry, 'r') as fh:
+                metadata = json.load(fh)
+        except (IOError, ValueError):
+            logger.debug('Cache miss for {}'.format(impl))
+            return None
+
+        if isinstance(metadata, dict):
+            # entry of a single model
+            metadata = [metadata]
+
+        logger.info('Restore model {} from cache'.format(impl))
+        return [Model(metadata=entry, allocate=self._allocate)
+                for entry in metadata]
+
+    def store(self, impl, models):
+        '''
+        Add the parsed models of a file to the cache.
+        '''
+        entry = self.entry(self.key(impl))
+        logger.debug('Cache model {} in {}'.format(impl, entry))
+        write_file(entry, json.dumps([model.metadata for model in models]))
+
+    @property
+    def cachepath(self):
+        return self._cachepath
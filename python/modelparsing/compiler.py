@@ -30,10 +30,20 @@ import logging
 import os
 import re
 
-from mako.template import Template
+from depgraph import DepGraph, digest
+from output import inserted, original, read_file, snapshot, \
+    write_if_changed
+from profiler import stage
 
 logger = logging.getLogger(__name__)
 
+# include of the custom header, that is added to riscv-opc.h
+CUSTOM_INCLUDE = '#include "riscv-custom-opc.h"\n'
+# entry of a custom instruction, that is added to riscv-opc.c
+OPCODE_ENTRY = '{{"{}",  "I",  "{}", {}, {}, match_opcode, 0 }},\n'
+OPCODE_ENTRY_RE = re.compile(
+    r'^\{"[^"]*",  "I",  "[^"]*", \w+, \w+, match_opcode, 0 \},$')
+
 
 class Compiler:
     '''
@@ -41,7 +51,8 @@ class Compiler:
     the riscv compiler
     '''
 
-    def __init__(self, exts, regs, tcpath):
+    def __init__(self, exts, regs, tcpath, deps=None):
+        self._deps = deps or DepGraph()
         self._exts = exts
         self._regs = regs
 
@@ -110,11 +121,7 @@ class Compiler:
         if os.path.exists(opchold):
             logger.info('Restore contents from file {}'.format(opchold))
 
-            with open(opchold, 'r') as fh:
-                content = fh.read()
-
-            with open(self.opch, 'w') as fh:
-                fh.write(content)
+            write_if_changed(self.opch, read_file(opchold))
 
             logger.info('Original header restored')
 
@@ -141,11 +148,7 @@ class Compiler:
         opccold = self.opcc + '_old'
         if os.path.exists(opccold):
             logger.info('Restore contents from file {}'.format(opccold))
-            with open(opccold, 'r') as fh:
-                content = fh.read()
-
-            with open(self.opcc, 'w') as fh:
-                fh.write(content)
+            write_if_changed(self.opcc, read_file(opccold))
 
             logger.info('Original source restored')
 
@@ -179,9 +182,27 @@ class Compiler:
         '''
 
         logger.info('Extending the toolchain')
-        self.extend_header()
-        self.extend_source()
-        self.extend_stdlibs()
+        insts = self._exts.instructions
+        with stage('compiler.header'):
+            self._deps.build('compiler.header',
+                             [digest(original(self.opch,
+                                              self.header_patched)),
+                              self._exts.cust_header],
+                             [self.opch, self.opch + '_old', self.opch_cust],
+                             self.extend_header)
+        with stage('compiler.source'):
+            self._deps.build('compiler.source',
+                             [digest(original(self.opcc,
+                                              self.source_patched))] +
+                             insts.rows('name', 'form'),
+                             [self.opcc, self.opcc + '_old'],
+                             self.extend_source)
+        with stage('compiler.stdlibs'):
+            self._deps.build('compiler.stdlibs',
+                             [self.stdlibs, self._regs.regmap] +
+                             insts.rows('name', 'form'),
+                             [os.path.join(self.stdlibs, 'riscvintr.h')],
+                             self.extend_stdlibs)
 
     def extend_header(self):
         '''
@@ -189,32 +210,20 @@ class Compiler:
         of the custom instructions.
         '''
 
-        # read the content of riscv opc header
-        with open(self.opch, 'r') as fh:
-            content = fh.read()
-
-        # if not existing
-        # copy the old header file
-        # basically generate new file with old content
-        opchold = self.opch + '_old'
-        if not os.path.exists(opchold):
-            logger.info('Copy original {}'.format(self.opch))
-            with open(opchold, 'w') as fh:
-                fh.write(content)
+        # the original header is always the base, so that extending it
+        # again gives the same result
+        content = snapshot(self.opch, self.header_patched)
 
         # we include a whole directory
         # at first, we create our own custom opc header file
-        # write file
-        with open(self.opch_cust, 'w') as fh:
-            fh.write(self._exts.cust_header)
+        write_if_changed(self.opch_cust, self._exts.cust_header)
 
         # write the include statement for our custom header
-        if '#include "riscv-custom-opc.h"\n' not in content:
-            content = '#include "riscv-custom-opc.h"\n' + content
+        if CUSTOM_INCLUDE not in content:
+            content = CUSTOM_INCLUDE + content
 
         # write back generated header file
-        with open(self.opch, 'w') as fh:
-            fh.write(content)
+        write_if_changed(self.opch, content)
 
     def extend_source(self):
         '''
@@ -222,23 +231,14 @@ class Compiler:
         custom instructions.
         '''
 
-        # read source file
-        with open(self.opcc, 'r') as fh:
-            content = fh.readlines()
-
-        # if not existing
-        # copy the old source file
-        # basically generate new file with old content
-        opccold = self.opcc + '_old'
-        if not os.path.exists(opccold):
-            logger.info('Copy original {}'.format(self.opcc))
-            with open(opccold, 'w') as fh:
-                data = ''.join(content)
-                fh.write(data)
+        # the original source is always the base, so that instructions,
+        # which were removed since the last run, are gone
+        content = snapshot(self.opcc, self.source_patched)
+        content = content.splitlines(True)
 
         for inst in self._exts.instructions:
             # build string that has to be added to the content of the file
-            dfn = '{{"{}",  "I",  "{}", {}, {}, match_opcode, 0 }},\n'.format(
+            dfn = OPCODE_ENTRY.format(
                 inst.name, inst.operands, inst.matchname, inst.maskname)
 
             if dfn in content:
@@ -257,11 +257,27 @@ class Compiler:
             content.insert(line, dfn)
 
         # write back modified content
-        with open(self.opcc, 'w') as fh:
-            content = ''.join(content)
-            fh.write(content)
+        write_if_changed(self.opcc, ''.join(content))
+
+    @staticmethod
+    def header_patched(content, original):
+        '''
+        Check whether the header is the original with the custom include.
+        '''
+        return inserted(content, original) in ([], [CUSTOM_INCLUDE])
+
+    @staticmethod
+    def source_patched(content, original):
+        '''
+        Check whether the source is the original with custom instructions.
+        '''
+        lines = inserted(content, original)
+        return lines is not None and \
+            all(OPCODE_ENTRY_RE.match(line) for line in lines)
 
     def extend_stdlibs(self):
+        from mako.template import Template
+
         # first: we need to find the location of the installed toolchain
         # this is simply done by parsing the makefile in the
         # riscv-gnu-toolchain project, which is available via args
@@ -307,7 +323,7 @@ void WRITE_CUSTOM_REG(uint32_t reg, uint32_t val)
 
 // access methods for custom instructions
 % for inst in insts:
-% if inst.form is 'R':
+% if inst.form == 'R':
 % if not inst.name in ('read_custreg', 'write_custreg'):
 <% print(inst.name)%>\
 
@@ -333,8 +349,11 @@ void ${inst.name.upper()}(uint32_t* rd, uint32_t rs1, uint32_t rs2)
         riscvintr = os.path.join(self.stdlibs, 'riscvintr.h')
         logger.info("Create intrinsics file @ {}". format(riscvintr))
 
-        with open(riscvintr, 'w') as fh:
-            fh.write(intr_file)
+        write_if_changed(riscvintr, intr_file)
+
+    @property
+    def deps(self):
+        return self._deps
 
     @property
     def exts(self):
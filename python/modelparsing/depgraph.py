@@ -0,0 +1,117 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import hashlib
+import json
+import logging
+import os
+
+from output import write_file
+
+logger = logging.getLogger(__name__)
+
+
+def digest(content):
+    '''
+    Hash of the content of an input file, None if it does not exist.
+    '''
+    if content is None:
+        return None
+    return hashlib.sha1(content).hexdigest()
+
+
+class DepGraph:
+    '''
+    Records for every generated artifact a fingerprint of the inputs it
+    was generated from. An artifact is only generated again, if its inputs
+    changed or one of its outputs is missing. Without a path, nothing is
+    recorded and every artifact is always generated.
+    '''
+
+    def __init__(self, path=None):
+        self._path = os.path.abspath(path) if path else None
+        self._deps = {}
+
+        if self._path is not None:
+            try:
+                with open(self._path, 'r') as fh:
+                    self._deps = json.load(fh)
+            except (IOError, ValueError):
+                logger.info('No dependencies recorded in {}'.format(path))
+
+    def fingerprint(self, inputs):
+        '''
+        Hash over the inputs of an artifact.
+        '''
+        return hashlib.sha1(json.dumps(inputs, sort_keys=True)).hexdigest()
+
+    def stale(self, artifact, inputs, outputs=[]):
+        '''
+        Check whether an artifact has to be generated.
+        '''
+        if self._path is None:
+            return True
+        if any(not os.path.exists(output) for output in outputs):
+            logger.info('Output of {} missing'.format(artifact))
+            return True
+        return self._deps.get(artifact) != self.fingerprint(inputs)
+
+    def update(self, artifact, inputs):
+        '''
+        Record the inputs of a generated artifact.
+        '''
+        if self._path is not None:
+            self._deps[artifact] = self.fingerprint(inputs)
+
+    def build(self, artifact, inputs, outputs, generate):
+        '''
+        Call generate, if the artifact is stale, and record its inputs.
+        Returns whether the artifact was generated.
+        '''
+        if not self.stale(artifact, inputs, outputs):
+            logger.info('{} is up to date'.format(artifact))
+            return False
+
+        logger.info('Generate {}'.format(artifact))
+        generate()
+        self.update(artifact, inputs)
+        return True
+
+    def save(self):
+        '''
+        Write the recorded fingerprints.
+        '''
+        if self._path is None:
+            return
+
+        write_file(self._path,
+                   json.dumps(self._deps, indent=1, sort_keys=True))
+
+    @property
+    def path(self):
+        return self._path
@@ -0,0 +1,265 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import fnmatch
+import glob
+import logging
+import os
+import stat
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+logger = logging.getLogger(__name__)
+
+# lists the model and register files of a root, instead of searching it
+MANIFEST = 'models.manifest'
+# patterns of files and directories, that are no models
+IGNOREFILE = '.modelignore'
+# directories, that never contain models
+SKIP_DIRS = ['.bzr', '.git', '.hg', '.svn', 'CVS', '__pycache__', 'build']
+
+
+def modelpaths(modelpath):
+    '''
+    Absolute model roots of a single path or a list of paths.
+    '''
+    if isinstance(modelpath, basestring):
+        return [os.path.abspath(modelpath)]
+    return [os.path.abspath(path) for path in modelpath]
+
+
+def read_patterns(filename):
+    '''
+    Non-empty lines of a manifest or ignore file without comments.
+    '''
+    with open(filename, 'r') as fh:
+        lines = [line.split('#', 1)[0].strip() for line in fh]
+    return [line for line in lines if line]
+
+
+class Entry:
+    '''
+    Directory entry for pythons without scandir. Like the entries of
+    scandir, it follows symlinks, but it stats the path only once.
+    '''
+
+    def __init__(self, top, name):
+        self._name = name
+        self._path = os.path.join(top, name)
+        self._mode = None
+
+    def mode(self):
+        if self._mode is None:
+            try:
+                self._mode = os.stat(self._path).st_mode
+            except OSError:
+                # e.g. a broken symlink, that is neither
+                self._mode = 0
+        return self._mode
+
+    def is_dir(self):
+        return stat.S_ISDIR(self.mode())
+
+    def is_file(self):
+        return stat.S_ISREG(self.mode())
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def path(self):
+        return self._path
+
+
+def entries(top):
+    '''
+    Entries of a directory, sorted by name.
+    '''
+    if scandir is not None:
+        found = list(scandir(top))
+    else:
+        found = [Entry(top, name) for name in os.listdir(top)]
+    return sorted(found, key=lambda entry: entry.name)
+
+
+class Discovery:
+    '''
+    Finds the model and register files in one or more model roots.
+    A root is either a single model file or a directory. A directory is
+    searched recursively, unless it has a manifest listing its files.
+    Ignore files exclude matching files and directories below them.
+    '''
+
+    def __init__(self, modelpath, skip=SKIP_DIRS):
+        self._roots = modelpaths(modelpath)
+        self._skip = set(skip)
+        self._directories = []
+        self._models = []
+        self._registers = []
+        self._visited = set()
+
+    def discover(self):
+        '''
+        Search all roots. Returns the model and register files.
+        '''
+        self._directories = []
+        self._models = []
+        self._registers = []
+        self._visited = set()
+
+        for root in self._roots:
+            if os.path.isdir(root):
+                manifest = os.path.join(root, MANIFEST)
+                if os.path.isfile(manifest):
+                    self._directories.append(root)
+                    self.read_manifest(root, manifest)
+                else:
+                    self.walk(root, [])
+            else:
+                logger.info('Single file {}'.format(root))
+                self._directories.append(os.path.dirname(root))
+                self._models.append(root)
+
+        return self._models, self._registers
+
+    def read_manifest(self, root, manifest):
+        '''
+        Add the files listed in a manifest. Entries are paths relative to
+        the root and may contain wildcards.
+        '''
+        logger.info('Models listed in {}'.format(manifest))
+        ignores = self.read_ignores(root, [])
+        for pattern in read_patterns(manifest):
+            matches = sorted(glob.glob(os.path.join(root, pattern)))
+            if not matches:
+                logger.warn('No file matches {} in {}'.format(
+                    pattern, manifest))
+            for pathname in matches:
+                if os.path.isfile(pathname) and \
+                        not self.ignored(pathname, False, ignores):
+                    if os.path.dirname(pathname) not in self._directories:
+                        self._directories.append(os.path.dirname(pathname))
+                    self.add(pathname)
+
+    def walk(self, top, ignores):
+        '''
+        Search a directory recursively. Entries are visited in the order
+        of their names, so that the models are always in the same order.
+        '''
+        # follow links to directories, but not in circles
+        realpath = os.path.realpath(top)
+        if realpath in self._visited:
+            return
+        self._visited.add(realpath)
+        self._directories.append(top)
+
+        logger.info('Search for models in {}'.format(top))
+        ignores = self.read_ignores(top, ignores)
+        for entry in entries(top):
+            if entry.is_dir():
+                if entry.name in self._skip:
+                    logger.debug('Skip directory {}'.format(entry.path))
+                elif not self.ignored(entry.path, True, ignores):
+                    self.walk(entry.path, ignores)
+            elif entry.is_file():
+                if not self.ignored(entry.path, False, ignores):
+                    self.add(entry.path)
+            else:
+                # unknown file type
+                logger.info('Unknown file type, skip {}'.format(entry.path))
+
+    def read_ignores(self, top, ignores):
+        '''
+        Add the patterns of the ignore file in top to the given ones.
+        '''
+        ignorefile = os.path.join(top, IGNOREFILE)
+        if not os.path.isfile(ignorefile):
+            return ignores
+        logger.info('Ignore patterns in {}'.format(ignorefile))
+        return ignores + [(top, pattern)
+                          for pattern in read_patterns(ignorefile)]
+
+    def ignored(self, pathname, isdir, ignores):
+        '''
+        Check a file or directory against the ignore patterns. Patterns
+        with a slash are matched against the path relative to the ignore
+        file, other patterns against the name. A trailing slash only
+        matches directories.
+        '''
+        for top, pattern in ignores:
+            if pattern.endswith('/'):
+                if not isdir:
+                    continue
+                pattern = pattern.rstrip('/')
+            if '/' in pattern:
+                name = os.path.relpath(pathname, top)
+                pattern = pattern.lstrip('/')
+            else:
+                name = os.path.basename(pathname)
+            if fnmatch.fnmatch(name, pattern):
+                logger.debug('Ignore {}'.format(pathname))
+                return True
+        return False
+
+    def add(self, pathname):
+        '''
+        Add a file, if it is a model or defines registers.
+        '''
+        if pathname.endswith('.cc'):
+            logger.info('Model definition in file {}'.format(pathname))
+            self._models.append(pathname)
+        # registers
+        if pathname.endswith('registers.hh'):
+            logger.info('Custom registers in file {}'.format(pathname))
+            self._registers.append(pathname)
+
+    @property
+    def directories(self):
+        '''
+        Directories, whose content decides about the found files.
+        '''
+        return self._directories
+
+    @property
+    def models(self):
+        return self._models
+
+    @property
+    def registers(self):
+        return self._registers
+
+    @property
+    def roots(self):
+        return self._roots
@@ -28,12 +28,12 @@
 
 import logging
 import os
-import subprocess
-
-from mako.template import Template
 
+from encoder import Encoder
 from exceptions import OpcodeError
-from instruction import Instruction
+from opcodeindex import OpcodeIndex
+from profiler import stage
+from table import InstructionTable
 
 logger = logging.getLogger(__name__)
 
@@ -44,20 +44,19 @@ class Extensions:
     that is needed to extend the RISC-V compiler.
     '''
 
-    def __init__(self, models):
+    def __init__(self, models, insts=None, cust_header=None):
+        '''
+        The instructions are generated from the models, unless the
+        instructions and the custom header are given, e.g. from a bundle.
+        The instructions are kept in an InstructionTable.
+        '''
         self._models = models
-        self._insts = []
+        self._insts = InstructionTable()
 
         # riscv-opcodes path
         self._rv_opc = os.path.join(os.path.dirname(
             os.path.realpath(__file__)), '../../riscv-opcodes')
 
-        self._opc_templ = os.path.join(os.path.dirname(
-            os.path.realpath(__file__)), 'opcodes-custom.mako')
-
-        # files of riscv-opcodes project
-        self._rv_opc_parser = os.path.join(self._rv_opc, 'parse-opcodes')
-
         # opcode files
         self._rv_opc_files = []
         self._rv_opc_files.append(os.path.join(self._rv_opc, 'opcodes-pseudo'))
@@ -67,83 +66,45 @@ class Extensions:
         self._rv_opc_files.append(os.path.join(self._rv_opc, 'opcodes-rvc'))
         self._rv_opc_files.append(os.path.join(self._rv_opc, 'opcodes-custom'))
 
-        self.gen_instructions()
+        # encodings of the base isa and the checked instructions
+        self._index = OpcodeIndex()
 
-    def check_opcodes(self, inst):
-        # check for overlapping opcodes
+        if insts is not None and cust_header is not None:
+            self._insts = InstructionTable.from_instructions(insts)
+            self._cust_header = cust_header
+        else:
+            self.gen_instructions()
+
+    def check_opcodes(self, name, match, mask):
+        '''
+        Check, that no instruction word matches both the instruction and
+        one of the instructions checked before or of the base isa.
+        '''
         # NOTE: Until fix in riscv/riscv-opcodes we have to do it manually.
         # Therefore we do the check here, instead of checking it while adding
         # the model. This way the tests doesn't have to be adapted, once the
         # script is patched.
-        logger.debug('{} {}'.format(inst.name, inst.form))
-        for inst2 in self._insts:
-            if inst2.name == inst.name:
-                # same instruction
-                # skip
-                continue
-            if inst2.form == 'R':
-                if (inst2.matchvalue & inst.maskvalue) == inst.matchvalue:
-                    logger.debug('{}.match {}'.format(
-                        inst.name, hex(inst.matchvalue)))
-                    logger.debug('{}.match {}'.format(
-                        inst.name, hex(inst.maskvalue)))
-                    logger.debug('{}.match {}'.format(
-                        inst2.name, hex(inst2.matchvalue)))
-                    logger.debug('{}.match {}'.format(
-                        inst2.name, hex(inst2.maskvalue)))
-                    logger.error('{} and {} overlap'.format(
-                        inst.name, inst2.name))
-                    raise OpcodeError('Function opcode could not be generated')
-            if inst2.form == 'I':
-                if (inst2.matchvalue & inst.maskvalue) == (
-                        inst.matchvalue & inst2.maskvalue):
-                    logger.debug('{}.match {}'.format(
-                        inst.name, hex(inst.matchvalue)))
-                    logger.debug('{}.match {}'.format(
-                        inst.name, hex(inst.maskvalue)))
-                    logger.debug('{}.match {}'.format(
-                        inst2.name, hex(inst2.matchvalue)))
-                    logger.debug('{}.match {}'.format(
-                        inst2.name, hex(inst2.maskvalue)))
-                    logger.error('{} and {} overlap'.format(
-                        inst.name, inst2.name))
-                    raise OpcodeError('Function opcode could not be generated')
+        for (other, omatch, omask, origin) in self._index.overlaps(
+                match, mask):
+            logger.debug('{}.match {}'.format(name, hex(match)))
+            logger.debug('{}.mask {}'.format(name, hex(mask)))
+            logger.debug('{}.match {}'.format(other, hex(omatch)))
+            logger.debug('{}.mask {}'.format(other, hex(omask)))
+            logger.error('{} and {}{} overlap'.format(
+                name, other, ' of ' + origin if origin else ''))
+            raise OpcodeError('Function opcode could not be generated')
+        self._index.add(name, match, mask)
 
     def gen_instructions(self):
         logger.info('Generate instructions from operations')
-        # use a mako template to generate files, that are equal to the ones
-        # in the riscv-opcodes project
-        opcodes_cust = Template(r"""<%
-%>\
-% for operation in operations:
-% if operation.form == 'R':
-${operation.name} rd rs1 rs2 31..25=${operation.funct7} 14..12=${operation.funct3} 6..2=${operation.opc} 1..0=3
-% elif operation.form == 'I':
-${operation.name} rd rs1 imm12 14..12=${operation.funct3} 6..2=${operation.opc} 1..0=3
-% else:
-Format not supported.
-<% return STOP_RENDERING %>
-%endif
-% endfor""")
-
-        content = opcodes_cust.render(operations=self._models)
-
-        # start parse_opcodes script with our custom instructions
-        p = subprocess.Popen([self._rv_opc_parser,
-                              '-c'],
-                             stdin=subprocess.PIPE,
-                             stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE)
-        defines, err = p.communicate(input=content)
-
-        if not defines or err:
-            # an error occured
-            # try:
-            #     os.remove(opc_cust)
-            # except OSError:
-            #     pass
-            logger.error(err.rstrip())
-            raise OpcodeError('Function opcode could not be generated')
+        # the encoder computes the same header as the parse-opcodes script
+        # of the riscv-opcodes project
+        encoder = Encoder()
+        with stage('extensions.encode'):
+            for model in self._models:
+                encoder.add(model.name, model.form, model.opc,
+                            model.funct3, model.funct7)
+            defines = encoder.header()
 
         # adapt the defines
         defines = defines.replace(
@@ -152,35 +113,22 @@ Format not supported.
         defines = defines.replace('DECLARE_CAUSE', 'DECLARE_CUSTOM_CAUSE')
         self._cust_header = defines
 
-        # split the stdout output
-        # newline character is used as seperator
-        d = '\n'
-        lines = [e + d for e in defines.split(d)]
-
-        # collect all masks
-        masks = [
-            entry for entry in lines if entry.startswith('#define MASK')]
-        # collect all entrys
-        matches = [
-            entry for entry in lines if entry.startswith('#define MATCH')]
-
-        # just for sanity, should never go wrong
-        assert len(masks) == len(
-            matches), 'Length of mask and match arrays differ'
-
         # create instructions
-        for i in range(0, len(self._models)):
-            inst = Instruction(self._models[i].cycles,
-                               self._models[i].form,
-                               masks[i],
-                               matches[i],
-                               self._models[i].name)
-            self._insts.append(inst)
+        names = [model.name for model in self._models]
+        self._insts = InstructionTable(
+            names,
+            [model.form for model in self._models],
+            [encoder.mask[name] for name in names],
+            [encoder.match[name] for name in names],
+            [model.cycles for model in self._models])
 
         # check opcodes for not captured errors
         logger.info('Checking if opcodes overlap')
-        for inst in self._insts:
-            self.check_opcodes(inst)
+        with stage('extensions.overlap'):
+            self._index.add_base(self._rv_opc)
+            for (name, match, mask) in self._insts.rows('name', 'match',
+                                                        'mask'):
+                self.check_opcodes(name, match, mask)
 
     @property
     def models(self):
@@ -0,0 +1,344 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import glob
+import hashlib
+import logging
+import os
+import re
+
+from output import makedirs, replacing, write_file
+
+logger = logging.getLogger(__name__)
+
+# arguments used to parse a model with libclang
+CLANG_ARGS = ['-x', 'c++', '-c', '-std=c++11', '-Wall']
+# arguments used to precompile the common headers
+PCH_ARGS = ['-x', 'c++-header'] + CLANG_ARGS[2:]
+
+# CXTranslationUnit_LimitSkipFunctionBodiesToPreamble, since libclang 7
+# not exported by the python bindings
+PARSE_LIMIT_SKIP_FUNCTION_BODIES_TO_PREAMBLE = 0x800
+
+# quoted or system include of a source file
+INCLUDE = re.compile(r'^\s*#\s*include\s*(?:"([^"]+)"|<([^>]+)>)', re.M)
+
+# file, in which the location of libclang is kept after its discovery
+LIBCLANG_CACHE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                              '../../build/libclang')
+# known locations of libclang, in order of preference
+LIBCLANG_PATHS = ['/usr/lib/llvm-4.0/lib/libclang-4.0.so',
+                  '/usr/lib/llvm-4.0/lib/libclang-4.0.so.1',
+                  '/usr/lib/llvm-3.8/lib/libclang-3.8.so',
+                  '/usr/lib64/llvm/libclang.so']
+# searched, if none of the known locations exists, newest version first
+# libclang-cpp is a C++ library without the C interface and not matched
+LIBCLANG_GLOBS = ['/usr/lib/llvm-*/lib/libclang.so*',
+                  '/usr/lib/llvm-*/lib/libclang-[0-9]*.so*',
+                  '/usr/lib64/llvm*/libclang.so*',
+                  '/usr/lib/*-linux-gnu/libclang.so*',
+                  '/usr/lib/*-linux-gnu/libclang-[0-9]*.so*',
+                  '/usr/lib64/libclang.so*']
+
+_cindex = None
+_clang_version = None
+_index = None
+_libclang_path = None
+
+
+def find_libclang():
+    '''
+    Search the file system for libclang.
+    Returns the path of the library or None, if it was not found.
+    '''
+    for path in LIBCLANG_PATHS:
+        if os.path.isfile(path):
+            return path
+
+    def version(path):
+        return [int(num) for num in re.findall(r'\d+', path)]
+
+    for pattern in LIBCLANG_GLOBS:
+        found = sorted(glob.glob(pattern), key=version)
+        if found:
+            return found[-1]
+
+    return None
+
+
+def libclang_path(cachefile=LIBCLANG_CACHE):
+    '''
+    Location of libclang. The location is searched only once and then
+    kept in the cache file, until the library is removed.
+    Returns None, if the python bindings should find it themselves.
+    '''
+    global _libclang_path
+    if _libclang_path is None:
+        try:
+            with open(cachefile, 'r') as fh:
+                path = fh.read().strip()
+        except IOError:
+            path = ''
+
+        if not os.path.isfile(path):
+            path = find_libclang() or ''
+            logger.info('Found libclang at {}'.format(path or 'n/a'))
+            if path:
+                try:
+                    save_libclang_path(cachefile, path)
+                except (IOError, OSError):
+                    logger.warn('Could not write {}'.format(cachefile))
+
+        _libclang_path = path
+    return _libclang_path or None
+
+
+def save_libclang_path(cachefile, path):
+    '''
+    Write the location of libclang to the cache file.
+    '''
+    write_file(cachefile, path + '\n')
+
+
+def load_cindex():
+    '''
+    Import the libclang bindings on first use, so that restored models
+    and commands without parsing never load libclang.
+    '''
+    global _cindex
+    if _cindex is None:
+        import clang.cindex
+        path = libclang_path()
+        if path and not clang.cindex.Config.loaded:
+            clang.cindex.Config.set_library_file(path)
+        _cindex = clang.cindex
+    return _cindex
+
+
+def clang_version():
+    '''
+    Return the version of the used libclang as a tuple (major, minor).
+    '''
+    global _clang_version
+    if _clang_version is None:
+        cindex = load_cindex()
+        lib = cindex.conf.lib
+        lib.clang_getClangVersion.restype = cindex._CXString
+        version = cindex._CXString.from_result(
+            lib.clang_getClangVersion())
+        match = re.search(r'version (\d+)\.(\d+)', version)
+        _clang_version = (int(match.group(1)), int(match.group(2))) \
+            if match else (0, 0)
+        logger.info('libclang version: {}'.format(version))
+    return _clang_version
+
+
+def libclang_id():
+    '''
+    Identify the used libclang by its location, size and mtime.
+    '''
+    lib = libclang_path() or ''
+    try:
+        st = os.stat(lib)
+    except OSError:
+        return lib
+    return '{}:{}:{}'.format(lib, st.st_size, int(st.st_mtime))
+
+
+def includes(impl, source=None):
+    '''
+    Files reached by the quoted includes of a model, recursively, and the
+    names of the system headers they include. The model is the first file,
+    headers, that do not exist, are listed as well. If source is given, it
+    is used as the content of the model.
+    '''
+    files = []
+    system = set()
+    pending = [os.path.abspath(impl)]
+    while pending:
+        file = pending.pop(0)
+        if file in files:
+            continue
+        files.append(file)
+
+        if source is not None and len(files) == 1:
+            content = source
+        else:
+            try:
+                with open(file, 'r') as fh:
+                    content = fh.read()
+            except IOError:
+                continue
+
+        for (quoted, angled) in INCLUDE.findall(content):
+            if quoted:
+                pending.append(os.path.normpath(
+                    os.path.join(os.path.dirname(file), quoted)))
+            else:
+                system.add(angled)
+
+    return files, system
+
+
+def index():
+    '''
+    Return the index, that is shared by all models of this process.
+    '''
+    global _index
+    if _index is None:
+        cindex = load_cindex()
+        logger.info("Using libclang at %s" % cindex.Config.library_file)
+        _index = cindex.Index.create()
+    return _index
+
+
+def parse_options():
+    '''
+    Options to parse a model. Function bodies of the included headers are
+    skipped, the bodies of the model itself are not. Older versions of
+    libclang would skip those as well, so there the options are not set.
+    '''
+    tu = load_cindex().TranslationUnit
+    if clang_version() < (7, 0):
+        return tu.PARSE_NONE
+
+    return (tu.PARSE_SKIP_FUNCTION_BODIES |
+            tu.PARSE_PRECOMPILED_PREAMBLE |
+            PARSE_LIMIT_SKIP_FUNCTION_BODIES_TO_PREAMBLE)
+
+
+class Preamble:
+    '''
+    Precompiled header of the includes, that are common to all models:
+    <cstdint> and the custom register definitions. It is built once and
+    used by every model, that includes the same headers, until the
+    register file changes.
+    '''
+
+    def __init__(self, cachepath, regfile=None):
+        self._cachepath = os.path.abspath(cachepath)
+        self._regfile = os.path.abspath(regfile) if regfile else None
+        self._pch = None
+
+    def content(self):
+        '''
+        The header, that is precompiled.
+        '''
+        content = '#include <cstdint>\n'
+        if self._regfile:
+            content += '#include "{}"\n'.format(self._regfile)
+        return content
+
+    def covers(self, impl, source=None):
+        '''
+        Check whether a model includes all headers of the preamble itself.
+        Otherwise the precompiled header would hide a missing include,
+        that only g++ or gem5 report later.
+        '''
+        (files, system) = includes(impl, source)
+        return 'cstdint' in system and \
+            (self._regfile is None or self._regfile in files)
+
+    def key(self):
+        '''
+        Hash over everything, that invalidates the precompiled header.
+        '''
+        sha = hashlib.sha1('\n'.join([' '.join(PCH_ARGS),
+                                      libclang_id(),
+                                      self.content()]))
+        if self._regfile:
+            # clang rejects the header, if the mtime changed
+            st = os.stat(self._regfile)
+            sha.update('{}:{}'.format(st.st_size, int(st.st_mtime)))
+            with open(self._regfile, 'r') as fh:
+                sha.update(fh.read())
+        return sha.hexdigest()
+
+    def build(self):
+        '''
+        Build the precompiled header, if it does not exist yet.
+        Returns the path of the header or None, if it can not be built.
+        '''
+        makedirs(self._cachepath)
+
+        base = os.path.join(self._cachepath, 'preamble-' + self.key())
+        pch = base + '.pch'
+
+        if os.path.exists(pch) and self.usable(pch):
+            logger.info('Use precompiled header {}'.format(pch))
+            self._pch = pch
+            return pch
+
+        logger.info('Precompile common headers to {}'.format(pch))
+        header = base + '.hh'
+        write_file(header, self.content())
+
+        cindex = load_cindex()
+        try:
+            tu = index().parse(
+                header, PCH_ARGS,
+                options=cindex.TranslationUnit.PARSE_INCOMPLETE)
+        except cindex.TranslationUnitLoadError:
+            logger.warn('Common headers could not be precompiled')
+            return None
+
+        if any(diag.severity >= cindex.Diagnostic.Error
+               for diag in tu.diagnostics):
+            logger.warn('Common headers could not be precompiled')
+            return None
+
+        with replacing(pch) as tmp:
+            tu.save(tmp)
+
+        self._pch = pch
+        return pch
+
+    def usable(self, pch):
+        '''
+        Check whether libclang accepts the precompiled header.
+        '''
+        try:
+            index().parse('preamble-check.cc',
+                          CLANG_ARGS + ['-include-pch', pch],
+                          unsaved_files=[('preamble-check.cc', '')])
+        except load_cindex().TranslationUnitLoadError:
+            logger.info('Precompiled header {} is outdated'.format(pch))
+            return False
+        return True
+
+    @property
+    def args(self):
+        return ['-include-pch', self._pch] if self._pch else []
+
+    @property
+    def pch(self):
+        return self._pch
+
+    @property
+    def regfile(self):
+        return self._regfile
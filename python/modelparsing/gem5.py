@@ -26,14 +26,24 @@
 #
 # Authors: Robert Scheffel
 
+import glob
 import logging
 import os
+import re
+import shutil
 import sys
+import tempfile
 
-from mako.template import Template
+from depgraph import DepGraph, digest
+from output import inserted, read_file, snapshot, sync_tree, \
+    write_if_changed
+from profiler import stage
 
 logger = logging.getLogger(__name__)
 
+# first line of the decoder of a custom opcode in the patched decoder
+DECODE_OPCODE_RE = re.compile(r'^0x[0-9a-f]+L?: decode FUNCT3 \{$')
+
 
 class Gem5:
     '''
@@ -42,7 +52,8 @@ class Gem5:
     models.
     '''
 
-    def __init__(self, exts, regs):
+    def __init__(self, exts, regs, deps=None):
+        self._deps = deps or DepGraph()
         self._exts = exts
         self._regs = regs
         self._decoder = ''
@@ -84,11 +95,7 @@ class Gem5:
         if os.path.exists(decoder_old):
             logger.info('Restore contents from file {}'.format(decoder_old))
 
-            with open(decoder_old, 'r') as fh:
-                content = fh.read()
-
-            with open(self._isa_decoder, 'w') as fh:
-                fh.write(content)
+            write_if_changed(self._isa_decoder, read_file(decoder_old))
 
             logger.info('Original decoder restored')
 
@@ -107,14 +114,60 @@ class Gem5:
         '''
 
         # first: decoder related stuff
-        self.gen_decoder()
-        self.gen_cxx_files()
-        self.create_regsintr()
+        # the generated cxx files depend on the decoder, the isa files
+        # including it and the isa parser
+        self._deps.build('gem5.decoder',
+                         sorted([model.name, model.form, model.opc,
+                                 model.funct3, model.funct7, model.definition]
+                                for model in self._exts.models) +
+                         [[path, digest(read_file(path))]
+                          for path in self.isa_files()],
+                         [os.path.join(self._buildpath, 'isa/custom.isa'),
+                          os.path.join(self._buildpath, 'generated')],
+                         self.gen_decoder_files)
+        with stage('gem5.regsintr'):
+            self._deps.build('gem5.regsintr',
+                             [self._regs.regmap],
+                             [os.path.join(self._buildpath,
+                                           'generated/regsintr.hh')],
+                             self.create_regsintr)
         # self.patch_decoder()
         # second: create timings for functional units
-        self.create_FU_timings()
+        with stage('gem5.timings'):
+            self._deps.build('gem5.timings',
+                             self._exts.instructions.rows(
+                                 'name', 'match', 'mask', 'cycles'),
+                             [os.path.join(self._buildpath,
+                                           'python/minor_custom_timings.py')],
+                             self.create_FU_timings)
+
+    def isa_files(self):
+        '''
+        Files, from which the isa parser generates the decoder besides the
+        custom decoder: the isa files of this project and the parser.
+        '''
+        files = sorted(glob.glob(os.path.join(
+            os.path.dirname(self._isamain), '*.isa')))
+        parser = os.path.join(self._gem5_arch_path, 'isa_parser')
+        if os.path.isdir(parser):
+            files.extend(sorted(glob.glob(os.path.join(parser, '*.py'))))
+        else:
+            files.append(parser + '.py')
+        return files
+
+    def gen_decoder_files(self):
+        '''
+        Generate the custom decoder and let the isa parser
+        generate the cxx files from it.
+        '''
+        with stage('gem5.decoder'):
+            self.gen_decoder()
+        with stage('gem5.isa_parser'):
+            self.gen_cxx_files()
 
     def gen_decoder(self):
+        from mako.template import Template
+
         assert os.path.exists(self._buildpath)
         assert os.path.exists(self._gem5_arch_path)
         # iterate of all custom extensions and generate a custom decoder
@@ -122,8 +175,9 @@ class Gem5:
         # opcode > funct3 (> funct7)
         logger.info('Generate custom decoder from models.')
 
-        # sort models
-        self._exts.models.sort(key=lambda x: (x.opc, x.funct3, x.funct7))
+        # sort a copy of the models, they are shared with the compiler
+        models = sorted(self._exts.models,
+                        key=lambda x: (x.opc, x.funct3, x.funct7))
 
         dec_templ = Template(r"""<%
 dfn = {}
@@ -171,24 +225,15 @@ default: Unknown::unknown();
 % endif
 """)
 
-        self._decoder = dec_templ.render(models=self._exts.models)
+        self._decoder = dec_templ.render(models=models)
         logger.debug('custom decoder: \n' + self._decoder)
 
     def gen_cxx_files(self):
         # now generate the cxx files using the isa parser
-        isabuildpath = os.path.join(self._buildpath, 'isa')
-        if not os.path.exists(isabuildpath):
-            os.makedirs(isabuildpath)
-
-        isafile = os.path.join(isabuildpath, 'custom.isa')
+        isafile = os.path.join(self._buildpath, 'isa/custom.isa')
+        write_if_changed(isafile, self._decoder)
 
-        with open(isafile, 'w') as fh:
-            fh.write(self._decoder)
-
-        # create a builddir
         gen_build_dir = os.path.join(self._buildpath, 'generated')
-        if not os.path.exists(gen_build_dir):
-            os.makedirs(gen_build_dir)
 
         # add some paths to call the gem5 isa parser
         sys.path[0:0] = [self._gem5_arch_path]
@@ -196,11 +241,21 @@ default: Unknown::unknown();
         sys.path[0:0] = [os.path.join(self._gem5_path, 'src/python')]
         import isa_parser
 
+        # the isa parser writes all files, so they are generated in a
+        # temporary directory and only the changed ones are copied
         logger.info('Let gem5 isa_parser generate decoder files')
-        parser = isa_parser.ISAParser(gen_build_dir)
-        parser.parse_isa_desc(self._isamain)
+        tmpdir = tempfile.mkdtemp(dir=self._buildpath)
+        try:
+            parser = isa_parser.ISAParser(tmpdir)
+            parser.parse_isa_desc(self._isamain)
+            # the register intrinsics are not generated by the isa parser
+            sync_tree(tmpdir, gen_build_dir, keep=['regsintr.hh'])
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
 
     def patch_decoder(self):
+        from mako.template import Template
+
         # patch the gem5 isa decoder
 
         dec_templ = Template(r"""<%
@@ -241,26 +296,25 @@ ${hex(mdl.funct7)}: R32Op::${mdl.name}({${mdl.definition}}, IntCustOp);
         decoder_patch = dec_templ.render(models=self._exts.models)
 
         # for now: always choose rv32.isa
+        # the original .isa file is always the base
         logger.info("Patch the gem5 isa file " + self._isa_decoder)
-        with open(self._isa_decoder, 'r') as fh:
-            content = fh.readlines()
-
-        # if not existing
-        # copy the old .isa file
-        gem5_isa_old = self._isa_decoder + '_old'
-        if not os.path.exists(gem5_isa_old):
-            logger.info('Copy original {}'.format(self._isa_decoder))
-            with open(gem5_isa_old, 'w') as fh:
-                data = ''.join(content)
-                fh.write(data)
+        content = snapshot(self._isa_decoder, self.decoder_patched)
+        content = content.splitlines(True)
 
         line = len(content) - 2
         content.insert(line, decoder_patch)
 
         # write back modified content
-        with open(self._isa_decoder, 'w') as fh:
-            content = ''.join(content)
-            fh.write(content)
+        write_if_changed(self._isa_decoder, ''.join(content))
+
+    @staticmethod
+    def decoder_patched(content, original):
+        '''
+        Check whether the decoder is the original with the custom opcodes.
+        '''
+        lines = inserted(content, original)
+        return lines is not None and \
+            (not lines or bool(DECODE_OPCODE_RE.match(lines[0])))
 
     def create_FU_timings(self):
         '''
@@ -268,6 +322,7 @@ ${hex(mdl.funct7)}: R32Op::${mdl.name}({${mdl.definition}}, IntCustOp);
         Together with the mask and match value, create a timing for
         every custom instruction.
         '''
+        from mako.template import Template
 
         assert os.path.exists(self._buildpath)
         logger.info("Create custom timing file for Minor CPU.")
@@ -297,14 +352,9 @@ custom_timings = [
 
         _FUtimings = timing_templ.render(insts=self._exts.instructions)
 
-        pythonbuildpath = os.path.join(self._buildpath, 'python')
-        if not os.path.exists(pythonbuildpath):
-            os.makedirs(pythonbuildpath)
-
-        timingfile = os.path.join(pythonbuildpath, 'minor_custom_timings.py')
-
-        with open(timingfile, 'w') as fh:
-            fh.write(_FUtimings)
+        timingfile = os.path.join(self._buildpath,
+                                  'python/minor_custom_timings.py')
+        write_if_changed(timingfile, _FUtimings)
 
     def create_regsintr(self):
         '''
@@ -312,6 +362,7 @@ custom_timings = [
         custom registers within the execute function of the
         gem5 decoded instruction.
         '''
+        from mako.template import Template
 
         intr_templ = Template(r"""<%
 %>\
@@ -333,18 +384,17 @@ val;})
 """)
         intr = intr_templ.render(regmap=self._regs.regmap)
 
-        genpath = os.path.join(self._buildpath, 'generated')
-        if not os.path.exists(genpath):
-            os.makedirs(genpath)
-
-        intrfile = os.path.join(genpath, 'regsintr.hh')
-        with open(intrfile, 'w') as fh:
-            fh.write(intr)
+        intrfile = os.path.join(self._buildpath, 'generated/regsintr.hh')
+        write_if_changed(intrfile, intr)
 
     @property
     def decoder(self):
         return self._decoder
 
+    @property
+    def deps(self):
+        return self._deps
+
     @property
     def extensions(self):
         return self._exts
@@ -30,6 +30,10 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# operands of the formats, that are used in binutils' opc parsing
+# d -> Rd, s -> Rs1, t -> Rs2, j -> imm
+OPERANDS = {'R': 'd,s,t', 'I': 'd,s,j'}
+
 
 class Instruction:
     '''
@@ -53,20 +57,10 @@ class Instruction:
         self._matchvalue = int(match.split()[-1], 16)
 
         # set right operands that are used in binutils' opc parsing
-        # d -> Rd
-        # s -> Rs1
-        # t -> Rs2
-        # j -> imm
-        if form == 'R':
-            # operands for Rd, Rs1, Rs2
-            self._operands = 'd,s,t'
-        elif form == 'I':
-            # operands for Rd, Rs1, imm
-            self._operands = 'd,s,j'
-        else:
+        self._operands = OPERANDS.get(form, '')
+        if form not in OPERANDS:
             logger.warn('Instruction format unnokwn. ' +
                         'Leaving operands field empty.')
-            self.operands = ''
 
     @property
     def cycles(self):
@@ -26,29 +26,89 @@
 #
 # Authors: Robert Scheffel
 
-import clang.cindex
 import logging
+import os
 import subprocess
-
-clang.cindex.Config.set_library_file('/usr/lib/llvm-4.0/lib/libclang-4.0.so.1')
+from distutils.spawn import find_executable
 
 from exceptions import ConsistencyError
+from frontend import CLANG_ARGS, index, load_cindex, parse_options
 
 logger = logging.getLogger(__name__)
 
+# arguments used to compile a model with g++
+GCC_ARGS = ['-fsyntax-only', '-Wall', '-std=c++11', '-c']
+# information of a parsed model that is needed to restore it
+METADATA = ['cycles', 'definition', 'form', 'funct3', 'funct7', 'name', 'opc']
+# globals of a model, that describe the encoding of the instruction
+FIELDS = ['cycles', 'funct3', 'funct7', 'opc']
+# major opcodes of the custom instructions
+OPCODES = [0x02, 0x0a, 0x16, 0x1e]
+
+
+def gcc_id():
+    '''
+    Identify the g++, that checks strict models, by its resolved location,
+    size and mtime.
+    '''
+    gcc = find_executable('g++')
+    if gcc is None:
+        return ''
+    gcc = os.path.realpath(gcc)
+    st = os.stat(gcc)
+    return '{}:{}:{}'.format(gcc, st.st_size, int(st.st_mtime))
+
+
+def unset_fields(form, variables):
+    '''
+    Encoding fields, that a model of the given form does not declare.
+    '''
+    fields = ['opc', 'funct3'] + (['funct7'] if form == 'R' else [])
+    return [field for field in fields if field not in variables]
+
 
 class Model:
     '''
     C++ Reference of the custom instruction.
     '''
 
-    def __init__(self, impl=None, read=False, write=False):
+    def __init__(self, impl=None, read=False, write=False, metadata=None,
+                 strict=False, pch=None, tu=None, function=None, source=None,
+                 allocate=False):
         '''
         Init method, that takes the location of
         the implementation as an argument.
+        Models are validated with the diagnostics of libclang. If strict
+        is set, they are additionally compiled with g++. A precompiled
+        header of the common includes can be given with pch.
+        An already parsed translation unit of impl can be given with tu.
+        If function is set, only this function of the file is the model,
+        see from_file. The content of impl can be given with source,
+        then the file is never read.
+        If allocate is set, opc, funct3 and funct7 may be omitted. They are
+        None, until an Allocator assigns a free encoding.
         '''
+        self._allocate = allocate
+
+        if metadata is not None:
+            # restore a model, that was parsed before
+            # json gives unicode, parsed models have str
+            self._cycles = metadata['cycles']
+            self._dfn = metadata['definition'].encode('utf-8')
+            self._form = str(metadata['form'])
+            self._funct3 = metadata['funct3']
+            self._funct7 = metadata['funct7']
+            self._name = str(metadata['name'])
+            self._opc = metadata['opc']
+            # only consistent models are stored
+            self._check_rd = True
+            self._check_rs1 = True
+            self._check_op2 = True
+            self._rettype = 'void'
+
+            self.check_consistency()
 
-        if impl is None:
+        elif impl is None:
             # we generate a model for read and write
             self._cycles = 1
             self._form = 'R'
@@ -79,13 +139,12 @@ class Model:
             self.check_consistency()
 
         else:
-            logger.info("Using libclang at %s" %
-                        clang.cindex.Config.library_file)
+            if tu is None:
+                if strict:
+                    self.compile_model(impl)
 
-            self.compile_model(impl)
-
-            index = clang.cindex.Index.create()
-            tu = index.parse(impl, ['-x', 'c++', '-c', '-std=c++11'])
+                tu = self.parse_file(impl, pch, source)
+                self.check_diagnostics(impl, tu)
 
             # information to retrieve form model
             self._cycles = 1            # cycle count for the instruction
@@ -100,20 +159,107 @@ class Model:
             self._check_rs1 = False     # check if rs1 is defined
             self._check_op2 = False
             self._rettype = ''
+            self._vars = set()          # found variable declarations
+            self._buffers = {}          # source contents by file name
+            if source is not None:
+                self._buffers[impl] = source
 
             logger.info("Parsing model @ %s" % impl)
 
-            self.parse_model(tu.cursor)
+            if function is None:
+                self.parse_model(tu.cursor)
+            else:
+                self.parse_function(tu.cursor, function)
+            # contents are only needed while parsing
+            self._buffers = {}
+            for field in unset_fields(self._form, self._vars):
+                setattr(self, '_' + field, None)
             self.check_consistency()
 
-    def compile_model(self, file):
+    @classmethod
+    def from_file(cls, impl, strict=False, pch=None, allocate=False):
+        '''
+        Parse all instructions of a model file with a single parse.
+        A file with one function and the globals opc, funct3, funct7 and
+        cycles describes one instruction. In a file with several functions
+        every function is an instruction and its globals are prefixed with
+        the function name, e.g. mac_opc. Unprefixed globals are used by all
+        functions, that do not define their own.
+        Returns the list of models in the order of the functions.
+        '''
+        if strict:
+            cls.compile_model(impl)
+
+        tu = cls.parse_file(impl, pch)
+        cls.check_diagnostics(impl, tu)
+
+        return cls.from_translation_unit(impl, tu, allocate=allocate)
+
+    @classmethod
+    def from_source(cls, name, source, pch=None):
+        '''
+        Parse all instructions of a model, that only exists in memory.
+        The name is used like a file name, e.g. to resolve includes.
+        Returns the list of models like from_file.
+        '''
+        if isinstance(source, unicode):
+            # extents are byte offsets
+            source = source.encode('utf-8')
+
+        tu = cls.parse_file(name, pch, source)
+        cls.check_diagnostics(name, tu)
+
+        return cls.from_translation_unit(name, tu, source)
+
+    @classmethod
+    def from_sources(cls, sources, pch=None):
+        '''
+        Parse the models of several (name, source) pairs.
+        Returns the models of all sources in the given order.
+        '''
+        return [model for (name, source) in sources
+                for model in cls.from_source(name, source, pch)]
+
+    @classmethod
+    def from_translation_unit(cls, impl, tu, source=None, allocate=False):
+        '''
+        Create the models of a parsed model file.
+        '''
+        return [cls(impl, tu=tu, function=function, source=source,
+                    allocate=allocate)
+                for function in cls.instructions(impl, tu)]
+
+    @classmethod
+    def instructions(cls, impl, tu):
+        '''
+        Functions of a parsed model file, that are instructions. A file
+        with a single instruction, that is described by unprefixed
+        globals, yields None instead of the function name.
+        '''
+        kind = load_cindex().CursorKind
+        functions = []
+        variables = set()
+        for node in tu.cursor.get_children():
+            if not cls.in_main_file(node, tu):
+                continue
+            if node.kind == kind.FUNCTION_DECL and node.is_definition() \
+                    and node.spelling not in functions:
+                functions.append(node.spelling)
+            if node.kind == kind.VAR_DECL:
+                variables.add(node.spelling)
+
+        prefixed = set(function + '_' + field
+                       for function in functions for field in FIELDS)
+        if len(functions) <= 1 and not variables & prefixed:
+            return [None]
+
+        logger.info('Instructions {} in {}'.format(functions, impl))
+        return functions
+
+    @staticmethod
+    def compile_model(file):
         logger.info('Compile model {}'.format(file))
-        p = subprocess.Popen([r'g++',
-                              '-fsyntax-only',
-                              '-Wall',
-                              '-std=c++11',
-                              '-c',
-                              file],
+        p = subprocess.Popen([r'g++'] + GCC_ARGS + [file],
                              stdout=subprocess.PIPE,
                              stderr=subprocess.PIPE)
         (_, ret) = p.communicate()
@@ -122,17 +268,114 @@ class Model:
             logger.error(ret)
             raise ConsistencyError(file, 'Compile error.')
 
-    def parse_model(self, node):
+    @staticmethod
+    def parse_file(file, pch=None, source=None):
+        '''
+        Parse a file with the shared index. If source is given,
+        it is used as the content of the file.
+        '''
+        unsaved = [(file, source)] if source is not None else None
+        if pch is not None:
+            try:
+                return index().parse(file,
+                                     CLANG_ARGS + ['-include-pch', pch],
+                                     unsaved_files=unsaved,
+                                     options=parse_options())
+            except load_cindex().TranslationUnitLoadError:
+                logger.warn('Precompiled header {} rejected'.format(pch))
+
+        return index().parse(file, CLANG_ARGS, unsaved_files=unsaved,
+                             options=parse_options())
+
+    @staticmethod
+    def check_diagnostics(file, tu):
+        '''
+        Check the diagnostics of the translation unit. Like the g++ check,
+        every error or warning enabled by -Wall fails the model.
+        '''
+        warning = load_cindex().Diagnostic.Warning
+        diags = [diag for diag in tu.diagnostics if diag.severity >= warning]
+
+        for diag in diags:
+            logger.error('{}:{}:{}: {}'.format(diag.location.file,
+                                               diag.location.line,
+                                               diag.location.column,
+                                               diag.spelling))
+
+        if diags:
+            raise ConsistencyError(file, 'Compile error.')
+
+    def parse_model(self, tu):
         '''
         Parse the model and search for all necessary information.
+        The tree is walked iteratively in source order and the walk stops,
+        as soon as all information was found.
+        '''
+        # skip everything, that is not located in the model itself,
+        # e.g. the declarations of included and system headers
+        stack = [child for child in tu.get_children()
+                 if self.in_main_file(child, tu)]
+        stack.reverse()
+        kind = load_cindex().CursorKind
+
+        while stack and not self.parsed():
+            node = stack.pop()
+
+            if node.kind == kind.COMPOUND_STMT:
+                # the outermost block is the function body
+                # nested blocks are part of it and need no traversal
+                self.extract_definition(node)
+                continue
+
+            self.parse_node(node)
+
+            children = list(node.get_children())
+            children.reverse()
+            stack.extend(children)
+
+    def parse_function(self, tu, function):
+        '''
+        Parse a single function of a file with several instructions.
+        Globals prefixed with the function name take precedence over
+        the unprefixed ones.
         '''
-        for child in node.get_children():
-            self.parse_model(child)
+        kind = load_cindex().CursorKind
+        shared = {}
+        own = {}
+
+        for node in tu.get_children():
+            if not self.in_main_file(node, tu):
+                continue
+
+            if node.kind == kind.VAR_DECL:
+                for field in FIELDS:
+                    if node.spelling == field:
+                        shared[field] = self.extract_value(node)
+                    if node.spelling == function + '_' + field:
+                        own[field] = self.extract_value(node)
+
+            if node.kind == kind.FUNCTION_DECL and \
+                    node.spelling == function and node.is_definition():
+                self.parse_node(node)
+                for child in node.get_children():
+                    if child.kind == kind.PARM_DECL:
+                        self.parse_node(child)
+                    if child.kind == kind.COMPOUND_STMT:
+                        self.extract_definition(child)
+
+        shared.update(own)
+        for (field, value) in shared.items():
+            setattr(self, '_' + field, value)
+            self._vars.add(field)
+
+    def parse_node(self, node):
+        '''
+        Retrieve the information of a single node.
+        '''
+        kind = load_cindex().CursorKind
 
         # only set name if it's unset
-        # due to parsing of included header the function definition occures
-        # twice
-        if node.kind == clang.cindex.CursorKind.FUNCTION_DECL \
+        if node.kind == kind.FUNCTION_DECL \
                 and self._name == '':
             # save name
             self._name = node.spelling
@@ -140,10 +383,7 @@ class Model:
             self._rettype = list(node.get_tokens())[0].spelling
             logger.info("Function name: {}".format(self._name))
 
-        if node.kind == clang.cindex.CursorKind.COMPOUND_STMT:
-            self.extract_definition(node)
-
-        if node.kind == clang.cindex.CursorKind.VAR_DECL:
+        if node.kind == kind.VAR_DECL:
             # process all variable declarations
             # opcode
             if node.spelling == 'opc':
@@ -161,8 +401,9 @@ class Model:
             if node.spelling == 'cycles':
                 logger.debug('Model cycles:')
                 self._cycles = self.extract_value(node)
+            self._vars.add(node.spelling)
 
-        if node.kind == clang.cindex.CursorKind.PARM_DECL:
+        if node.kind == kind.PARM_DECL:
             # process all parameter declarations
             # check if Rd and Rs1 exists
             if node.spelling.startswith('Rd'):
@@ -180,13 +421,33 @@ class Model:
                 self._form = 'I'
                 self._check_op2 = True
 
+    def parsed(self):
+        '''
+        Check whether all information of the model was found.
+        '''
+        required = set(['cycles', 'funct3', 'opc'])
+        if self._form == 'R':
+            required.add('funct7')
+
+        return self._name != '' and self._dfn != '' and \
+            self._check_rd and self._check_rs1 and self._check_op2 and \
+            required.issubset(self._vars)
+
+    @staticmethod
+    def in_main_file(node, tu):
+        '''
+        Check whether a node is located in the main file of the
+        translation unit.
+        '''
+        location = node.location.file
+        return location is not None and location.name == tu.spelling
+
     def extract_definition(self, node):
         '''
         Extract a function definition.
         '''
         filename = node.location.file.name
-        with open(filename, 'r') as fh:
-            contents = fh.read()
+        contents = self.read_source(filename)
 
         self._dfn = contents[node.extent.start.offset: node.extent.end.offset]
 
@@ -194,6 +455,17 @@ class Model:
             filename, node.location.line))
         logger.debug('Definition:\n%s' % self._dfn)
 
+    def read_source(self, filename):
+        '''
+        Read a source file once and reuse its contents.
+        Extents are byte offsets, so the file is read in binary mode.
+        '''
+        if filename not in self._buffers:
+            with open(filename, 'rb') as fh:
+                self._buffers[filename] = fh.read()
+
+        return self._buffers[filename]
+
     def extract_value(self, node):
         '''
         Extract a variable value.
@@ -228,14 +500,20 @@ class Model:
             raise ConsistencyError(
                 self._rettype, 'Function has to be of type void.')
 
-        if self._opc not in [0x02, 0x0a, 0x16, 0x1e]:
+        # omitted fields are only allowed, if they are allocated
+        for field in ['opc', 'funct3', 'funct7']:
+            if getattr(self, '_' + field) is None and not self._allocate:
+                raise ValueError(field, 'Missing {}.'.format(field))
+
+        if self._opc is not None and self._opc not in OPCODES:
             raise ValueError(self._opc, 'Invalid opcode.')
 
         # funct3 --> 3 bits
-        if self._funct3 > 0x7:
+        if self._funct3 is not None and self._funct3 > 0x7:
             raise ValueError(self._funct3, 'Invalid funct3.')
         # funct7 --> 7 bits
-        if self._form == 'R' and self._funct7 > 0x7f:
+        if self._form == 'R' and self._funct7 is not None and \
+                self._funct7 > 0x7f:
             raise ValueError(self._funct7, 'Invalid funct7.')
 
         # check, if cycles where added
@@ -252,6 +530,17 @@ class Model:
 
         logger.info('Model meets requirements')
 
+    @property
+    def allocated(self):
+        '''
+        Whether all encoding fields of the model are set.
+        '''
+        return None not in (self._opc, self._funct3, self._funct7)
+
+    @property
+    def metadata(self):
+        return dict((key, getattr(self, key)) for key in METADATA)
+
     @property
     def cycles(self):
         return self._cycles
@@ -0,0 +1,168 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# riscv-opcodes checkout next to this project
+RV_OPC = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                      '../../riscv-opcodes')
+# fixed bit fields (msb, lsb), that the index decides on in this order:
+# the major opcode, funct3 and funct7
+LEVELS = [(6, 0), (14, 12), (31, 25)]
+# files of riscv-opcodes with the instructions of the base isa, the
+# pseudo instructions are aliases and opcodes-custom only reserves the
+# custom opcodes for the instructions, that are generated here
+BASE_OPCODES = ['opcodes', 'opcodes-rvc']
+
+
+def field(value, msb, lsb):
+    return (value >> lsb) & ((1 << (msb - lsb + 1)) - 1)
+
+
+def parse_opcodes_line(line):
+    '''
+    Name, match and mask of a line of a riscv-opcodes file or None,
+    if the line has no instruction.
+    '''
+    tokens = line.split('#', 1)[0].split()
+    if not tokens or tokens[0].startswith('@'):
+        # empty or pseudo instruction
+        return None
+
+    match = 0
+    mask = 0
+    for token in tokens[1:]:
+        if '=' not in token:
+            # operand
+            continue
+        (bits, value) = token.split('=', 1)
+        if value == 'ignore':
+            continue
+        if '..' in bits:
+            (msb, lsb) = [int(bit) for bit in bits.split('..')]
+        else:
+            msb = lsb = int(bits)
+        match |= int(value, 0) << lsb
+        mask |= ((1 << (msb - lsb + 1)) - 1) << lsb
+    return tokens[0], match, mask
+
+
+def read_opcodes(filename):
+    '''
+    All instructions of a riscv-opcodes file.
+    '''
+    with open(filename, 'r') as fh:
+        lines = fh.readlines()
+    return [parsed for parsed in (parse_opcodes_line(line) for line in lines)
+            if parsed is not None]
+
+
+class OpcodeIndex:
+    '''
+    Decision trie over the fixed bit fields of instruction encodings.
+    Every level branches on the value of a field. Entries, that do not fix
+    all bits of a field, are kept in a wildcard branch. Looking for
+    overlaps only visits the branches, that can match, so checking n
+    instructions takes near linear time instead of comparing all pairs.
+    '''
+
+    def __init__(self):
+        self._root = {}
+        self._size = 0
+
+    def add(self, name, match, mask, origin=None):
+        '''
+        Add an encoding. The origin tells, where it comes from, e.g. the
+        riscv-opcodes file.
+        '''
+        node = self._root
+        for (msb, lsb) in LEVELS[:-1]:
+            node = node.setdefault(self.key(match, mask, msb, lsb), {})
+        # the last level holds the entries
+        (msb, lsb) = LEVELS[-1]
+        node.setdefault(self.key(match, mask, msb, lsb), []).append(
+            (name, match, mask, origin))
+        self._size += 1
+
+    def add_file(self, filename):
+        '''
+        Add all instructions of a riscv-opcodes file.
+        '''
+        for (name, match, mask) in read_opcodes(filename):
+            self.add(name, match, mask, os.path.basename(filename))
+
+    def add_base(self, rv_opc):
+        '''
+        Add the base isa of a riscv-opcodes checkout, if it exists.
+        '''
+        for base in BASE_OPCODES:
+            filename = os.path.join(rv_opc, base)
+            if os.path.isfile(filename):
+                self.add_file(filename)
+            else:
+                logger.info('No base instructions in {}'.format(filename))
+
+    @staticmethod
+    def key(match, mask, msb, lsb):
+        '''
+        The branch of an encoding at a level, None if the field is not
+        fixed completely.
+        '''
+        bits = (1 << (msb - lsb + 1)) - 1
+        if field(mask, msb, lsb) != bits:
+            return None
+        return field(match, msb, lsb)
+
+    def overlaps(self, match, mask):
+        '''
+        All entries, for which an instruction word exists, that matches
+        both the entry and the given encoding.
+        '''
+        nodes = [self._root]
+        for (msb, lsb) in LEVELS:
+            key = self.key(match, mask, msb, lsb)
+            branches = []
+            for node in nodes:
+                if key is None:
+                    # the encoding is a wildcard on this field itself
+                    branches.extend(node.values())
+                    continue
+                if key in node:
+                    branches.append(node[key])
+                if None in node:
+                    branches.append(node[None])
+            nodes = branches
+
+        return [entry for entries in nodes for entry in entries
+                if (match & entry[2]) == (entry[1] & mask)]
+
+    def __len__(self):
+        return self._size
@@ -0,0 +1,221 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import contextlib
+import errno
+import filecmp
+import logging
+import os
+import shutil
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def makedirs(path):
+    '''
+    Create a directory and its parents, if they do not exist.
+    '''
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def read_file(path):
+    '''
+    Content of a file or None, if it does not exist.
+    '''
+    try:
+        with open(path, 'rb') as fh:
+            return fh.read()
+    except IOError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return None
+
+
+@contextlib.contextmanager
+def replacing(path):
+    '''
+    Name of a temporary file next to path, that replaces path at the end
+    of the with statement, so that no partially written file can ever be
+    read. A new file gets the mode given by the umask, an existing file
+    keeps its mode. On errors, the temporary file is removed.
+    '''
+    dirname = os.path.dirname(os.path.abspath(path))
+    makedirs(dirname)
+
+    fd, tmp = tempfile.mkstemp(dir=dirname)
+    os.close(fd)
+    try:
+        yield tmp
+        if os.path.exists(path):
+            shutil.copymode(path, tmp)
+        else:
+            os.chmod(tmp, 0o666 & ~UMASK)
+        os.rename(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def write_file(path, content):
+    '''
+    Write content to a file, see replacing.
+    '''
+    if isinstance(content, unicode):
+        content = content.encode('utf-8')
+    with replacing(path) as tmp:
+        with open(tmp, 'wb') as fh:
+            fh.write(content)
+
+
+def write_if_changed(path, content):
+    '''
+    Write content to a file, unless the file already has exactly this
+    content. An unchanged file keeps its mtime, so that make and scons do
+    not rebuild anything that depends on it. Returns whether the file was
+    written.
+    '''
+    if isinstance(content, unicode):
+        content = content.encode('utf-8')
+    if read_file(path) == content:
+        logger.debug('{} is unchanged'.format(path))
+        return False
+
+    write_file(path, content)
+    logger.info('Write {}'.format(path))
+    return True
+
+
+def copy_if_changed(src, dst):
+    '''
+    Copy a file, unless the destination already has the same content.
+    Returns whether the file was copied.
+    '''
+    if os.path.isfile(dst) and filecmp.cmp(src, dst, shallow=False):
+        logger.debug('{} is unchanged'.format(dst))
+        return False
+
+    with open(src, 'rb') as fh:
+        return write_if_changed(dst, fh.read())
+
+
+def inserted(content, original):
+    '''
+    Lines, that were inserted into the original as one block to give
+    the content, or None, if the content is no such extension of it.
+    '''
+    lines = content.splitlines(True)
+    old = original.splitlines(True)
+    count = len(lines) - len(old)
+    if count < 0:
+        return None
+
+    i = 0
+    while i < len(old) and lines[i] == old[i]:
+        i += 1
+    if lines[i + count:] != old[i:]:
+        return None
+    return lines[i:i + count]
+
+
+def original(path, patched):
+    '''
+    Original content of a file, that is patched in place. It is kept in
+    a copy next to the file with the suffix _old. If the file is not the
+    copy plus a patch, as checked by patched(content, original), e.g.
+    because it was updated upstream, the file itself is the original.
+    '''
+    content = read_file(path)
+    kept = read_file(path + '_old')
+    if kept is not None and content is not None and \
+            not patched(content, kept):
+        logger.info('{} changed since it was copied'.format(path))
+        return content
+    return content if kept is None else kept
+
+
+def snapshot(path, patched):
+    '''
+    Keep the original content of a file, before it is patched in place,
+    and return it. See original.
+    '''
+    content = original(path, patched)
+    if write_if_changed(path + '_old', content):
+        logger.info('Copy original {}'.format(path))
+    return content
+
+
+def sync_tree(src, dst, keep=()):
+    '''
+    Copy all files of the directory src to dst, that are new or differ.
+    Files in dst, that are not in src, are removed, unless their path
+    relative to dst is in keep. Returns the list of copied files.
+    '''
+    copied = []
+    for root, dirs, files in os.walk(src):
+        dirs.sort()
+        target = os.path.join(dst, os.path.relpath(root, src))
+        for file in sorted(files):
+            if copy_if_changed(os.path.join(root, file),
+                               os.path.join(target, file)):
+                copied.append(os.path.join(target, file))
+
+    for root, dirs, files in os.walk(dst, topdown=False):
+        source = os.path.join(src, os.path.relpath(root, dst))
+        for file in files:
+            name = os.path.normpath(
+                os.path.relpath(os.path.join(root, file), dst))
+            if name in keep or os.path.isfile(os.path.join(source, file)):
+                continue
+            logger.info('Remove {}'.format(os.path.join(root, file)))
+            os.remove(os.path.join(root, file))
+        if root != dst and not os.listdir(root) and \
+                not os.path.isdir(source):
+            os.rmdir(root)
+    return copied
+
+
+def umask():
+    '''
+    Current umask of the process. It can only be read by setting it, so
+    it must not be called, while other threads create files.
+    '''
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# read once on import, files are written from several threads
+UMASK = umask()
@@ -26,35 +26,129 @@
 #
 # Authors: Robert Scheffel
 
+import functools
 import logging
-import os
-
-from stat import *
+import multiprocessing
+import threading
 
+from allocator import Allocator
+from bundle import Bundle
+from cache import ModelCache
 from compiler import Compiler
+from depgraph import DepGraph
+from discovery import Discovery
+from exceptions import ConsistencyError
 from extensions import Extensions
+from frontend import Preamble
 from gem5 import Gem5
 from model import Model
+from profiler import stage, timed
 from registers import Registers
+from scanner import Scanner
+from unity import UnityCheck
 
 logger = logging.getLogger(__name__)
 
 
+def parse_model(impl, preambles=(), fast=False, allocate=False):
+    '''
+    Parse all instructions of a model file. Errors are returned instead of
+    raised, so that they can be reported per file, when run in a worker
+    process. With fast set, the file is scanned without libclang first.
+    With allocate set, the encoding fields may be omitted.
+    The first of the built preambles, whose headers the model includes
+    itself, is used as precompiled header.
+    '''
+    pch = None
+    for preamble in preambles:
+        if preamble.pch is not None and preamble.covers(impl):
+            pch = preamble.pch
+            break
+
+    if fast:
+        scanned = Scanner(impl).scan()
+        if scanned is not None:
+            try:
+                return [Model(metadata=metadata, allocate=allocate)
+                        for metadata in scanned], None
+            except (ConsistencyError, ValueError):
+                # libclang reports the error
+                pass
+
+    try:
+        return Model.from_file(impl, pch=pch, allocate=allocate), None
+    except Exception as e:
+        return None, e
+
+
+def run_concurrently(stages):
+    '''
+    Run the given (name, function) stages in threads and wait for all of
+    them. Returns the errors of the failed stages in the order of the
+    stages.
+    '''
+    errors = {}
+
+    def run(name, func):
+        try:
+            with stage(name):
+                func()
+        except Exception as e:
+            logger.error('Stage {} failed: {}'.format(name, e))
+            errors[name] = e
+
+    threads = [threading.Thread(target=run, name=name, args=(name, func))
+               for (name, func) in stages]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return [errors[name] for (name, func) in stages if name in errors]
+
+
 class Parser:
     '''
     This class stepwise calls all the functions necessary to parse modules
     and retrieve the information necessary to extend gnu binutils and gem5.
     '''
 
-    def __init__(self, tcpath, modelpath):
-        self._compiler = Compiler(None, None, tcpath)
-        self._gem5 = Gem5([], None)
+    def __init__(self, tcpath, modelpath, cachepath=None, jobs=None,
+                 strict=False, fast=False, profiler=None, depspath=None,
+                 lockpath=None):
+        '''
+        The modelpath is a model file, a directory or a list of both.
+        Stages and models are timed by the given profiler, if any.
+        If depspath is set, only the artifacts, whose
+        inputs changed since the last run, are generated.
+        If lockpath is set, models may omit their encoding. Free encodings
+        are assigned to them and recorded in the lock file.
+        '''
+        self._allocator = Allocator(lockpath) if lockpath else None
+        self._cache = ModelCache(cachepath, strict, fast,
+                                 self._allocator is not None) \
+            if cachepath else None
+        self._cachepath = cachepath
+        self._deps = DepGraph(depspath)
+        self._compiler = Compiler(None, None, tcpath, self._deps)
+        self._gem5 = Gem5([], None, self._deps)
         self._exts = None
+        self._fast = fast
+        self._jobs = jobs or multiprocessing.cpu_count()
+        self._modelfiles = []
         self._models = []
+        self._parsed = {}
+        self._preambles = None
+        self._profiler = profiler
+        self._regfiles = []
         self._regs = Registers()
+        self._strict = strict
         self._modelpath = modelpath
         self._tcpath = tcpath
 
+        if self._profiler is not None:
+            self._profiler.activate()
+
     def restore(self):
         '''
         Restore the toolchain to its defaults.
@@ -67,71 +161,217 @@ class Parser:
     def parse_models(self):
         '''
         Parse the c++ reference implementation
-        of the custom instruction.
+        of the custom instruction. Can be called again, models of files
+        that were not forgotten in between are not parsed again.
         '''
+        if self._profiler is not None:
+            # only the last run is kept, when parsing again and again
+            self._profiler.reset()
+        self._modelfiles = []
+        self._models = []
+        self._regfiles = []
+        self._regs = Registers()
 
-        logger.info('Determine if modelpath is a folder or a single file')
-        if os.path.isdir(self._modelpath):
-            # restore the toolchain to its defaults
-            self.restore()
-            logger.info('Traverse over directory')
+        # no restore necessary, the toolchain files are always
+        # extended from their originals
+        logger.info('Search the model roots')
+        with stage('treewalk'):
             self.treewalk(self._modelpath)
-        else:
-            logger.info('Single file, start parsing')
-            model = Model(self._modelpath)
-            self._models.append(model)
+
+        with stage('models'):
+            self._models.extend(self.load_models(self._modelfiles))
 
         # add model for read function
         self._models.append(Model(read=True))
         # add model for write function
         self._models.append(Model(write=True))
 
-        self._exts = Extensions(self._models)
-        self._compiler = Compiler(self._exts, self._regs, self._tcpath)
-        self._gem5 = Gem5(self._exts, self._regs)
+        if self._allocator is not None:
+            with stage('allocate'):
+                self.allocate()
+
+        with stage('extensions'):
+            self._exts = Extensions(self._models)
+        self._compiler = Compiler(self._exts, self._regs, self._tcpath,
+                                  self._deps)
+        self._gem5 = Gem5(self._exts, self._regs, self._deps)
+
+    def allocate(self):
+        '''
+        Assign free encodings to the models, that omit them. Models of the
+        same file are related.
+        '''
+        files = [file for file in self._modelfiles
+                 for model in self._parsed.get(file, [])]
+        files.extend([None] * (len(self._models) - len(files)))
+        self._models = self._allocator.allocate(self._models, files)
+        self._allocator.save()
+
+    def forget(self, files):
+        '''
+        Drop the models of changed files, so that they are parsed again
+        by the next call of parse_models. If registers changed, all
+        models are parsed again, because they may use them.
+        '''
+        if any(file.endswith('registers.hh') for file in files):
+            self._parsed = {}
+            self._preambles = None
+        for file in files:
+            self._parsed.pop(file, None)
+
+    def load_bundle(self, path):
+        '''
+        Restore the parsed models, registers and instructions from a bundle
+        instead of parsing the models.
+        '''
+        with stage('bundle'):
+            (self._exts, self._regs) = Bundle(path).load(self._modelpath)
+        self._models = self._exts.models
+
+        self._compiler = Compiler(self._exts, self._regs, self._tcpath,
+                                  self._deps)
+        self._gem5 = Gem5(self._exts, self._regs, self._deps)
+
+    def save_bundle(self, path):
+        '''
+        Write the parsed models, registers and instructions to a bundle.
+        '''
+        with stage('bundle'):
+            Bundle(path).save(self._modelpath, self._exts, self._regs)
 
     def treewalk(self, top):
-        logger.info('Search for models in {}'.format(top))
-        logger.debug('Directory content: {}'.format(os.listdir(top)))
-        for file in os.listdir(top):
-            pathname = os.path.join(top, file)
-            mode = os.stat(pathname)[ST_MODE]
-
-            if S_ISDIR(mode):
-                # directory
-                self.treewalk(pathname)
-            elif S_ISREG(mode):
-                # file
-                if pathname.endswith('.cc'):
-                    logger.info(
-                        'Model definition in file {}'.format(pathname))
-                    model = Model(pathname)
-
-                    self._models.append(model)
-                # registers
-                if pathname.endswith('registers.hh'):
-                    logger.info('Custom registers in file {}'.format(pathname))
-                    self._regs.parse_file(pathname)
+        '''
+        Collect the model and register files of one or more model roots.
+        '''
+        (models, registers) = Discovery(top).discover()
+        for pathname in registers:
+            self._regs.parse_file(pathname)
+            self._regfiles.append(pathname)
+        self._modelfiles.extend(models)
+
+    def load_models(self, files):
+        '''
+        Take models parsed earlier by this parser or restore them from the
+        cache and parse the remaining ones.
+        With more than one job, models are parsed in a process pool.
+        The models are returned in the order of the given files and
+        within a file in the order of its functions.
+        '''
+        models = [None] * len(files)
+
+        pending = []
+        with stage('cache'):
+            for i, impl in enumerate(files):
+                models[i] = self._parsed.get(impl)
+                if models[i] is None and self._cache is not None:
+                    models[i] = self._cache.load(impl)
+                if models[i] is None:
+                    pending.append(i)
+
+        impls = [files[i] for i in pending]
+        if impls and self._strict:
+            # one g++ run for all models instead of one per model
+            with stage('g++'):
+                UnityCheck(impls).check()
+        if impls and self._cachepath and self._preambles is None:
+            # common headers are precompiled once for all models, with
+            # the registers of every model root and without registers
+            with stage('preamble'):
+                self._preambles = [Preamble(self._cachepath, regfile)
+                                   for regfile in self._regfiles + [None]]
+                for preamble in self._preambles:
+                    preamble.build()
+        parse = functools.partial(timed, parse_model,
+                                  preambles=self._preambles or (),
+                                  fast=self._fast,
+                                  allocate=self._allocator is not None)
+        jobs = min(self._jobs, len(impls))
+        with stage('parse', jobs=jobs):
+            if jobs > 1:
+                logger.info('Parse {} models with {} jobs'.format(
+                    len(impls), jobs))
+                pool = multiprocessing.Pool(jobs)
+                try:
+                    results = pool.map(parse, impls)
+                finally:
+                    pool.close()
+                    pool.join()
             else:
-                # unknown file type
-                logger.info('Unknown file type, skip')
+                results = [parse(impl) for impl in impls]
+
+        errors = []
+        for i, result in zip(pending, results):
+            ((parsed, error), start, wall, cpu, pid) = result
+            if self._profiler is not None:
+                self._profiler.add(files[i], 'model', start, wall, cpu, pid)
+            if error is not None:
+                logger.error('Model {}: {}'.format(files[i], error))
+                errors.append(error)
+                continue
+
+            models[i] = parsed
+            if self._cache is not None:
+                with stage('cache'):
+                    self._cache.store(files[i], parsed)
+
+        # remember the parsed models, also if others failed
+        self._parsed = dict((file, parsed)
+                            for (file, parsed) in zip(files, models)
+                            if parsed is not None)
+
+        if errors:
+            # all errors are reported, raise the first one
+            raise errors[0]
+
+        return [model for parsed in models for model in parsed]
+
+    def extend(self, compiler=True, gem5=True):
+        '''
+        Extend the riscv compiler and the gem5 simulator at the same time.
+        Both only read the extensions and registers. The errors of all
+        stages are reported, the first one is raised.
+        '''
+        stages = []
+        if compiler:
+            stages.append(('compiler', self._compiler.extend_compiler))
+        if gem5:
+            stages.append(('gem5', self._gem5.extend_gem5))
+
+        errors = run_concurrently(stages)
+        # artifacts of successful stages are recorded anyway
+        self._deps.save()
+
+        if errors:
+            raise errors[0]
 
     def extend_compiler(self):
         '''
         Extend the riscv compiler.
         '''
-        self._compiler.extend_compiler()
+        with stage('compiler'):
+            self._compiler.extend_compiler()
+        self._deps.save()
 
     def extend_gem5(self):
         '''
         Extend the gem5 simulator.
         '''
-        self._gem5.extend_gem5()
+        with stage('gem5'):
+            self._gem5.extend_gem5()
+        self._deps.save()
+
+    @property
+    def allocator(self):
+        return self._allocator
 
     @property
     def args(self):
         return self._args
 
+    @property
+    def cache(self):
+        return self._cache
+
     @property
     def compiler(self):
         return self._compiler
@@ -140,14 +380,50 @@ class Parser:
     def decoder(self):
         return self._gem5
 
+    @property
+    def deps(self):
+        return self._deps
+
     @property
     def extensions(self):
         return self._exts
 
+    @property
+    def fast(self):
+        return self._fast
+
+    @property
+    def jobs(self):
+        return self._jobs
+
+    @property
+    def modelfiles(self):
+        return self._modelfiles
+
+    @property
+    def modelpath(self):
+        return self._modelpath
+
     @property
     def models(self):
         return self._models
 
+    @property
+    def profiler(self):
+        return self._profiler
+
     @property
     def regs(self):
         return self._regs
+
+    @property
+    def strict(self):
+        return self._strict
+
+    @property
+    def tcpath(self):
+        return self._tcpath
+
+    @property
+    def timings(self):
+        return self._profiler.timings() if self._profiler else None
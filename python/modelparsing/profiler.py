@@ -0,0 +1,212 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+from output import replacing, write_file
+
+logger = logging.getLogger(__name__)
+
+# profiler, that records the stages of the current run
+_active = None
+
+
+def cpu_time():
+    '''
+    CPU time of this process and its finished children, e.g. g++,
+    parse-opcodes or the workers of a process pool.
+    '''
+    t = os.times()
+    return t[0] + t[1] + t[2] + t[3]
+
+
+def timed(func, *args, **kwargs):
+    '''
+    Call func and return its result together with the start time,
+    wall time, cpu time and the process id. Can be run in a worker process.
+    '''
+    start = time.time()
+    cpu = cpu_time()
+    result = func(*args, **kwargs)
+    return (result, start, time.time() - start, cpu_time() - cpu,
+            os.getpid())
+
+
+@contextlib.contextmanager
+def stage(name, **args):
+    '''
+    Record a stage with the active profiler. Does nothing,
+    if no profiler is active.
+    '''
+    if _active is None:
+        yield
+    else:
+        with _active.stage(name, **args):
+            yield
+
+
+class Profiler:
+    '''
+    Records the wall and cpu times of the stages of a run and of every
+    parsed model. The timings can be written as JSON or as a Chrome
+    trace event file, optionally together with a cProfile dump.
+    '''
+
+    def __init__(self):
+        self._origin = time.time()
+        self._cpu = cpu_time()
+        self._events = []
+        self._cprofile = None
+
+    def reset(self):
+        '''
+        Drop all timings, e.g. before the next build of a long running
+        process, so that only the timings of the last build are kept.
+        '''
+        self._origin = time.time()
+        self._cpu = cpu_time()
+        self._events = []
+
+    def activate(self):
+        '''
+        Make this the profiler, that records all stages.
+        '''
+        global _active
+        _active = self
+
+    @contextlib.contextmanager
+    def stage(self, name, **args):
+        '''
+        Record the time spent in the body of the with statement.
+        '''
+        start = time.time()
+        cpu = cpu_time()
+        try:
+            yield
+        finally:
+            self.add(name, 'stage', start, time.time() - start,
+                     cpu_time() - cpu, args=args)
+
+    def add(self, name, category, start, wall, cpu, pid=None, args=None):
+        '''
+        Add a timing, that was measured elsewhere, e.g. in a worker.
+        '''
+        # concurrent stages of this process are told apart by thread
+        tid = pid or threading.current_thread().ident
+        self._events.append({'name': name,
+                             'category': category,
+                             'start': start - self._origin,
+                             'wall': wall,
+                             'cpu': cpu,
+                             'pid': pid or os.getpid(),
+                             'tid': tid,
+                             'args': args or {}})
+
+    def timings(self):
+        '''
+        Summary of all timings: the totals, the accumulated times of the
+        stages and the times of the single models.
+        '''
+        stages = {}
+        models = {}
+        for event in self._events:
+            if event['category'] == 'model':
+                models[event['name']] = {'wall': event['wall'],
+                                         'cpu': event['cpu']}
+                continue
+            entry = stages.setdefault(event['name'],
+                                      {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+            entry['wall'] += event['wall']
+            entry['cpu'] += event['cpu']
+            entry['calls'] += 1
+
+        return {'total': {'wall': time.time() - self._origin,
+                          'cpu': cpu_time() - self._cpu},
+                'stages': stages,
+                'models': models}
+
+    def trace(self):
+        '''
+        The timings as Chrome trace events, see chrome://tracing.
+        '''
+        events = []
+        for event in self._events:
+            events.append({'name': event['name'],
+                           'cat': event['category'],
+                           'ph': 'X',
+                           'ts': int(event['start'] * 1e6),
+                           'dur': int(event['wall'] * 1e6),
+                           'pid': event['pid'],
+                           'tid': event['tid'],
+                           'args': dict(event['args'], cpu=event['cpu'])})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def enable_cprofile(self):
+        '''
+        Additionally profile all function calls with cProfile.
+        '''
+        import cProfile
+        self._cprofile = cProfile.Profile()
+        self._cprofile.enable()
+
+    def write_cprofile(self, path):
+        '''
+        Stop cProfile and dump its statistics.
+        '''
+        if self._cprofile is None:
+            return
+        self._cprofile.disable()
+        with replacing(path) as tmp:
+            self._cprofile.dump_stats(tmp)
+        logger.info('cProfile statistics written to {}'.format(path))
+
+    def write_json(self, path):
+        '''
+        Write the timings as JSON.
+        '''
+        self.write(path, self.timings())
+        logger.info('Timings written to {}'.format(path))
+
+    def write_trace(self, path):
+        '''
+        Write the timings as Chrome trace events.
+        '''
+        self.write(path, self.trace())
+        logger.info('Trace written to {}'.format(path))
+
+    def write(self, path, data):
+        write_file(path, json.dumps(data, indent=1, sort_keys=True))
+
+    @property
+    def events(self):
+        return self._events
@@ -29,46 +29,70 @@
 import logging
 import re
 
+from exceptions import ConsistencyError
+
 logger = logging.getLogger(__name__)
 
+# a define of a custom register, its address has three hex digits
+REGISTER_DEFINE = re.compile(r"^[#]define\s([\w_-]+)\s+(0x[0-9a-fA-F]{3})$")
+# any define of a register file
+DEFINE = re.compile(r"^[#]define\s+([\w_-]+)\s+(\S+)\s*$")
+
+
+def defines(lines):
+    '''
+    Defines of the lines of a register file as tuples of line number,
+    name, value and address. The address is None, if the define is no
+    register, e.g. a macro or an address without three hex digits.
+    '''
+    for (number, line) in enumerate(lines, 1):
+        match = DEFINE.match(line)
+        if match is None:
+            continue
+        register = REGISTER_DEFINE.match(line)
+        address = int(register.group(2), 16) if register else None
+        yield (number, match.group(1), match.group(2), address)
+
 
 class Registers:
     '''
     Defined custom registers.
     '''
 
-    def __init__(self):
+    def __init__(self, regmap=None):
         '''
         Init method, that takes the location of
         the register file as an argument.
+        A known register map can be given with regmap.
         '''
-        self._regmap = {}
+        self._regmap = dict(regmap) if regmap else {}
+        # file, that defines a register
+        self._origins = {}
 
     def parse_file(self, file):
         '''
         Parse the file and search for all necessary information.
+        The registers of several files, e.g. of several model roots, are
+        merged. A register must not be defined in more than one file.
         '''
         logger.info("Parsing register file @ %s" % file)
 
         with open(file, 'r') as fh:
             content = fh.readlines()
 
-        regs = []
-        prog = re.compile(r"^[#]define\s([\w_-]+)\s+(0x[0-9a-fA-F]{3})$")
-
-        for line in content:
-            match = prog.match(line)
-            if match:
-                logger.debug("Defined register: {}".format(match.group()))
-                regs.append(match)
-
-        self._regmap = {}
-
-        for match in regs:
-            self._regmap[match.group(1)] = int(match.group(2), 16)
+        for (number, name, value, address) in defines(content):
+            if address is None:
+                continue
+            logger.debug("Defined register: {} {}".format(name, value))
+            origin = self._origins.setdefault(name, file)
+            if origin != file:
+                raise ConsistencyError(
+                    file, 'Register {} already defined in {}.'.format(
+                        name, origin))
+            self._regmap[name] = address
 
-        # TODO: check if defined indexes are within the right range
-        # 0x800 - 0x8ff or 0xcc0 - 0xcff
+        # the ranges 0x800 - 0x8ff and 0xcc0 - 0xcff are checked by
+        # the Validator
 
     @property
     def regmap(self):
@@ -0,0 +1,346 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import logging
+import re
+
+from model import FIELDS, unset_fields
+
+logger = logging.getLogger(__name__)
+
+# tokens of a model file, everything else is a single character
+TOKEN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<directive>\#(?:\\\n|[^\n])*)
+  | (?P<string>[LuU8]*R?"(?:\\.|[^"\\\n])*"|[LuU8]*'(?:\\.|[^'\\\n])*')
+  | (?P<number>\.?[0-9](?:[eEpP][+-]|[0-9A-Za-z_.'])*)
+  | (?P<ident>[A-Za-z_][A-Za-z_0-9]*)
+  | (?P<punct>::|.)
+''', re.S | re.X)
+
+
+class UnknownSyntax(Exception):
+    # raised, if the scanner finds something it does not understand
+    pass
+
+
+class Scanner:
+    '''
+    Fast scanner for model files, that does not need libclang.
+    Only the constrained format of a model is understood: includes,
+    global variables initialized with a number and function definitions.
+    For everything else no metadata is returned and the model has to be
+    parsed by libclang. The model is not compiled, so diagnostics are
+    only found by libclang or a strict check.
+    '''
+
+    def __init__(self, impl):
+        self._impl = impl
+        with open(impl, 'rb') as fh:
+            self._source = fh.read()
+
+        self.reset()
+
+    def reset(self):
+        '''
+        Forget the information of the last scanned instruction.
+        '''
+        # same information as gathered by the model
+        self._cycles = 1
+        self._dfn = ''
+        self._form = ''
+        self._funct3 = 0xff
+        self._funct7 = 0xff
+        self._name = ''
+        self._opc = 0x0
+        self._check_rd = False
+        self._check_rs1 = False
+        self._check_op2 = False
+        self._rettype = ''
+        self._vars = set()
+
+    def tokens(self):
+        '''
+        Split the source into (kind, spelling, offset) tuples.
+        Whitespace and comments are dropped.
+        '''
+        pos = 0
+        while pos < len(self._source):
+            match = TOKEN.match(self._source, pos)
+            kind = match.lastgroup
+            if kind == 'directive':
+                # directives have to start a line
+                line = self._source.rfind('\n', 0, pos) + 1
+                if self._source[line:pos].strip():
+                    raise UnknownSyntax('# inside of a line')
+            if kind == 'string' and match.group().lstrip('LuU8')[0] == 'R':
+                # braces in raw strings are not matched
+                raise UnknownSyntax('raw string literal')
+            if kind not in ('space', 'comment'):
+                yield (kind, match.group(), pos)
+            pos = match.end()
+
+    def declarations(self):
+        '''
+        Split the model into its top level declarations and yield them
+        in the order libclang visits them:
+        ('var', name, value), ('function', name, rettype),
+        ('parm', name) and ('body', definition).
+        '''
+        tokens = list(self.tokens())
+        i = 0
+        while i < len(tokens):
+            (kind, spelling, _) = tokens[i]
+            if kind == 'directive':
+                if not re.match(r'#\s*include\b', spelling):
+                    raise UnknownSyntax(spelling)
+                i += 1
+                continue
+
+            # leading type of the declaration
+            start = i
+            while i < len(tokens) and (tokens[i][0] == 'ident' or
+                                       tokens[i][1] == '::'):
+                i += 1
+            if i - start < 2 or i == len(tokens) or \
+                    tokens[i - 1][0] != 'ident':
+                raise UnknownSyntax(spelling)
+            name = tokens[i - 1][1]
+
+            if tokens[i][1] == '=':
+                # global variable, that is initialized with a number
+                if i + 2 >= len(tokens) or tokens[i + 1][0] != 'number' \
+                        or tokens[i + 2][1] != ';':
+                    raise UnknownSyntax(name)
+                try:
+                    value = int(tokens[i + 1][1], 0)
+                except ValueError:
+                    raise UnknownSyntax(tokens[i + 1][1])
+                yield ('var', name, value)
+                i += 3
+
+            elif tokens[i][1] == '(':
+                # function definition
+                yield ('function', name, spelling)
+                (parms, i) = self.parameters(tokens, i + 1)
+                for parm in parms:
+                    yield ('parm', parm)
+                if i == len(tokens) or tokens[i][1] != '{':
+                    raise UnknownSyntax(name)
+                (dfn, i) = self.body(tokens, i)
+                yield ('body', dfn)
+
+            else:
+                raise UnknownSyntax(name)
+
+    def parameters(self, tokens, i):
+        '''
+        Collect the parameter names up to the closing parenthesis.
+        '''
+        parms = []
+        parm = []
+        while i < len(tokens):
+            (kind, spelling, _) = tokens[i]
+            i += 1
+            if spelling in (',', ')'):
+                if len(parm) > 1 and parm[-1][0] == 'ident':
+                    parms.append(parm[-1][1])
+                elif spelling != ')' or parms or \
+                        parm not in ([], [('ident', 'void')]):
+                    # unnamed parameter or empty entry
+                    raise UnknownSyntax('parameter')
+                if spelling == ')':
+                    return (parms, i)
+                parm = []
+            elif kind == 'ident' or spelling in ('::', '&', '*'):
+                parm.append((kind, spelling))
+            else:
+                raise UnknownSyntax(spelling)
+
+        raise UnknownSyntax('parameter list not closed')
+
+    def body(self, tokens, i):
+        '''
+        Extract the function body from the opening to the matching
+        closing brace.
+        '''
+        start = tokens[i][2]
+        depth = 0
+        while i < len(tokens):
+            (kind, spelling, offset) = tokens[i]
+            i += 1
+            if kind == 'directive':
+                # conditional code could unbalance the braces
+                raise UnknownSyntax(spelling)
+            if spelling == '{':
+                depth += 1
+            elif spelling == '}':
+                depth -= 1
+                if depth == 0:
+                    return (self._source[start:offset + 1], i)
+
+        raise UnknownSyntax('body not closed')
+
+    def parsed(self):
+        '''
+        Check whether all information of the model was found.
+        '''
+        required = set(['cycles', 'funct3', 'opc'])
+        if self._form == 'R':
+            required.add('funct7')
+
+        return self._name != '' and self._dfn != '' and \
+            self._check_rd and self._check_rs1 and self._check_op2 and \
+            required.issubset(self._vars)
+
+    def scan(self):
+        '''
+        Scan all instructions of the model file, like Model.from_file.
+        A single instruction is scanned like the libclang walk, including
+        its early stop.
+        Returns the metadata of the instructions or None, if the file
+        has to be parsed by libclang.
+        '''
+        logger.info('Scanning model @ {}'.format(self._impl))
+
+        try:
+            decls = list(self.declarations())
+        except UnknownSyntax as e:
+            logger.info('Model {} not understood: {}'.format(self._impl, e))
+            return None
+
+        functions = []
+        for decl in decls:
+            if decl[0] == 'function' and decl[1] not in functions:
+                functions.append(decl[1])
+        variables = set(decl[1] for decl in decls if decl[0] == 'var')
+        prefixed = set(function + '_' + field
+                       for function in functions for field in FIELDS)
+
+        if len(functions) <= 1 and not variables & prefixed:
+            self.reset()
+            for decl in decls:
+                if self.parsed():
+                    break
+                self.process(decl)
+            scanned = [self.metadata()]
+        else:
+            scanned = [self.scan_function(decls, function)
+                       for function in functions]
+
+        if None in scanned:
+            # let libclang report the error
+            logger.info('Model {} incomplete'.format(self._impl))
+            return None
+
+        return scanned
+
+    def scan_function(self, decls, function):
+        '''
+        Scan a single function of a file with several instructions.
+        '''
+        self.reset()
+        shared = {}
+        own = {}
+        current = None
+
+        for decl in decls:
+            if decl[0] == 'var':
+                for field in FIELDS:
+                    if decl[1] == field:
+                        shared[field] = decl[2]
+                    if decl[1] == function + '_' + field:
+                        own[field] = decl[2]
+            elif decl[0] == 'function':
+                current = decl[1]
+                if current == function:
+                    self.process(decl)
+            elif current == function:
+                self.process(decl)
+
+        shared.update(own)
+        for (field, value) in shared.items():
+            setattr(self, '_' + field, value)
+            self._vars.add(field)
+
+        return self.metadata()
+
+    def metadata(self):
+        '''
+        Metadata of the scanned instruction or None, if it is not complete.
+        '''
+        if not (self._check_rd and self._check_rs1 and self._check_op2) \
+                or self._rettype != 'void' or self._dfn == '':
+            return None
+
+        metadata = {'cycles': self._cycles,
+                    'definition': self._dfn,
+                    'form': self._form,
+                    'funct3': self._funct3,
+                    'funct7': self._funct7,
+                    'name': self._name,
+                    'opc': self._opc}
+        # like the model, omitted encoding fields are unset
+        for field in unset_fields(self._form, self._vars):
+            metadata[field] = None
+        return metadata
+
+    def process(self, decl):
+        '''
+        Retrieve the information of a single declaration.
+        '''
+        if decl[0] == 'function' and self._name == '':
+            self._name = decl[1]
+            self._rettype = decl[2]
+
+        if decl[0] == 'var':
+            if decl[1] == 'opc':
+                self._opc = decl[2]
+            if decl[1] == 'funct3':
+                self._funct3 = decl[2]
+            if decl[1] == 'funct7':
+                self._funct7 = decl[2]
+            if decl[1] == 'cycles':
+                self._cycles = decl[2]
+            self._vars.add(decl[1])
+
+        if decl[0] == 'parm':
+            if decl[1].startswith('Rd'):
+                self._check_rd = True
+            if decl[1].startswith('Rs1'):
+                self._check_rs1 = True
+            if decl[1].startswith('Rs2'):
+                self._form = 'R'
+                self._check_op2 = True
+            if decl[1].startswith('imm'):
+                self._form = 'I'
+                self._check_op2 = True
+
+        if decl[0] == 'body':
+            self._dfn = decl[1]
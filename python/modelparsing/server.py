@@ -0,0 +1,224 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import errno
+import json
+import logging
+import os
+import socket
+import time
+
+from discovery import modelpaths
+from watcher import Watcher
+
+logger = logging.getLogger(__name__)
+
+# name of the socket in the build directory
+SOCKET_NAME = 'modelparser.sock'
+# seconds a client waits for an answer, before it parses itself
+REQUEST_TIMEOUT = 120
+# artifacts, that a server can be asked for
+TARGETS = ['compiler', 'gem5']
+
+
+def request(path, command, timeout=REQUEST_TIMEOUT, **args):
+    '''
+    Send a command to the parse server listening on path and return its
+    answer. Raises socket.error, if no server is running or it does not
+    answer within timeout seconds.
+    '''
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+        args['command'] = command
+        sock.sendall(json.dumps(args) + '\n')
+        fh = sock.makefile('r')
+        try:
+            line = fh.readline()
+        finally:
+            fh.close()
+    finally:
+        sock.close()
+
+    if not line:
+        raise socket.error(errno.ECONNRESET, 'No answer from parse server')
+    return json.loads(line)
+
+
+class ParseServer(Watcher):
+    '''
+    Keeps the parsed models like the watch mode, but regenerates the
+    artifacts only when a client asks for them. If no model or register
+    file changed since the last request, only missing or outdated
+    artifacts are generated again by update.
+    Requests and answers are single lines of json on a unix socket.
+    '''
+
+    def __init__(self, parser, regenerate, path, monitor=None,
+                 update=None, targets=TARGETS):
+        '''
+        update is called with the parser on requests without changes,
+        targets are the artifacts, that regenerate and update generate.
+        '''
+        Watcher.__init__(self, parser, regenerate, monitor)
+        self._path = os.path.abspath(path)
+        self._running = False
+        self._sock = None
+        self._targets = list(targets)
+        self._update = update
+
+    def bind(self):
+        '''
+        Listen on the socket. A socket left by a crashed server is
+        replaced, a running server is not.
+        '''
+        if os.path.exists(self._path):
+            try:
+                request(self._path, 'ping', timeout=1)
+            except socket.error:
+                logger.info('Remove stale socket {}'.format(self._path))
+                os.remove(self._path)
+            else:
+                raise ValueError(self._path, 'Parse server already running.')
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self._path)
+        self._sock.listen(5)
+
+    def handle(self, req):
+        '''
+        Answer a single request.
+        '''
+        command = req.get('command')
+        if command == 'ping':
+            return {'status': 'ok'}
+        if command == 'shutdown':
+            self._running = False
+            return {'status': 'ok'}
+        if command != 'parse':
+            return {'status': 'error',
+                    'error': 'Unknown command {}'.format(command)}
+
+        # the client has to expect the same artifacts
+        if req.get('modelpath') is not None and \
+                modelpaths(req['modelpath']) != \
+                modelpaths(self._parser.modelpath):
+            return {'status': 'error', 'error': 'Server parses other models'}
+        if req.get('toolchain') is not None and \
+                os.path.abspath(req['toolchain']) != \
+                os.path.abspath(self._parser.tcpath):
+            return {'status': 'error',
+                    'error': 'Server extends another toolchain'}
+        missing = set(req.get('targets') or []) - set(self._targets)
+        if missing:
+            return {'status': 'error',
+                    'error': 'Server does not extend {}'.format(
+                        ', '.join(sorted(missing)))}
+
+        start = time.time()
+        changed = self._monitor.wait(0)
+        if changed:
+            for pathname in changed:
+                logger.info('Changed {}'.format(pathname))
+            self._parser.forget(changed)
+            self.build()
+        elif self._error is None and self._update is not None:
+            # outputs may have been removed or changed since
+            try:
+                self._update(self._parser)
+            except Exception as e:
+                logger.error('Update failed: {}'.format(e))
+                return {'status': 'error',
+                        'error': str(e) or type(e).__name__}
+
+        answer = {'changed': changed,
+                  'regenerated': bool(changed),
+                  'time': time.time() - start}
+        if self._error is not None:
+            answer.update(status='error', error=self._error)
+        else:
+            answer.update(status='ok')
+        return answer
+
+    def answer(self, conn):
+        '''
+        Read a request from a connection and write the answer.
+        '''
+        fh = conn.makefile('r')
+        try:
+            line = fh.readline()
+        finally:
+            fh.close()
+
+        try:
+            req = json.loads(line)
+        except ValueError:
+            req = {}
+        conn.sendall(json.dumps(self.handle(req)) + '\n')
+
+    def serve(self):
+        '''
+        Build once and answer requests until interrupted or shut down.
+        '''
+        self.bind()
+        self.build()
+        logger.warn('Parse server listening on {}'.format(self._path))
+
+        self._running = True
+        try:
+            while self._running:
+                (conn, _) = self._sock.accept()
+                try:
+                    self.answer(conn)
+                except socket.error as e:
+                    logger.warn('Request failed: {}'.format(e))
+                finally:
+                    conn.close()
+        except KeyboardInterrupt:
+            logger.info('Stop parse server')
+        finally:
+            self.close()
+
+    def close(self):
+        self._monitor.close()
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def targets(self):
+        return self._targets
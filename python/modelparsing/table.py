@@ -0,0 +1,165 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+import logging
+
+from encoder import define
+from instruction import OPERANDS
+
+logger = logging.getLogger(__name__)
+
+# fields of rows, that are given as the integer values of a row
+VALUES = {'mask': 'maskvalue', 'match': 'matchvalue'}
+
+
+class InstructionRow(object):
+    '''
+    A single instruction of a table. It has the properties of an
+    Instruction. The opcode, funct3 and funct7 are taken from the match,
+    the funct7 of an I-Type instruction is 0.
+    '''
+
+    __slots__ = ('_cycles', '_form', '_funct3', '_funct7', '_index',
+                 '_mask', '_maskvalue', '_match', '_matchvalue', '_name',
+                 '_opc')
+
+    def __init__(self, index, name, form, mask, match, cycles):
+        self._index = index
+        self._name = name
+        self._form = form
+        self._maskvalue = int(mask)
+        self._matchvalue = int(match)
+        self._cycles = int(cycles)
+        self._mask, self._match = define(name, self._maskvalue,
+                                         self._matchvalue)
+        self._opc = (self._matchvalue >> 2) & 0x1f
+        self._funct3 = (self._matchvalue >> 12) & 0x7
+        self._funct7 = (self._matchvalue >> 25) & 0x7f
+
+    @property
+    def cycles(self):
+        return self._cycles
+
+    @property
+    def form(self):
+        return self._form
+
+    @property
+    def funct3(self):
+        return self._funct3
+
+    @property
+    def funct7(self):
+        return self._funct7
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def mask(self):
+        return self._mask
+
+    @property
+    def maskname(self):
+        return self._mask.split()[-2]
+
+    @property
+    def maskvalue(self):
+        return self._maskvalue
+
+    @property
+    def match(self):
+        return self._match
+
+    @property
+    def matchname(self):
+        return self._match.split()[-2]
+
+    @property
+    def matchvalue(self):
+        return self._matchvalue
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def opc(self):
+        return self._opc
+
+    @property
+    def operands(self):
+        return OPERANDS.get(self._form, '')
+
+
+class InstructionTable:
+    '''
+    Table of the custom instructions. Every instruction is kept in an
+    InstructionRow with __slots__, that computes its defines and encoding
+    fields once. Iterating the table yields the rows, so that it can be
+    used like a list of Instructions.
+    '''
+
+    def __init__(self, names=None, forms=None, masks=None, matches=None,
+                 cycles=None):
+        self._rows = [InstructionRow(index, *values)
+                      for (index, values) in enumerate(zip(
+                          names or [], forms or [], masks or [],
+                          matches or [], cycles or []))]
+
+    @classmethod
+    def from_instructions(cls, insts):
+        '''
+        Table of Instructions or rows of another table.
+        '''
+        return cls([inst.name for inst in insts],
+                   [inst.form for inst in insts],
+                   [inst.maskvalue for inst in insts],
+                   [inst.matchvalue for inst in insts],
+                   [inst.cycles for inst in insts])
+
+    def rows(self, *names):
+        '''
+        The values of the given properties per instruction, e.g. as input
+        of an artifact. For mask and match, the integer values are given.
+        '''
+        names = [VALUES.get(name, name) for name in names]
+        return [[getattr(row, name) for name in names] for row in self._rows]
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __getitem__(self, index):
+        return self._rows[index]
+
+    @property
+    def names(self):
+        return [row.name for row in self._rows]
@@ -0,0 +1,212 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import logging
+import os
+import re
+import subprocess
+
+from exceptions import ConsistencyError
+from model import GCC_ARGS
+
+logger = logging.getLogger(__name__)
+
+# file name of the lines, that close the namespace of a model
+SENTINEL = '<unity>'
+
+
+class UnityCheck:
+    '''
+    Check all models with as few g++ invocations as possible.
+    Models with the same includes are joined into one translation unit,
+    where every model is wrapped into its own namespace, since all models
+    define the same globals. Their includes are hoisted out of the
+    namespaces and #line directives map all diagnostics back to the
+    original files. Models with other includes are not joined, so that
+    no model is compiled with the includes of another one.
+    A sentinel after every model only compiles, if the model left its
+    namespace balanced. Otherwise, the diagnostics would be attributed
+    to the following models, so every model is compiled on its own.
+    '''
+
+    def __init__(self, files):
+        self._files = [os.path.abspath(file) for file in files]
+        self._diags = {}
+
+        self._include = re.compile(r'^\s*#\s*include\s*([<"])([^>"]+)[>"]')
+        self._diag = re.compile(
+            r'^(.+?):(\d+):(?:\d+:)? (?:fatal )?(error|warning): (.*)$')
+
+    def read(self, file):
+        '''
+        The includes of a model, with quoted includes resolved relative to
+        it, and its lines. Each include is given with its line number and
+        removed from the lines, keeping the line numbers.
+        '''
+        with open(file, 'r') as fh:
+            lines = fh.read().splitlines()
+
+        includes = []
+        for j, line in enumerate(lines):
+            match = self._include.match(line)
+            if not match:
+                continue
+            if match.group(1) == '"':
+                header = os.path.normpath(os.path.join(
+                    os.path.dirname(file), match.group(2)))
+                include = '#include "{}"'.format(header)
+            else:
+                include = '#include <{}>'.format(match.group(2))
+            if include not in [known for (known, _) in includes]:
+                includes.append((include, j + 1))
+            lines[j] = ''
+
+        return includes, lines
+
+    def groups(self):
+        '''
+        The models grouped by their includes, in the order of the files.
+        '''
+        groups = []
+        keys = {}
+        for file in self._files:
+            key = tuple(include for (include, _) in self.read(file)[0])
+            if key not in keys:
+                keys[key] = len(groups)
+                groups.append([])
+            groups[keys[key]].append(file)
+        return groups
+
+    def render(self, files=None):
+        '''
+        Generate the unity translation unit of models with the same
+        includes, by default of all models.
+        '''
+        hoisted = []
+        bodies = []
+
+        for i, file in enumerate(self._files if files is None else files):
+            (includes, lines) = self.read(file)
+            if i == 0:
+                # errors of the includes refer to the first model
+                hoisted = ['#line {} "{}"\n{}\n'.format(
+                    number, self.escape(file), include)
+                    for (include, number) in includes]
+
+            bodies.append('namespace __model_{} {{\n'.format(i) +
+                          '#line 1 "{}"\n'.format(self.escape(file)) +
+                          '\n'.join(lines) + '\n' +
+                          '#line 1 "{}"\n'.format(SENTINEL) +
+                          'struct __sentinel_{};\n'.format(i) +
+                          '}\n' +
+                          'struct __model_{0}::__sentinel_{0} {{}};\n'
+                          .format(i))
+
+        return '// === AUTO GENERATED FILE ===\n' + \
+            ''.join(hoisted) + \
+            ''.join(bodies)
+
+    def escape(self, file):
+        return file.replace('\\', '\\\\').replace('"', '\\"')
+
+    def gcc(self, args, input=None):
+        '''
+        Run g++ and return its diagnostics per file. A failure without
+        any parsable diagnostic is kept for the sentinel.
+        '''
+        p = subprocess.Popen([r'g++'] + GCC_ARGS + args,
+                             stdin=subprocess.PIPE,
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE)
+        (_, ret) = p.communicate(input=input)
+
+        diags = {}
+        for line in ret.splitlines():
+            match = self._diag.match(line)
+            if not match:
+                continue
+            file = match.group(1)
+            diags.setdefault(file, []).append(
+                (int(match.group(2)), match.group(3), match.group(4)))
+
+        if p.returncode and not diags:
+            diags[SENTINEL] = [(0, 'error', ret.strip())]
+
+        return diags
+
+    def compile(self):
+        '''
+        Compile all models. Returns the diagnostics per file.
+        '''
+        self._diags = {}
+        if not self._files:
+            return self._diags
+
+        logger.info('Compile {} models with g++'.format(len(self._files)))
+        for files in self.groups():
+            if len(files) > 1:
+                diags = self.gcc(['-x', 'c++', '-'], self.render(files))
+                if SENTINEL not in diags:
+                    self.merge(diags)
+                    continue
+                logger.info('Unity build failed, compile every model on '
+                            'its own')
+
+            for file in files:
+                # a failure without diagnostics belongs to the model
+                self.merge(dict((file if name == SENTINEL else name, found)
+                                for (name, found) in
+                                self.gcc([file]).items()))
+
+        return self._diags
+
+    def merge(self, diags):
+        for (name, found) in diags.items():
+            self._diags.setdefault(name, []).extend(found)
+
+    def check(self):
+        '''
+        Compile all models and raise on the first file with diagnostics,
+        after all diagnostics were reported.
+        '''
+        diags = self.compile()
+
+        for file in sorted(diags):
+            for (line, severity, msg) in diags[file]:
+                logger.error('{}:{}: {}: {}'.format(file, line, severity, msg))
+
+        if diags:
+            raise ConsistencyError(sorted(diags)[0], 'Compile error.')
+
+    @property
+    def diagnostics(self):
+        return self._diags
+
+    @property
+    def files(self):
+        return self._files
@@ -0,0 +1,340 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import json
+import logging
+
+from allocator import Allocator
+from discovery import Discovery
+from encoder import encode, fields
+from exceptions import ConsistencyError, OpcodeError
+from frontend import load_cindex
+from model import Model
+from opcodeindex import RV_OPC, OpcodeIndex
+from registers import defines
+
+logger = logging.getLogger(__name__)
+
+# allowed addresses of custom registers
+REGISTER_RANGES = [(0x800, 0x8ff), (0xcc0, 0xcff)]
+
+
+def encoding(model):
+    '''
+    Match and mask value of a model, like parse-opcodes computes them.
+    '''
+    return encode(model.name, fields(model.form, model.opc, model.funct3,
+                                     model.funct7))
+
+
+class Problem:
+    '''
+    A single problem of the extension set with its location.
+    '''
+
+    def __init__(self, check, message, file=None, line=None, column=None,
+                 severity='error'):
+        self._check = check
+        self._column = column
+        self._file = file
+        self._line = line
+        self._message = message
+        self._severity = severity
+
+    def text(self):
+        '''
+        The problem in the format of compiler diagnostics.
+        '''
+        location = ':'.join(str(part)
+                            for part in (self._file, self._line, self._column)
+                            if part is not None)
+        return '{}: {}: {} [{}]'.format(location or '<extensions>',
+                                        self._severity, self._message,
+                                        self._check)
+
+    @property
+    def check(self):
+        return self._check
+
+    @property
+    def column(self):
+        return self._column
+
+    @property
+    def file(self):
+        return self._file
+
+    @property
+    def line(self):
+        return self._line
+
+    @property
+    def message(self):
+        return self._message
+
+    @property
+    def metadata(self):
+        return {'check': self._check,
+                'column': self._column,
+                'file': self._file,
+                'line': self._line,
+                'message': self._message,
+                'severity': self._severity}
+
+    @property
+    def severity(self):
+        return self._severity
+
+
+class Validator:
+    '''
+    Checks all models, their encodings and the custom registers of an
+    extension set in one pass. Instead of stopping at the first error,
+    every problem is collected and reported together.
+    '''
+
+    def __init__(self, modelpath, strict=False, pch=None, lockpath=None):
+        '''
+        If lockpath is set, models may omit their encoding and the
+        encodings are checked as the allocator would assign them.
+        '''
+        self._lockpath = lockpath
+        self._modelpath = modelpath
+        self._pch = pch
+        self._strict = strict
+        self._models = []
+        self._problems = []
+        self._registers = {}
+        self._addresses = {}
+
+    def validate(self):
+        '''
+        Run all checks. Returns the list of problems.
+        '''
+        self._models = []
+        self._problems = []
+        self._registers = {}
+        self._addresses = {}
+
+        (models, registers) = Discovery(self._modelpath).discover()
+        for pathname in registers:
+            self.check_registers(pathname)
+        for pathname in models:
+            self.check_model(pathname)
+        if self._lockpath:
+            self.allocate()
+        self.check_names()
+        self.check_encodings()
+
+        return self._problems
+
+    def add(self, check, message, file=None, line=None, column=None,
+            severity='error'):
+        problem = Problem(check, message, file, line, column, severity)
+        logger.debug(problem.text())
+        self._problems.append(problem)
+
+    def error(self, check, e, file=None, line=None):
+        '''
+        Add the problem of an exception. The message is the last argument
+        like in ConsistencyError(value, message).
+        '''
+        message = e.args[-1] if e.args else type(e).__name__
+        self.add(check, str(message), file, line)
+
+    def check_model(self, impl):
+        '''
+        Parse a model file and check every instruction of it.
+        '''
+        if self._strict:
+            try:
+                Model.compile_model(impl)
+            except ConsistencyError as e:
+                self.error('compile', e, impl)
+
+        try:
+            tu = Model.parse_file(impl, self._pch)
+        except load_cindex().TranslationUnitLoadError as e:
+            self.error('parse', e, impl)
+            return
+
+        warning = load_cindex().Diagnostic.Warning
+        diags = [diag for diag in tu.diagnostics if diag.severity >= warning]
+        for diag in diags:
+            severity = 'error' if diag.severity > warning else 'warning'
+            self.add('diagnostics', diag.spelling,
+                     str(diag.location.file or impl),
+                     diag.location.line, diag.location.column, severity)
+        if diags:
+            # the models of a file, that does not compile, are unreliable
+            return
+
+        lines = self.function_lines(tu)
+        for function in Model.instructions(impl, tu):
+            line = lines.get(function) if function else \
+                (lines.values()[0] if len(lines) == 1 else None)
+            try:
+                model = Model(impl, tu=tu, function=function,
+                              allocate=bool(self._lockpath))
+            except (ConsistencyError, ValueError) as e:
+                self.error('consistency', e, impl, line)
+                continue
+            self._models.append((model, impl, line))
+
+    def function_lines(self, tu):
+        '''
+        Lines of the function definitions of a model file.
+        '''
+        kind = load_cindex().CursorKind
+        return dict((node.spelling, node.location.line)
+                    for node in tu.cursor.get_children()
+                    if node.kind == kind.FUNCTION_DECL and
+                    node.is_definition() and Model.in_main_file(node, tu))
+
+    def allocate(self):
+        '''
+        Assign the encodings of the lock file or free ones, without
+        changing the lock file. Models without an encoding are dropped.
+        '''
+        builtin = [Model(read=True), Model(write=True)]
+        try:
+            models = Allocator(self._lockpath).allocate(
+                builtin + [model for (model, impl, line) in self._models],
+                [None, None] + [impl for (model, impl, line) in self._models])
+        except OpcodeError as e:
+            self.error('allocation', e)
+            self._models = [(model, impl, line)
+                            for (model, impl, line) in self._models
+                            if model.allocated]
+            return
+
+        self._models = [(model, impl, line) for (model, (_, impl, line))
+                        in zip(models[len(builtin):], self._models)]
+
+    def check_names(self):
+        '''
+        Every instruction needs its own name.
+        '''
+        seen = {}
+        for (model, impl, line) in self._models:
+            if model.name in seen:
+                self.add('names', 'Instruction {} already defined in {}'
+                         .format(model.name, seen[model.name]), impl, line)
+            else:
+                seen[model.name] = impl
+
+    def check_encodings(self):
+        '''
+        Two instructions overlap, if an instruction word matches both.
+        The instructions for the custom registers and of the base isa
+        are checked as well.
+        '''
+        index = OpcodeIndex()
+        index.add_base(RV_OPC)
+        builtin = [(Model(read=True), None, None),
+                   (Model(write=True), None, None)]
+        for (model, impl, line) in builtin + self._models:
+            (match, mask) = encoding(model)
+            for (name, _, _, origin) in index.overlaps(match, mask):
+                self.add('encoding', '{} overlaps with {}{}'.format(
+                    model.name, name, ' in ' + origin if origin else ''),
+                    impl, line)
+            index.add(model.name, match, mask, impl)
+
+    def check_registers(self, pathname):
+        '''
+        Check the custom registers defined in a register file. The
+        registers of all model roots are merged, so they must not repeat
+        the registers of other files either.
+        '''
+        with open(pathname, 'r') as fh:
+            content = fh.readlines()
+
+        for (number, name, value, address) in defines(content):
+            if address is None:
+                try:
+                    int(value, 0)
+                except ValueError:
+                    # no number, e.g. a macro
+                    continue
+                self.add('registers', 'Register {} is ignored, the address '
+                         'needs three hex digits'.format(name),
+                         pathname, number, severity='warning')
+                continue
+            if not any(low <= address <= high
+                       for (low, high) in REGISTER_RANGES):
+                self.add('registers', 'Register {} at {} is outside of '
+                         '0x800 - 0x8ff and 0xcc0 - 0xcff'.format(
+                             name, hex(address)), pathname, number)
+            if name in self._registers:
+                (origin, line) = self._registers[name]
+                self.add('registers', 'Register {} already defined in '
+                         '{}line {}'.format(
+                             name, '' if origin == pathname
+                             else origin + ' ', line),
+                         pathname, number)
+            if address in self._addresses:
+                self.add('registers', 'Register {} has the address of {}'
+                         .format(name, self._addresses[address]),
+                         pathname, number)
+            self._registers.setdefault(name, (pathname, number))
+            self._addresses.setdefault(address, name)
+
+    def report(self):
+        '''
+        All problems as text, one per line.
+        '''
+        errors = len([problem for problem in self._problems
+                      if problem.severity == 'error'])
+        lines = [problem.text() for problem in self._problems]
+        lines.append('{} error(s), {} warning(s) in {} instruction(s)'.format(
+            errors, len(self._problems) - errors, len(self._models)))
+        return '\n'.join(lines) + '\n'
+
+    def report_json(self):
+        '''
+        All problems as JSON.
+        '''
+        return json.dumps({'instructions': [model.name for (model, impl, line)
+                                            in self._models],
+                           'problems': [problem.metadata
+                                        for problem in self._problems]},
+                          indent=1, sort_keys=True) + '\n'
+
+    @property
+    def errors(self):
+        return [problem for problem in self._problems
+                if problem.severity == 'error']
+
+    @property
+    def models(self):
+        return [model for (model, impl, line) in self._models]
+
+    @property
+    def problems(self):
+        return self._problems
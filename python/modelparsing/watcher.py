@@ -0,0 +1,314 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import time
+
+from discovery import Discovery
+from frontend import includes
+
+logger = logging.getLogger(__name__)
+
+# seconds between two looks at the files without inotify
+POLL_INTERVAL = 0.5
+# seconds without events, before a change is handled, because editors
+# write a file in several steps
+SETTLE_TIME = 0.05
+
+# inotify events, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | \
+    IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+# struct inotify_event without the name
+EVENT = struct.Struct('iIII')
+
+
+def snapshot(modelpath):
+    '''
+    Stat of all model and register files in the model roots and of the
+    headers they include. Also returns the directories, that decide
+    about these files, and for every header the files including it.
+    '''
+    discovery = Discovery(modelpath)
+    (models, registers) = discovery.discover()
+    directories = list(discovery.directories)
+
+    files = {}
+    includers = {}
+    for pathname in models + registers:
+        for header in includes(pathname)[0][1:]:
+            includers.setdefault(header, []).append(pathname)
+            dirname = os.path.dirname(header)
+            if dirname not in directories and os.path.isdir(dirname):
+                directories.append(dirname)
+    for pathname in models + registers + sorted(includers):
+        try:
+            st = os.stat(pathname)
+        except OSError:
+            continue
+        files[pathname] = (st.st_mtime, st.st_size, st.st_ino)
+
+    return files, directories, includers
+
+
+def changes(old, new):
+    '''
+    Files, that were added, removed or modified between two snapshots.
+    '''
+    return sorted(pathname for pathname in set(old) | set(new)
+                  if old.get(pathname) != new.get(pathname))
+
+
+class Inotify:
+    '''
+    Minimal inotify binding, that reports whether anything happened
+    in the watched directories.
+    '''
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'),
+                                 use_errno=True)
+        self._fd = self._libc.inotify_init()
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._watches = {}
+
+    def add(self, path):
+        '''
+        Watch a directory. Watching it again does nothing.
+        '''
+        if path in self._watches:
+            return
+        wd = self._libc.inotify_add_watch(self._fd, path, IN_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self._watches[path] = wd
+
+    def remove(self, path):
+        '''
+        Stop watching a directory.
+        '''
+        wd = self._watches.pop(path, None)
+        if wd is not None:
+            # fails, if the directory is already gone
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def read(self, timeout=None):
+        '''
+        Wait for events. Returns the names of the changed entries or an
+        empty list after timeout seconds.
+        '''
+        try:
+            (ready, _, _) = select.select([self._fd], [], [], timeout)
+        except select.error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            return []
+        if not ready:
+            return []
+
+        data = os.read(self._fd, 65536)
+        names = []
+        offset = 0
+        while offset < len(data):
+            (wd, mask, cookie, length) = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            names.append(data[offset:offset + length].rstrip('\0'))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self._fd)
+
+    @property
+    def watches(self):
+        return self._watches
+
+
+class Monitor:
+    '''
+    Waits until model or register files in the model roots or the
+    headers they include change. Uses inotify if possible and otherwise
+    looks at the files in regular intervals.
+    '''
+
+    def __init__(self, modelpath, interval=POLL_INTERVAL, inotify=True):
+        self._modelpath = modelpath
+        self._interval = interval
+        self._inotify = None
+
+        if inotify:
+            try:
+                self._inotify = Inotify()
+            except (AttributeError, OSError) as e:
+                logger.info('No inotify, poll every {}s: {}'.format(
+                    interval, e))
+
+        (self._files, directories, self._includers) = snapshot(modelpath)
+        self.watch(directories)
+
+    def watch(self, directories):
+        '''
+        Watch exactly the given directories.
+        '''
+        if self._inotify is None:
+            return
+        for path in set(self._inotify.watches) - set(directories):
+            self._inotify.remove(path)
+        for path in directories:
+            try:
+                self._inotify.add(path)
+            except OSError as e:
+                logger.warn('Can not watch {}: {}'.format(path, e))
+
+    def wait(self, timeout=None):
+        '''
+        Block until files changed. Returns the changed files together
+        with the files including a changed header or an empty list, if
+        nothing changed within timeout seconds.
+        '''
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            remaining = None if deadline is None else \
+                max(deadline - time.time(), 0)
+            if self._inotify is not None:
+                if self._inotify.read(remaining):
+                    # let the editor finish writing
+                    while self._inotify.read(SETTLE_TIME):
+                        pass
+            else:
+                interval = self._interval if remaining is None else \
+                    min(self._interval, remaining)
+                time.sleep(interval)
+
+            (files, directories, includers) = snapshot(self._modelpath)
+            changed = changes(self._files, files)
+            for header in list(changed):
+                changed.extend(self._includers.get(header, []) +
+                               includers.get(header, []))
+            changed = sorted(set(changed))
+            self._files = files
+            self._includers = includers
+            self.watch(directories)
+
+            if changed or (deadline is not None and time.time() >= deadline):
+                return changed
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    @property
+    def files(self):
+        return self._files
+
+    @property
+    def inotify(self):
+        return self._inotify is not None
+
+
+class Watcher:
+    '''
+    Keeps a parser with its parsed models and the loaded libclang alive
+    and regenerates the artifacts, whenever a model or register file
+    changes. Only the changed files are parsed again.
+    '''
+
+    def __init__(self, parser, regenerate, monitor=None):
+        '''
+        regenerate is called with the parser after every change.
+        '''
+        self._error = None
+        self._parser = parser
+        self._regenerate = regenerate
+        self._monitor = monitor or Monitor(parser.modelpath)
+
+    def build(self):
+        '''
+        Regenerate the artifacts. Errors are logged, so that watching
+        goes on after an invalid model was saved.
+        '''
+        start = time.time()
+        try:
+            self._regenerate(self._parser)
+        except Exception as e:
+            logger.error('Regeneration failed: {}'.format(e))
+            self._error = str(e) or type(e).__name__
+            return False
+        self._error = None
+        logger.warn('Regenerated in {:.3f}s'.format(time.time() - start))
+        return True
+
+    def run(self, rounds=None):
+        '''
+        Build once and again after each change, until interrupted or
+        after the given number of changes.
+        '''
+        self.build()
+        logger.warn('Watching {} for changes'.format(self._parser.modelpath))
+        try:
+            while rounds is None or rounds > 0:
+                changed = self._monitor.wait()
+                for pathname in changed:
+                    logger.warn('Changed {}'.format(pathname))
+                self._parser.forget(changed)
+                self.build()
+                if rounds is not None:
+                    rounds -= 1
+        except KeyboardInterrupt:
+            logger.info('Stop watching')
+        finally:
+            self._monitor.close()
+
+    @property
+    def error(self):
+        return self._error
+
+    @property
+    def monitor(self):
+        return self._monitor
+
+    @property
+    def parser(self):
+        return self._parser
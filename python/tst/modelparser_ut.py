@@ -28,13 +28,29 @@
 #
 # Authors: Robert Scheffel
 
+from testcases import allocator_ut
+from testcases import bundle_ut
+from testcases import cache_ut
 from testcases import compiler_ut
+from testcases import depgraph_ut
+from testcases import discovery_ut
+from testcases import encoder_ut
+from testcases import frontend_ut
 from testcases import gem5_ut
 from testcases import extensions_ut
 from testcases import instruction_ut
 from testcases import model_ut
+from testcases import opcodeindex_ut
+from testcases import output_ut
 from testcases import parser_ut
+from testcases import profiler_ut
 from testcases import registers_ut
+from testcases import scanner_ut
+from testcases import server_ut
+from testcases import table_ut
+from testcases import unity_ut
+from testcases import validator_ut
+from testcases import watcher_ut
 
 import unittest
 
@@ -42,8 +58,22 @@ import unittest
 if __name__ == '__main__':
     # load test cases
     suiteList = []
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        allocator_ut.TestAllocator))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        bundle_ut.TestBundle))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        cache_ut.TestModelCache))
     suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
         compiler_ut.TestCompiler))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        depgraph_ut.TestDepGraph))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        discovery_ut.TestDiscovery))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        encoder_ut.TestEncoder))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        frontend_ut.TestPreamble))
     suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
         gem5_ut.TestGem5))
     suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
@@ -52,10 +82,28 @@ if __name__ == '__main__':
         instruction_ut.TestInstruction))
     suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
         model_ut.TestModel))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        opcodeindex_ut.TestOpcodeIndex))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        output_ut.TestOutput))
     suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
         parser_ut.TestParser))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        profiler_ut.TestProfiler))
     suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
         registers_ut.TestRegisters))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        scanner_ut.TestScanner))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        server_ut.TestParseServer))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        table_ut.TestInstructionTable))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        unity_ut.TestUnityCheck))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        validator_ut.TestValidator))
+    suiteList.append(unittest.TestLoader().loadTestsFromTestCase(
+        watcher_ut.TestWatcher))
 
     # join them and run
     suite = unittest.TestSuite(suiteList)
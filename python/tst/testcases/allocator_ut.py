@@ -0,0 +1,199 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import json
+import os
+import shutil
+import sys
+import unittest
+
+sys.path.append('..')
+from modelparsing.allocator import LOCKFILE, Allocator, lockpath
+from modelparsing.exceptions import OpcodeError
+from modelparsing.model import Model
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestAllocator(unittest.TestCase):
+    '''
+    Tests for the assignment of free encodings.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestAllocator, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    def model(self, name, form='R', opc=None, funct3=None, funct7=None):
+        if form == 'I':
+            funct7 = 0xff
+        definition = '{\n    Rd = Rs1;\n}'
+        return Model(metadata={'cycles': 1, 'definition': definition,
+                               'form': form, 'funct3': funct3,
+                               'funct7': funct7, 'name': name, 'opc': opc},
+                     allocate=True)
+
+    def encodings(self, models):
+        return [(model.name, model.opc, model.funct3, model.funct7)
+                for model in models]
+
+    def testPack(self):
+        # related R-Type instructions share opcode and funct3
+        models = [self.model('a'), self.model('b'), self.model('c')]
+
+        allocated = Allocator().allocate(models, ['x.cc'] * 3)
+
+        self.assertEqual(self.encodings(allocated),
+                         [('a', 0x02, 0x0, 0x0),
+                          ('b', 0x02, 0x0, 0x1),
+                          ('c', 0x02, 0x0, 0x2)])
+        self.assertTrue(all(model.allocated for model in allocated))
+
+    def testRelated(self):
+        # instructions follow the given fields of their related ones
+        models = [self.model('fixed', opc=0x0a, funct3=0x3, funct7=0x0),
+                  self.model('a'),
+                  self.model('b', opc=0x16),
+                  self.model('c')]
+
+        allocated = Allocator().allocate(
+            models, ['y.cc', 'x.cc', 'x.cc', 'y.cc'])
+
+        self.assertEqual(self.encodings(allocated),
+                         [('fixed', 0x0a, 0x3, 0x0),
+                          ('a', 0x0a, 0x3, 0x1),
+                          ('b', 0x16, 0x0, 0x0),
+                          ('c', 0x0a, 0x3, 0x2)])
+
+    def testIType(self):
+        # an I-Type instruction takes a whole funct3 slot
+        models = [self.model('r', opc=0x02, funct3=0x0, funct7=0x5),
+                  self.model('i', form='I'),
+                  self.model('j', form='I', opc=0x1e),
+                  self.model('s', funct3=0x1)]
+
+        allocated = Allocator().allocate(models)
+
+        self.assertEqual(self.encodings(allocated),
+                         [('r', 0x02, 0x0, 0x5),
+                          ('i', 0x02, 0x1, 0xff),
+                          ('j', 0x1e, 0x0, 0xff),
+                          ('s', 0x0a, 0x1, 0x0)])
+
+    def testLockFile(self):
+        # locked encodings are kept, also if instructions are added
+        path = os.path.join(self.folderpath, LOCKFILE)
+        allocator = Allocator(path)
+        allocator.allocate([self.model('a'), self.model('b', form='I')])
+        self.assertTrue(allocator.save())
+        self.assertFalse(allocator.save())
+
+        with open(path, 'r') as fh:
+            lock = json.load(fh)
+        self.assertEqual(lock['instructions'], {'a': [0x02, 0x0, 0x0],
+                                                'b': [0x02, 0x1, None]})
+
+        allocated = Allocator(path).allocate(
+            [self.model('new'), self.model('b', form='I'), self.model('a')])
+        self.assertEqual(self.encodings(allocated),
+                         [('new', 0x02, 0x0, 0x1),
+                          ('b', 0x02, 0x1, 0xff),
+                          ('a', 0x02, 0x0, 0x0)])
+
+    def testLockConflict(self):
+        # a locked encoding, that is taken, is assigned again
+        path = os.path.join(self.folderpath, LOCKFILE)
+        allocator = Allocator(path)
+        allocator.allocate([self.model('a')])
+        allocator.save()
+
+        allocator = Allocator(path)
+        allocated = allocator.allocate(
+            [self.model('fixed', opc=0x02, funct3=0x0, funct7=0x0),
+             self.model('a')])
+        self.assertEqual(self.encodings(allocated)[1], ('a', 0x02, 0x0, 0x1))
+        self.assertEqual(allocator.assigned, {'a': [0x02, 0x0, 0x1]})
+
+        # the locked encoding has to fit the given fields as well
+        allocated = Allocator(path).allocate([self.model('a', opc=0x1e)])
+        self.assertEqual(self.encodings(allocated), [('a', 0x1e, 0x0, 0x0)])
+
+    def testExhausted(self):
+        # no free funct7 in the given slot
+        models = [self.model('r{}'.format(funct7), opc=0x02, funct3=0x0,
+                             funct7=funct7) for funct7 in range(0, 128)]
+        models.append(self.model('full', opc=0x02, funct3=0x0))
+
+        with self.assertRaises(OpcodeError):
+            Allocator().allocate(models)
+
+    def testLockPath(self):
+        # the lock file is located in the first model root
+        self.assertEqual(lockpath([self.folderpath, '/tmp']),
+                         os.path.join(os.path.abspath(self.folderpath),
+                                      LOCKFILE))
+        model = os.path.join(self.folderpath, 'model.cc')
+        self.assertEqual(lockpath(model),
+                         os.path.join(os.path.abspath(self.folderpath),
+                                      LOCKFILE))
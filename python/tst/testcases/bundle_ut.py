@@ -0,0 +1,156 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+import os
+import shutil
+import sys
+import unittest
+
+sys.path.append('..')
+from modelparsing.bundle import Bundle
+from modelparsing.extensions import Extensions
+from modelparsing.instruction import Instruction
+from modelparsing.model import Model
+from modelparsing.registers import Registers
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestBundle(unittest.TestCase):
+    '''
+    Tests for the serialized bundle of parsed models.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestBundle, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    def setUp(self):
+        self.path = os.path.join(self.folderpath, 'bundle.json')
+        self.modelpath = self.folderpath
+
+        self.models = [Model(read=True), Model(write=True)]
+        self.insts = [
+            Instruction(1, 'R',
+                        '#define MASK_READ_CUSTREG  0xfe00707f\n',
+                        '#define MATCH_READ_CUSTREG 0xfc00707b\n',
+                        'read_custreg'),
+            Instruction(1, 'R',
+                        '#define MASK_WRITE_CUSTREG  0xfe00707f\n',
+                        '#define MATCH_WRITE_CUSTREG 0xfe00707b\n',
+                        'write_custreg')]
+        self.header = '#ifndef RISCV_CUSTOM_ENCODING_H\n'
+        self.exts = Extensions(self.models, self.insts, self.header)
+        self.regs = Registers({'c0': 0x800, 'c1': 0x801})
+
+    def testRoundTrip(self):
+        Bundle(self.path).save(self.modelpath, self.exts, self.regs)
+
+        (exts, regs) = Bundle(self.path).load(self.modelpath)
+
+        self.assertEqual([model.metadata for model in exts.models],
+                         [model.metadata for model in self.models])
+        for (inst, orig) in zip(exts.instructions, self.insts):
+            self.assertEqual(inst.name, orig.name)
+            self.assertEqual(inst.form, orig.form)
+            self.assertEqual(inst.cycles, orig.cycles)
+            self.assertEqual(inst.maskname, orig.maskname)
+            self.assertEqual(inst.maskvalue, orig.maskvalue)
+            self.assertEqual(inst.matchname, orig.matchname)
+            self.assertEqual(inst.matchvalue, orig.matchvalue)
+            self.assertEqual(inst.operands, orig.operands)
+        self.assertEqual(exts.cust_header, self.header)
+        self.assertEqual(regs.regmap, self.regs.regmap)
+
+    def testMissingBundle(self):
+        with self.assertRaises(ValueError):
+            Bundle(self.path).load(self.modelpath)
+
+    def testOtherModels(self):
+        Bundle(self.path).save(self.modelpath, self.exts, self.regs)
+
+        with self.assertRaises(ValueError):
+            Bundle(self.path).load(os.path.join(self.modelpath, 'other'))
+
+    def testChangedModels(self):
+        header = os.path.join(self.modelpath, 'regs.hh')
+        model = os.path.join(self.modelpath, 'model.cc')
+        with open(header, 'w') as fh:
+            fh.write('#define c0 0x800\n')
+        with open(model, 'w') as fh:
+            fh.write('#include "regs.hh"\n')
+        Bundle(self.path).save(self.modelpath, self.exts, self.regs)
+        Bundle(self.path).load(self.modelpath)
+
+        # an included header changed
+        with open(header, 'a') as fh:
+            fh.write('#define c1 0x801\n')
+        with self.assertRaises(ValueError):
+            Bundle(self.path).load(self.modelpath)
+
+        # a model was added
+        Bundle(self.path).save(self.modelpath, self.exts, self.regs)
+        with open(os.path.join(self.modelpath, 'other.cc'), 'w') as fh:
+            fh.write('\n')
+        with self.assertRaises(ValueError):
+            Bundle(self.path).load(self.modelpath)
@@ -0,0 +1,167 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import unittest
+
+from scripts import model_gen
+from scripts.ccmodel import CCModel
+from mako.template import Template
+
+sys.path.append('..')
+from modelparsing import cache as cachemodule
+from modelparsing.cache import ModelCache
+from modelparsing.model import Model
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestModelCache(unittest.TestCase):
+    '''
+    Tests for the persistent model cache.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestModelCache, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def setUp(self):
+        self.cachepath = os.path.join(self.folderpath, 'cache')
+        self.filename = os.path.join(self.folderpath, 'rtype.cc')
+        self.ccmodel = CCModel('rtype', 'R', 'uint32_t',
+                               0x02, 0x01, 0x03, [])
+
+        with open(self.filename, 'w') as fh:
+            fh.write(Template(filename=model_gen).render(model=self.ccmodel))
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    def testCacheMiss(self):
+        cache = ModelCache(self.cachepath)
+
+        self.assertIsNone(cache.load(self.filename))
+
+    def testCacheHit(self):
+        cache = ModelCache(self.cachepath)
+        model = Model(self.filename)
+        cache.store(self.filename, [model])
+
+        cached = cache.load(self.filename)
+
+        self.assertIsNotNone(cached)
+        self.assertEqual(len(cached), 1)
+        cached = cached[0]
+        self.assertEqual(cached.cycles, model.cycles)
+        self.assertEqual(cached.definition, model.definition)
+        self.assertEqual(cached.form, model.form)
+        self.assertEqual(cached.funct3, model.funct3)
+        self.assertEqual(cached.funct7, model.funct7)
+        self.assertEqual(cached.name, model.name)
+        self.assertEqual(cached.opc, model.opc)
+
+    def testCacheModelChanged(self):
+        cache = ModelCache(self.cachepath)
+        cache.store(self.filename, [Model(self.filename)])
+
+        with open(self.filename, 'a') as fh:
+            fh.write('\n// changed\n')
+
+        self.assertIsNone(cache.load(self.filename))
+
+    def testCacheHeaderChanged(self):
+        header = os.path.join(self.folderpath, 'regs.hh')
+        with open(header, 'w') as fh:
+            fh.write('#define c0 0x800\n')
+        with open(self.filename, 'r') as fh:
+            content = fh.read()
+        with open(self.filename, 'w') as fh:
+            fh.write('#include "regs.hh"\n' + content)
+
+        cache = ModelCache(self.cachepath)
+        cache.store(self.filename, [Model(self.filename)])
+        self.assertIsNotNone(cache.load(self.filename))
+
+        with open(header, 'a') as fh:
+            fh.write('#define c1 0xcc0\n')
+
+        self.assertIsNone(cache.load(self.filename))
+
+    def testCacheCompilerChanged(self):
+        # models checked with g++ are not reused after a g++ upgrade
+        gcc_id = cachemodule.gcc_id
+        try:
+            cachemodule.gcc_id = lambda: '/usr/bin/g++-7:100:1'
+            cache = ModelCache(self.cachepath, strict=True)
+            cache.store(self.filename, [Model(self.filename)])
+            self.assertIsNotNone(cache.load(self.filename))
+            key = ModelCache(self.cachepath).key(self.filename)
+
+            cachemodule.gcc_id = lambda: '/usr/bin/g++-8:120:2'
+            self.assertIsNone(ModelCache(self.cachepath,
+                                         strict=True).load(self.filename))
+            # without the g++ check, the compiler does not matter
+            self.assertEqual(ModelCache(self.cachepath).key(self.filename),
+                             key)
+        finally:
+            cachemodule.gcc_id = gcc_id
@@ -31,9 +31,16 @@ import shutil
 import sys
 import unittest
 
+from scripts import model_gen
+from scripts.ccmodel import CCModel
+from mako.template import Template
+
 sys.path.append('..')
+from modelparsing.cache import ModelCache
 from modelparsing.exceptions import ConsistencyError
 from modelparsing.compiler import Compiler
+from modelparsing.extensions import Extensions
+from modelparsing.model import Model
 from tst import folderpath
 sys.path.remove('..')
 
@@ -328,6 +335,34 @@ class TestCompiler(unittest.TestCase):
         for file in os.listdir(self.folderpath):
             self.assertNotEqual(file, opccold)
 
+    def testExtendUpstreamChanged(self):
+        # a new upstream version replaces the copied originals
+        compiler = Compiler(self.exts, self.regs, self.tc)
+        compiler.opch = self.opcheader
+        compiler.opch_cust = self.opcheader_cust
+        compiler.opcc = self.opcsource
+        compiler.extend_header()
+        compiler.extend_source()
+
+        with open(self.opcheader, 'w') as fh:
+            fh.write('#ifndef RISCV_ENCODING_H_2\n')
+        with open(self.opcsource, 'w') as fh:
+            fh.write('{\n{ test2 },\n/* Terminate the list.  */\n};')
+        compiler.extend_header()
+        compiler.extend_source()
+
+        with open(self.opcheader, 'r') as fh:
+            self.assertEqual(fh.read(), '#include "riscv-custom-opc.h"\n' +
+                             '#ifndef RISCV_ENCODING_H_2\n')
+        with open(self.opcheader + '_old', 'r') as fh:
+            self.assertEqual(fh.read(), '#ifndef RISCV_ENCODING_H_2\n')
+        with open(self.opcsource, 'r') as fh:
+            content = fh.read()
+        self.assertTrue('{ test2 }' in content)
+        self.assertEqual(content.count('"itype"'), 1)
+        with open(self.opcsource + '_old', 'r') as fh:
+            self.assertFalse('"itype"' in fh.read())
+
     def testExtendSourceIType(self):
         compiler = Compiler(self.exts, self.regs, self.tc)
         compiler.opcc = self.opcsource
@@ -411,3 +446,58 @@ class TestCompiler(unittest.TestCase):
             content = fh.readlines()
 
         self.assertEqual(len(content), 7)
+
+    def testExtendSourceRemovedInstruction(self):
+        # the source is extended from the original, removed instructions
+        # are gone without restoring it first
+        compiler = Compiler(self.exts, self.regs, self.tc)
+        compiler.opcc = self.opcsource
+        compiler.extend_source()
+
+        exts = self.Extensions([], [], 'customheader')
+        compiler1 = Compiler(exts, self.regs, self.tc)
+        compiler1.opcc = self.opcsource
+        compiler1.extend_source()
+
+        with open(self.opcsource, 'r') as fh:
+            content = fh.readlines()
+
+        self.assertEqual(len(content), 6)
+
+    def testExtendUnchanged(self):
+        # extending again with the same instructions leaves the files
+        # untouched
+        compiler = Compiler(self.exts, self.regs, self.tc)
+        compiler.opch = self.opcheader
+        compiler.opch_cust = self.opcheader_cust
+        compiler.opcc = self.opcsource
+        compiler.extend_header()
+        compiler.extend_source()
+
+        for path in (self.opcheader, self.opcheader_cust, self.opcsource):
+            os.utime(path, (0, 0))
+
+        compiler.extend_header()
+        compiler.extend_source()
+
+        for path in (self.opcheader, self.opcheader_cust, self.opcsource):
+            self.assertEqual(os.stat(path).st_mtime, 0)
+
+    def testExtendStdlibsCachedModels(self):
+        # models restored from the cache give the same intrinsics
+        filename = self.folderpath + 'rtype.cc'
+        with open(filename, 'w') as fh:
+            fh.write(Template(filename=model_gen).render(
+                model=CCModel('rtype', 'R', 'uint32_t',
+                              0x02, 0x01, 0x03, [])))
+        cache = ModelCache(self.folderpath + 'cache')
+        cache.store(filename, [Model(filename)])
+        models = cache.load(filename)
+        self.assertEqual(type(models[0].form), str)
+
+        compiler = Compiler(Extensions(models), self.regs, self.tc)
+        compiler.stdlibs = self.folderpath
+        compiler.extend_stdlibs()
+
+        with open(self.folderpath + 'riscvintr.h', 'r') as fh:
+            self.assertTrue('void RTYPE(' in fh.read())
@@ -0,0 +1,242 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+import os
+import shutil
+import sys
+import unittest
+
+sys.path.append('..')
+from modelparsing.compiler import Compiler
+from modelparsing.depgraph import DepGraph
+from modelparsing.instruction import Instruction
+from modelparsing.registers import Registers
+from modelparsing.table import InstructionTable
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestDepGraph(unittest.TestCase):
+    '''
+    Tests for the incremental generation of artifacts.
+    '''
+
+    class Extensions():
+
+        def __init__(self, insts, hdr):
+            self._insts = insts
+            self._cust_header = hdr
+
+        @property
+        def instructions(self):
+            return self._insts
+
+        @property
+        def cust_header(self):
+            return self._cust_header
+
+    def __init__(self, *args, **kwargs):
+        super(TestDepGraph, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    def setUp(self):
+        self.path = os.path.join(self.folderpath, 'deps.json')
+        self.output = os.path.join(self.folderpath, 'output')
+        open(self.output, 'w').close()
+
+        self.tc = os.path.join(os.path.expanduser('~'),
+                               'projects/riscv-gnu-toolchain')
+
+    def testStale(self):
+        deps = DepGraph(self.path)
+        self.assertTrue(deps.stale('artifact', [1, 2], [self.output]))
+
+        deps.update('artifact', [1, 2])
+        deps.save()
+
+        deps = DepGraph(self.path)
+        self.assertFalse(deps.stale('artifact', [1, 2], [self.output]))
+        # changed inputs
+        self.assertTrue(deps.stale('artifact', [1, 3], [self.output]))
+        # other artifact
+        self.assertTrue(deps.stale('other', [1, 2], [self.output]))
+        # missing output
+        os.remove(self.output)
+        self.assertTrue(deps.stale('artifact', [1, 2], [self.output]))
+
+    def testNoPath(self):
+        # without a path, everything is always generated
+        deps = DepGraph()
+        deps.update('artifact', [1, 2])
+
+        self.assertTrue(deps.stale('artifact', [1, 2], [self.output]))
+
+    def testBuildOnce(self):
+        generated = []
+        deps = DepGraph(self.path)
+
+        for i in range(0, 2):
+            deps.build('artifact', {'b': [1], 'a': 'x'}, [self.output],
+                       lambda: generated.append(i))
+
+        self.assertEqual(generated, [0])
+
+    def genToolchain(self, regmap={'c0': 0x800}):
+        '''
+        Create a compiler, whose files are located in the test folder.
+        '''
+        inst = Instruction(1, 'I',
+                           '#define MASK_ITYPE  0x707f\n',
+                           '#define MATCH_ITYPE 0xb\n',
+                           'itype')
+        exts = self.Extensions(InstructionTable.from_instructions([inst]),
+                               'customheader')
+        regs = Registers(regmap)
+
+        compiler = Compiler(exts, regs, self.tc, DepGraph(self.path))
+        compiler.opch = os.path.join(self.folderpath, 'riscv-opc.h')
+        compiler.opch_cust = os.path.join(self.folderpath,
+                                          'riscv-custom-opc.h')
+        compiler.opcc = os.path.join(self.folderpath, 'riscv-opc.c')
+        compiler.stdlibs = self.folderpath
+
+        if not os.path.exists(compiler.opch):
+            with open(compiler.opch, 'w') as fh:
+                fh.write('#ifndef RISCV_ENCODING_H\n')
+            with open(compiler.opcc, 'w') as fh:
+                fh.write('{\n/* Terminate the list.  */\n{0}\n};')
+
+        return compiler
+
+    def testCompilerUnchanged(self):
+        compiler = self.genToolchain()
+        compiler.extend_compiler()
+        compiler.deps.save()
+
+        riscvintr = os.path.join(self.folderpath, 'riscvintr.h')
+        for file in [compiler.opch_cust, riscvintr]:
+            with open(file, 'w') as fh:
+                fh.write('untouched')
+
+        compiler = self.genToolchain()
+        compiler.extend_compiler()
+
+        for file in [compiler.opch_cust, riscvintr]:
+            with open(file, 'r') as fh:
+                self.assertEqual(fh.read(), 'untouched')
+
+    def testCompilerRegistersChanged(self):
+        compiler = self.genToolchain()
+        compiler.extend_compiler()
+        compiler.deps.save()
+
+        with open(compiler.opch_cust, 'w') as fh:
+            fh.write('untouched')
+
+        # only the intrinsics depend on the registers
+        compiler = self.genToolchain({'c0': 0x800, 'c1': 0x801})
+        compiler.extend_compiler()
+
+        with open(compiler.opch_cust, 'r') as fh:
+            self.assertEqual(fh.read(), 'untouched')
+        with open(os.path.join(self.folderpath, 'riscvintr.h'), 'r') as fh:
+            self.assertTrue('#define c1 0x801' in fh.read())
+
+    def testCompilerUpstreamChanged(self):
+        compiler = self.genToolchain()
+        compiler.extend_compiler()
+        compiler.deps.save()
+
+        with open(compiler.opch_cust, 'w') as fh:
+            fh.write('untouched')
+        # the original header changed, but not its path
+        with open(compiler.opch, 'w') as fh:
+            fh.write('#ifndef RISCV_ENCODING_H_2\n')
+
+        compiler = self.genToolchain()
+        compiler.extend_compiler()
+
+        with open(compiler.opch_cust, 'r') as fh:
+            self.assertEqual(fh.read(), 'customheader')
+        with open(compiler.opch, 'r') as fh:
+            self.assertTrue('RISCV_ENCODING_H_2' in fh.read())
+
+    def testCompilerPatchedUnchanged(self):
+        # the patched files are no changed inputs
+        compiler = self.genToolchain()
+        compiler.extend_compiler()
+        compiler.deps.save()
+
+        compiler = self.genToolchain()
+        generated = []
+        compiler.extend_header = lambda: generated.append('header')
+        compiler.extend_source = lambda: generated.append('source')
+        compiler.extend_compiler()
+
+        self.assertEqual(generated, [])
+
+        # a restored source is generated again
+        compiler.restore_source()
+        compiler.extend_compiler()
+
+        self.assertEqual(generated, ['source'])
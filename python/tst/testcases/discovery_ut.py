@@ -0,0 +1,186 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import unittest
+
+sys.path.append('..')
+from modelparsing import discovery
+from modelparsing.discovery import Discovery, Entry
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestDiscovery(unittest.TestCase):
+    '''
+    Tests for finding model and register files.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestDiscovery, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    def touch(self, *names):
+        '''
+        Create empty files in the test folder.
+        '''
+        paths = []
+        for name in names:
+            path = os.path.join(self.folderpath, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as fh:
+                fh.write('')
+            paths.append(path)
+        return paths
+
+    def write(self, name, lines):
+        with open(os.path.join(self.folderpath, name), 'w') as fh:
+            fh.write('\n'.join(lines) + '\n')
+
+    def testWalk(self):
+        # models are found in the order of their paths,
+        # build and vcs directories are skipped
+        self.touch('b.cc', 'a/z.cc', 'a/y.cc', 'c.hh', 'build/x.cc',
+                   '.git/w.cc', 'custom_registers.hh')
+
+        (models, registers) = Discovery(self.folderpath).discover()
+
+        self.assertEqual(models, self.touch('a/y.cc', 'a/z.cc', 'b.cc'))
+        self.assertEqual(registers, self.touch('custom_registers.hh'))
+
+    def testWalkWithoutScandir(self):
+        # the same files are found with listdir
+        self.touch('b.cc', 'a/z.cc', 'a/y.cc', 'build/x.cc')
+
+        scandir = discovery.scandir
+        discovery.scandir = None
+        try:
+            (models, registers) = Discovery(self.folderpath).discover()
+        finally:
+            discovery.scandir = scandir
+
+        self.assertEqual(models, self.touch('a/y.cc', 'a/z.cc', 'b.cc'))
+
+    def testEntryStatsOnce(self):
+        # the fallback entries stat each path only once
+        self.touch('a.cc')
+        os.mkdir(os.path.join(self.folderpath, 'sub'))
+        stats = []
+        stat = os.stat
+
+        def counted(path):
+            stats.append(path)
+            return stat(path)
+
+        os.stat = counted
+        try:
+            for entry in [Entry(self.folderpath, 'a.cc'),
+                          Entry(self.folderpath, 'sub'),
+                          Entry(self.folderpath, 'missing')]:
+                (entry.is_dir(), entry.is_file(), entry.is_dir())
+        finally:
+            os.stat = stat
+
+        self.assertEqual(stats, [os.path.join(self.folderpath, name)
+                                 for name in ('a.cc', 'sub', 'missing')])
+        self.assertTrue(Entry(self.folderpath, 'sub').is_dir())
+        self.assertTrue(Entry(self.folderpath, 'a.cc').is_file())
+        self.assertFalse(Entry(self.folderpath, 'missing').is_file())
+
+    def testIgnoreFile(self):
+        # patterns without slash match names, others relative paths
+        self.touch('keep.cc', 'skip_me.cc', 'tests/t.cc', 'a/b/c.cc',
+                   'a/b/d.cc', 'a/e.cc')
+        self.write('.modelignore', ['# no models', 'skip_*.cc', 'tests/'])
+        self.write('a/.modelignore', ['b/c.cc'])
+
+        (models, registers) = Discovery(self.folderpath).discover()
+
+        self.assertEqual(models,
+                         self.touch('a/b/d.cc', 'a/e.cc', 'keep.cc'))
+
+    def testManifest(self):
+        # only the listed files are used, in the order of the manifest
+        self.touch('b.cc', 'a/y.cc', 'a/z.cc', 'other.cc',
+                   'registers.hh')
+        self.write('models.manifest', ['b.cc', 'a/*.cc', 'registers.hh'])
+
+        (models, registers) = Discovery(self.folderpath).discover()
+
+        self.assertEqual(models, self.touch('b.cc', 'a/y.cc', 'a/z.cc'))
+        self.assertEqual(registers, self.touch('registers.hh'))
+
+    def testMultipleRoots(self):
+        # roots are searched in the given order, files are models
+        (first, second, single) = self.touch('r1/m.cc', 'r2/m.cc',
+                                             'single.cc')
+
+        (models, registers) = Discovery(
+            [os.path.dirname(second), single,
+             os.path.dirname(first)]).discover()
+
+        self.assertEqual(models, [second, single, first])
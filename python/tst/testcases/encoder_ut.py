@@ -0,0 +1,147 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import subprocess
+import sys
+import unittest
+
+sys.path.append('..')
+from modelparsing.encoder import CAUSES, CSRS, Encoder, encode, fields
+from modelparsing.exceptions import OpcodeError
+sys.path.remove('..')
+
+# checkout of the riscv-opcodes project, next to the python folder
+RV_OPC = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                      '../../../riscv-opcodes')
+
+
+class TestEncoder(unittest.TestCase):
+    '''
+    Tests for the encoder, that replaces parse-opcodes.
+    '''
+
+    def testEncodeIType(self):
+        (match, mask) = encode('itype', fields('I', 0x02, 0x0, 0xff))
+        self.assertEqual(match, 0xb)
+        self.assertEqual(mask, 0x707f)
+
+    def testEncodeRType(self):
+        (match, mask) = encode('rtype', fields('R', 0x1e, 0x7, 0x7e))
+        self.assertEqual(match, 0xfc00707b)
+        self.assertEqual(mask, 0xfe00707f)
+
+    def testEncodeIllegal(self):
+        with self.assertRaises(OpcodeError):
+            encode('itype', fields('I', 0x02, 0x8, 0x0))
+        with self.assertRaises(OpcodeError):
+            encode('rtype', fields('R', 0x02, 0x0, 0x80))
+        with self.assertRaises(OpcodeError):
+            fields('S', 0x02, 0x0, 0x0)
+
+    def testDuplicate(self):
+        encoder = Encoder()
+        encoder.add('itype', 'I', 0x02, 0x0, 0x0)
+        with self.assertRaises(OpcodeError):
+            encoder.add('itype', 'I', 0x02, 0x1, 0x0)
+
+    def testOverlap(self):
+        encoder = Encoder()
+        encoder.add('itype', 'I', 0x02, 0x0, 0x0)
+        encoder.add('rtype', 'R', 0x02, 0x1, 0x0)
+        with self.assertRaises(OpcodeError):
+            encoder.add('itype1', 'I', 0x02, 0x0, 0x0)
+        with self.assertRaises(OpcodeError):
+            encoder.add('rtype1', 'R', 0x02, 0x1, 0x0)
+        encoder.add('rtype2', 'R', 0x02, 0x1, 0x1)
+
+        self.assertEqual(encoder.names, ['itype', 'rtype', 'rtype2'])
+
+    def testDefines(self):
+        encoder = Encoder()
+        encoder.add('fix.mpy', 'R', 0x02, 0x0, 0x1)
+        self.assertEqual(encoder.defines('fix.mpy'),
+                         ('#define MASK_FIX_MPY  0xfe00707f\n',
+                          '#define MATCH_FIX_MPY 0x200000b\n'))
+
+    def testHeader(self):
+        # instructions keep the order, in which they were added
+        encoder = Encoder()
+        encoder.add('second', 'I', 0x02, 0x1, 0x0)
+        encoder.add('first', 'R', 0x0a, 0x0, 0x2)
+
+        lines = encoder.header().splitlines()
+        self.assertEqual(lines[0:7], [
+            '/* Automatically generated by parse-opcodes.  */',
+            '#ifndef RISCV_ENCODING_H',
+            '#define RISCV_ENCODING_H',
+            '#define MATCH_SECOND 0x100b',
+            '#define MASK_SECOND  0x707f',
+            '#define MATCH_FIRST 0x400002b',
+            '#define MASK_FIRST  0xfe00707f'])
+        self.assertTrue('DECLARE_INSN(second, MATCH_SECOND, MASK_SECOND)\n'
+                        'DECLARE_INSN(first, MATCH_FIRST, MASK_FIRST)\n'
+                        in encoder.header())
+        # the #endif of the include guard and three #ifdef blocks
+        self.assertEqual(len(lines), 7 + 2 * len(CSRS) + 2 * len(CAUSES) +
+                         2 + 1 + 3 * 2)
+        self.assertEqual(lines[-1], '#endif')
+
+    def testManyInstructions(self):
+        # all R-type encodings of a custom opcode
+        encoder = Encoder()
+        for funct3 in range(0, 8):
+            for funct7 in range(0, 128):
+                encoder.add('r{}_{}'.format(funct3, funct7), 'R', 0x16,
+                            funct3, funct7)
+
+        self.assertEqual(len(encoder.names), 1024)
+        self.assertEqual(len(set(encoder.match.values())), 1024)
+
+    def testParseOpcodesParity(self):
+        # the header, including the csrs and causes, is the same as the
+        # one of parse-opcodes of the checkout
+        parser = os.path.join(RV_OPC, 'parse-opcodes')
+        if not os.path.isfile(parser):
+            self.skipTest('riscv-opcodes is not checked out')
+
+        encoder = Encoder()
+        encoder.add('rtype', 'R', 0x02, 0x1, 0x2)
+        encoder.add('fix.itype', 'I', 0x0a, 0x3, 0x0)
+        content = ('rtype rd rs1 rs2 31..25=2 14..12=1 6..2=2 1..0=3\n'
+                   'fix.itype rd rs1 imm12 14..12=3 6..2=10 1..0=3\n')
+
+        p = subprocess.Popen([parser, '-c'],
+                             stdin=subprocess.PIPE,
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE)
+        (defines, err) = p.communicate(input=content)
+
+        self.assertEqual(err, '')
+        self.assertEqual(encoder.header(), defines)
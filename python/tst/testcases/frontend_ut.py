@@ -0,0 +1,203 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import time
+import unittest
+
+from scripts import model_gen
+from scripts.ccmodel import CCModel
+from mako.template import Template
+
+sys.path.append('..')
+from modelparsing import frontend
+from modelparsing.frontend import Preamble, includes
+from modelparsing.model import Model
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestPreamble(unittest.TestCase):
+    '''
+    Tests for the precompiled header of the common includes.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestPreamble, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def setUp(self):
+        self.cachepath = os.path.join(self.folderpath, 'cache')
+        self.regfile = os.path.join(self.folderpath, 'registers.hh')
+        with open(self.regfile, 'w') as fh:
+            fh.write('#include <cstdint>\n' +
+                     '#define c0 0x800\n' +
+                     'uint32_t READ_CUSTOM_REG(uint32_t reg);\n')
+
+        self.filename = os.path.join(self.folderpath, 'rtype.cc')
+        self.ccmodel = CCModel('rtype', 'R', 'uint32_t',
+                               0x02, 0x01, 0x03, [])
+
+        with open(self.filename, 'w') as fh:
+            fh.write(Template(filename=model_gen).render(model=self.ccmodel))
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    def testBuild(self):
+        pch = Preamble(self.cachepath, self.regfile).build()
+
+        self.assertIsNotNone(pch)
+        self.assertTrue(os.path.isfile(pch))
+
+        # a second preamble reuses the header
+        self.assertEqual(Preamble(self.cachepath, self.regfile).build(), pch)
+
+    def testCovers(self):
+        # the preamble is only used for models, that include its headers
+        preamble = Preamble(self.cachepath, self.regfile)
+        plain = Preamble(self.cachepath)
+        self.assertFalse(preamble.covers(self.filename))
+        self.assertTrue(plain.covers(self.filename))
+
+        with open(self.filename, 'r') as fh:
+            source = fh.read()
+        self.assertTrue(preamble.covers(
+            self.filename, '#include "registers.hh"\n' + source))
+        self.assertFalse(plain.covers(
+            self.filename, source.replace('#include <cstdint>', '')))
+
+    def testIncludes(self):
+        # quoted includes are followed, system includes are only named
+        header = os.path.join(self.folderpath, 'sub', 'model.hh')
+        os.mkdir(os.path.dirname(header))
+        with open(header, 'w') as fh:
+            fh.write('#include "../registers.hh"\n#include <cmath>\n')
+
+        (files, system) = includes(self.filename,
+                                   '#include "sub/model.hh"\n' +
+                                   '#include "missing.hh"\n')
+
+        self.assertEqual(files, [os.path.abspath(self.filename), header,
+                                 os.path.join(self.folderpath, 'missing.hh'),
+                                 self.regfile])
+        self.assertEqual(system, set(['cmath', 'cstdint']))
+
+    def testModelWithPreamble(self):
+        pch = Preamble(self.cachepath, self.regfile).build()
+
+        model = Model(self.filename, pch=pch)
+
+        self.assertEqual(model.metadata, Model(self.filename).metadata)
+
+    def testRegisterFileChanged(self):
+        pch = Preamble(self.cachepath, self.regfile).build()
+
+        with open(self.regfile, 'a') as fh:
+            fh.write('#define c1 0xcc0\n')
+
+        pch1 = Preamble(self.cachepath, self.regfile).build()
+
+        self.assertNotEqual(pch, pch1)
+        self.assertIsNotNone(Model(self.filename, pch=pch1))
+
+    def testRegisterFileTouched(self):
+        Preamble(self.cachepath, self.regfile).build()
+
+        # clang rejects a header, if an input is newer than the header
+        now = time.time() + 10
+        os.utime(self.regfile, (now, now))
+
+        pch = Preamble(self.cachepath, self.regfile).build()
+
+        self.assertIsNotNone(pch)
+        self.assertTrue(Preamble(self.cachepath, self.regfile).usable(pch))
+
+    def testLibclangPathCached(self):
+        cachefile = os.path.join(self.folderpath, 'libclang')
+        lib = os.path.join(self.folderpath, 'libclang.so')
+        open(lib, 'w').close()
+
+        paths = frontend.LIBCLANG_PATHS
+        cached = frontend._libclang_path
+        try:
+            # first discovery is written to the cache file
+            frontend.LIBCLANG_PATHS = [lib]
+            frontend._libclang_path = None
+            self.assertEqual(frontend.libclang_path(cachefile), lib)
+            with open(cachefile, 'r') as fh:
+                self.assertEqual(fh.read().strip(), lib)
+
+            # later runs do not search again
+            frontend.LIBCLANG_PATHS = []
+            frontend._libclang_path = None
+            self.assertEqual(frontend.libclang_path(cachefile), lib)
+
+            # a removed library is searched again
+            os.remove(lib)
+            frontend._libclang_path = None
+            self.assertEqual(frontend.libclang_path(cachefile),
+                             frontend.find_libclang())
+        finally:
+            frontend.LIBCLANG_PATHS = paths
+            frontend._libclang_path = cached
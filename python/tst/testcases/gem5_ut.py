@@ -239,3 +239,13 @@ decode OPCODE default Unknown::unknown() {
 }
 '''
         self.assertEqual(decoder.decoder, expect)
+
+    def testIsaFiles(self):
+        # the decoder is generated again, if one of these files changed
+        decoder = Gem5(self.Extensions([]), self.regs)
+
+        names = [os.path.basename(path) for path in decoder.isa_files()]
+
+        self.assertTrue('main.isa' in names)
+        self.assertTrue('includes.isa' in names)
+        self.assertTrue(any(name.endswith('.py') for name in names))
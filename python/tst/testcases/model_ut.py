@@ -343,3 +343,188 @@ class TestModel(unittest.TestCase):
 
         with self.assertRaises(ValueError):
             Model(filename)
+
+    def testCompileWarning(self):
+        # warnings enabled by -Wall fail the model
+        name = 'warning'
+        filename = self.folderpath + name + '.cc'
+
+        self.genModel(name, filename)
+
+        with open(filename, 'r') as fh:
+            content = fh.read()
+        with open(filename, 'w') as fh:
+            fh.write(content.replace('// function definition',
+                                     'uint32_t unused;'))
+
+        with self.assertRaises(ConsistencyError):
+            Model(filename)
+
+    def testStrictModel(self):
+        # additional check with g++
+        name = 'strict'
+        filename = self.folderpath + name + '.cc'
+
+        self.genModel(name, filename)
+
+        model = Model(filename, strict=True)
+
+        self.assertEqual(model.form, self.ccmodel.ftype)
+        self.assertEqual(model.funct3, self.ccmodel.funct3)
+        self.assertEqual(model.opc, self.ccmodel.opc)
+
+    def testDeeplyNestedModel(self):
+        # long if/else chains must not hit any recursion limit
+        name = 'nested'
+        filename = self.folderpath + name + '.cc'
+
+        self.genModel(name, filename)
+
+        body = 'if (Rs1_uw == 0) {\n    Rd_uw = 0;\n}\n' + ''.join(
+            'else if (Rs1_uw == {0}) {{\n    Rd_uw = {0};\n}}\n'.format(i)
+            for i in range(1, 2000))
+        with open(filename, 'r') as fh:
+            content = fh.read()
+        with open(filename, 'w') as fh:
+            fh.write(content.replace('// function definition', body))
+
+        model = Model(filename)
+
+        self.assertEqual(model.name, self.ccmodel.name)
+        self.assertTrue(
+            model.definition.startswith('{\n    if (Rs1_uw == 0)'))
+        self.assertTrue(model.definition.endswith('Rd_uw = 1999;\n}\n\n}'))
+
+    def testMultibyteSource(self):
+        # extents are byte offsets, non-ascii text must not shift them
+        name = 'multibyte'
+        filename = self.folderpath + name + '.cc'
+
+        self.genModel(name, filename)
+
+        with open(filename, 'r') as fh:
+            content = fh.read()
+        with open(filename, 'w') as fh:
+            fh.write('// \xc3\xa4\xc3\xb6\xc3\xbc\n' + content.replace(
+                '// function definition', '// \xc3\x9f\n    Rd_uw = Rs1_uw;'))
+
+        model = Model(filename)
+
+        self.assertTrue(model.definition.startswith('{'))
+        self.assertTrue(model.definition.endswith('Rd_uw = Rs1_uw;\n}'))
+
+    def testMultipleInstructions(self):
+        filename = self.folderpath + 'multi.cc'
+        with open(filename, 'w') as fh:
+            fh.write('#include <cstdint>\n' +
+                     'uint8_t opc = 0x02;\n' +
+                     'uint8_t add_funct3 = 0x0;\n' +
+                     'uint8_t add_funct7 = 0x0;\n' +
+                     'uint8_t sub_opc = 0x0a;\n' +
+                     'uint8_t sub_funct3 = 0x1;\n' +
+                     'uint8_t sub_cycles = 2;\n' +
+                     'void add(uint32_t Rd, uint32_t Rs1, uint32_t Rs2)\n' +
+                     '{\n    Rd = Rs1 + Rs2;\n}\n' +
+                     'void sub(uint32_t Rd, uint32_t Rs1, uint32_t imm)\n' +
+                     '{\n    Rd = Rs1 - imm;\n}\n')
+
+        (add, sub) = Model.from_file(filename)
+
+        self.assertEqual(add.name, 'add')
+        self.assertEqual(add.form, 'R')
+        self.assertEqual(add.opc, 0x02)
+        self.assertEqual(add.funct3, 0x0)
+        self.assertEqual(add.funct7, 0x0)
+        self.assertEqual(add.cycles, 1)
+        self.assertEqual(add.definition, '{\n    Rd = Rs1 + Rs2;\n}')
+
+        # prefixed globals take precedence
+        self.assertEqual(sub.name, 'sub')
+        self.assertEqual(sub.form, 'I')
+        self.assertEqual(sub.opc, 0x0a)
+        self.assertEqual(sub.funct3, 0x1)
+        self.assertEqual(sub.cycles, 2)
+        self.assertEqual(sub.definition, '{\n    Rd = Rs1 - imm;\n}')
+
+    def testSingleInstructionFromFile(self):
+        name = 'itype'
+        filename = self.folderpath + name + '.cc'
+        self.genModel(name, filename)
+
+        models = Model.from_file(filename)
+
+        self.assertEqual(len(models), 1)
+        self.assertEqual(models[0].metadata, Model(filename).metadata)
+
+    def testMultipleInstructionsInvalid(self):
+        # funct7 missing for the R-Type instruction
+        filename = self.folderpath + 'multi.cc'
+        with open(filename, 'w') as fh:
+            fh.write('#include <cstdint>\n' +
+                     'uint8_t opc = 0x02;\n' +
+                     'uint8_t funct3 = 0x0;\n' +
+                     'void add(uint32_t Rd, uint32_t Rs1, uint32_t Rs2)\n' +
+                     '{\n    Rd = Rs1 + Rs2;\n}\n' +
+                     'void addi(uint32_t Rd, uint32_t Rs1, uint32_t imm)\n' +
+                     '{\n    Rd = Rs1 + imm;\n}\n')
+
+        with self.assertRaises(ValueError):
+            Model.from_file(filename)
+
+    def testAllocateModel(self):
+        # omitted encoding fields are only allowed, if they are allocated
+        filename = self.folderpath + 'add.cc'
+        with open(filename, 'w') as fh:
+            fh.write('#include <cstdint>\n' +
+                     'uint8_t opc = 0x02;\n' +
+                     'void add(uint32_t Rd, uint32_t Rs1, uint32_t Rs2)\n' +
+                     '{\n    Rd = Rs1 + Rs2;\n}\n')
+
+        with self.assertRaises(ValueError):
+            Model(filename)
+
+        model = Model(filename, allocate=True)
+        self.assertEqual((model.opc, model.funct3, model.funct7),
+                         (0x02, None, None))
+        self.assertFalse(model.allocated)
+        self.assertEqual(Model(metadata=model.metadata,
+                               allocate=True).metadata, model.metadata)
+
+    def testFromSource(self):
+        name = 'itype'
+        filename = self.folderpath + name + '.cc'
+        self.genModel(name, filename)
+        with open(filename, 'r') as fh:
+            source = fh.read()
+
+        # the model only exists in memory
+        memname = self.folderpath + 'inmemory.cc'
+        models = Model.from_source(memname, source)
+
+        self.assertFalse(os.path.exists(memname))
+        self.assertEqual(len(models), 1)
+        self.assertEqual(models[0].metadata, Model(filename).metadata)
+
+    def testFromSourceInvalid(self):
+        name = 'nord'
+        filename = self.folderpath + name + '.cc'
+        self.genModel(name, filename, faults=['nord'])
+        with open(filename, 'r') as fh:
+            source = fh.read()
+
+        with self.assertRaises(ConsistencyError):
+            Model.from_source(self.folderpath + 'inmemory.cc', source)
+
+    def testFromSources(self):
+        sources = []
+        for i in range(0, 4):
+            self.ccmodel = CCModel('itype{}'.format(i), 'I', 'uint32_t',
+                                   0x02, i, 0xff, [])
+            source = Template(filename=model_gen).render(model=self.ccmodel)
+            sources.append(('itype{}.cc'.format(i), source))
+
+        models = Model.from_sources(sources)
+
+        self.assertEqual([model.name for model in models],
+                         ['itype0', 'itype1', 'itype2', 'itype3'])
+        self.assertEqual([model.funct3 for model in models], [0, 1, 2, 3])
@@ -0,0 +1,183 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import time
+import unittest
+
+sys.path.append('..')
+from modelparsing.encoder import encode, fields
+from modelparsing.opcodeindex import OpcodeIndex, parse_opcodes_line
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestOpcodeIndex(unittest.TestCase):
+    '''
+    Tests for the overlap detection with the encoding trie.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestOpcodeIndex, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    def add(self, index, name, form, opc, funct3, funct7=0x0):
+        (match, mask) = encode(name, fields(form, opc, funct3, funct7))
+        index.add(name, match, mask)
+        return match, mask
+
+    def names(self, index, match, mask):
+        return sorted(entry[0] for entry in index.overlaps(match, mask))
+
+    def testParseLine(self):
+        self.assertEqual(
+            parse_opcodes_line('addi rd rs1 imm12 14..12=0 6..2=0x04 1..0=3'),
+            ('addi', 0x13, 0x707f))
+        self.assertEqual(
+            parse_opcodes_line('fence.i rd rs1 imm12 14..12=1 6..2=0x03 ' +
+                               '1..0=3  # comment'),
+            ('fence.i', 0x100f, 0x707f))
+        self.assertEqual(
+            parse_opcodes_line('fence 31..28=ignore pred succ rs1 ' +
+                               '14..12=0 rd 6..2=0x03 1..0=3'),
+            ('fence', 0xf, 0x707f))
+        self.assertEqual(
+            parse_opcodes_line('c.nop 15..13=0 12=0 11..2=0 1..0=1'),
+            ('c.nop', 0x1, 0xffff))
+        self.assertEqual(parse_opcodes_line('@slli.rv32 rd rs1 ' +
+                                            '31..25=0 14..12=1 6..2=0x04 ' +
+                                            '1..0=3'), None)
+        self.assertEqual(parse_opcodes_line('# comment'), None)
+
+    def testOverlaps(self):
+        index = OpcodeIndex()
+        self.add(index, 'itype', 'I', 0x02, 0x0)
+        self.add(index, 'rtype', 'R', 0x02, 0x1, 0x1)
+        self.add(index, 'other', 'R', 0x0a, 0x1, 0x1)
+
+        # same opcode and funct3, I-type overlaps every funct7
+        (match, mask) = encode('r', fields('R', 0x02, 0x0, 0x5))
+        self.assertEqual(self.names(index, match, mask), ['itype'])
+        (match, mask) = encode('i', fields('I', 0x02, 0x1, 0x0))
+        self.assertEqual(self.names(index, match, mask), ['rtype'])
+        (match, mask) = encode('r', fields('R', 0x02, 0x1, 0x2))
+        self.assertEqual(self.names(index, match, mask), [])
+        (match, mask) = encode('i', fields('I', 0x1e, 0x1, 0x0))
+        self.assertEqual(self.names(index, match, mask), [])
+
+    def testWildcards(self):
+        # fields, that are not fixed completely, match all branches
+        index = OpcodeIndex()
+        self.add(index, 'itype', 'I', 0x02, 0x0)
+        self.add(index, 'rtype', 'R', 0x02, 0x1, 0x1)
+        # only the opcode is fixed, like a custom0 placeholder
+        index.add('custom0', 0xb, 0x7f)
+
+        (match, mask) = encode('i', fields('I', 0x02, 0x7, 0x0))
+        self.assertEqual(self.names(index, match, mask), ['custom0'])
+        self.assertEqual(self.names(index, 0x100b, 0x707f),
+                         ['custom0', 'rtype'])
+        # a partially fixed funct7
+        self.assertEqual(self.names(index, 0x0200100b, 0x0600707f),
+                         ['custom0', 'rtype'])
+        self.assertEqual(self.names(index, 0x0400100b, 0x0600707f),
+                         ['custom0'])
+
+    def testBaseIsa(self):
+        # instructions of the riscv-opcodes files are part of the index
+        opcodes = os.path.join(self.folderpath, 'opcodes')
+        with open(opcodes, 'w') as fh:
+            fh.write('# base isa\n' +
+                     'addi rd rs1 imm12 14..12=0 6..2=0x04 1..0=3\n' +
+                     'add rd rs1 rs2 31..25=0 14..12=0 6..2=0x0C 1..0=3\n')
+
+        index = OpcodeIndex()
+        index.add_base(self.folderpath)
+        self.assertEqual(len(index), 2)
+
+        (match, mask) = encode('rtype', fields('R', 0x04, 0x0, 0x1))
+        self.assertEqual(index.overlaps(match, mask),
+                         [('addi', 0x13, 0x707f, 'opcodes')])
+        (match, mask) = encode('itype', fields('I', 0x02, 0x0, 0x0))
+        self.assertEqual(index.overlaps(match, mask), [])
+
+    def testManyInstructions(self):
+        # the whole custom R-type encoding space is checked in time
+        start = time.time()
+        index = OpcodeIndex()
+        for opc in (0x02, 0x0a, 0x16, 0x1e):
+            for funct3 in range(0, 8):
+                for funct7 in range(0, 128):
+                    (match, mask) = encode('r', fields('R', opc, funct3,
+                                                       funct7))
+                    self.assertEqual(index.overlaps(match, mask), [])
+                    index.add('r', match, mask)
+        (match, mask) = encode('i', fields('I', 0x16, 0x3, 0x0))
+        overlaps = index.overlaps(match, mask)
+
+        self.assertEqual(len(index), 4096)
+        self.assertEqual(len(overlaps), 128)
+        self.assertTrue(time.time() - start < 1.0)
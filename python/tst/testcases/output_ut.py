@@ -0,0 +1,234 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import unittest
+
+sys.path.append('..')
+from modelparsing.output import UMASK, copy_if_changed, inserted, \
+    replacing, snapshot, sync_tree, write_file, write_if_changed
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestOutput(unittest.TestCase):
+    '''
+    Tests for writing generated files only if their content changed.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestOutput, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    def age(self, path):
+        '''
+        Set the mtime of a file into the past.
+        '''
+        os.utime(path, (0, 0))
+
+    def testWriteNew(self):
+        # a new file and its directory are created
+        path = os.path.join(self.folderpath, 'sub/new.h')
+        self.assertTrue(write_if_changed(path, 'content\n'))
+
+        with open(path, 'r') as fh:
+            self.assertEqual(fh.read(), 'content\n')
+
+    def testWriteMode(self):
+        # new files get the mode of the umask, without changing it
+        path = os.path.join(self.folderpath, 'new.h')
+        mask = os.umask(0o022)
+        try:
+            write_if_changed(path, 'content\n')
+            self.assertEqual(os.umask(0o022), 0o022)
+        finally:
+            os.umask(mask)
+
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o666 & ~UMASK)
+
+    def testWriteFile(self):
+        # the file is replaced, even with the same content
+        path = os.path.join(self.folderpath, 'sub/file.json')
+        write_file(path, '{}\n')
+        self.age(path)
+
+        write_file(path, '{}\n')
+        self.assertNotEqual(os.stat(path).st_mtime, 0)
+        self.assertEqual(os.listdir(os.path.dirname(path)), ['file.json'])
+
+    def testReplacingKeepsMode(self):
+        path = os.path.join(self.folderpath, 'file.sh')
+        write_file(path, 'old\n')
+        os.chmod(path, 0o750)
+
+        with replacing(path) as tmp:
+            with open(tmp, 'w') as fh:
+                fh.write('new\n')
+
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o750)
+        with open(path, 'r') as fh:
+            self.assertEqual(fh.read(), 'new\n')
+
+    def testReplacingError(self):
+        # on errors, the file is kept and the temporary file removed
+        path = os.path.join(self.folderpath, 'file.h')
+        write_file(path, 'old\n')
+
+        with self.assertRaises(ValueError):
+            with replacing(path) as tmp:
+                with open(tmp, 'w') as fh:
+                    fh.write('new\n')
+                raise ValueError('failed')
+
+        self.assertEqual(os.listdir(self.folderpath), ['file.h'])
+        with open(path, 'r') as fh:
+            self.assertEqual(fh.read(), 'old\n')
+
+    def testWriteUnchanged(self):
+        # the same content leaves the file untouched
+        path = os.path.join(self.folderpath, 'file.h')
+        write_if_changed(path, 'content\n')
+        self.age(path)
+
+        self.assertFalse(write_if_changed(path, 'content\n'))
+        self.assertEqual(os.stat(path).st_mtime, 0)
+
+    def testWriteChanged(self):
+        # other content replaces the file
+        path = os.path.join(self.folderpath, 'file.h')
+        write_if_changed(path, 'content\n')
+        self.age(path)
+
+        self.assertTrue(write_if_changed(path, 'other\n'))
+        self.assertNotEqual(os.stat(path).st_mtime, 0)
+        with open(path, 'r') as fh:
+            self.assertEqual(fh.read(), 'other\n')
+
+    def testCopyUnchanged(self):
+        src = os.path.join(self.folderpath, 'src.h')
+        dst = os.path.join(self.folderpath, 'dst.h')
+        write_if_changed(src, 'content\n')
+
+        self.assertTrue(copy_if_changed(src, dst))
+        self.age(dst)
+        self.assertFalse(copy_if_changed(src, dst))
+        self.assertEqual(os.stat(dst).st_mtime, 0)
+
+    def testSyncTree(self):
+        # only new and changed files are copied
+        src = os.path.join(self.folderpath, 'src')
+        dst = os.path.join(self.folderpath, 'dst')
+        write_if_changed(os.path.join(src, 'same.cc'), 'same\n')
+        write_if_changed(os.path.join(src, 'sub/changed.cc'), 'new\n')
+        write_if_changed(os.path.join(dst, 'same.cc'), 'same\n')
+        write_if_changed(os.path.join(dst, 'sub/changed.cc'), 'old\n')
+        write_if_changed(os.path.join(dst, 'regsintr.hh'), 'regs\n')
+
+        copied = sync_tree(src, dst, keep=['regsintr.hh'])
+
+        self.assertEqual(copied, [os.path.join(dst, 'sub/changed.cc')])
+        self.assertTrue(os.path.exists(os.path.join(dst, 'regsintr.hh')))
+        with open(os.path.join(dst, 'sub/changed.cc'), 'r') as fh:
+            self.assertEqual(fh.read(), 'new\n')
+
+    def testSyncTreeRemoved(self):
+        # files, that are no longer generated, are removed
+        src = os.path.join(self.folderpath, 'src')
+        dst = os.path.join(self.folderpath, 'dst')
+        write_if_changed(os.path.join(src, 'same.cc'), 'same\n')
+        write_if_changed(os.path.join(dst, 'same.cc'), 'same\n')
+        write_if_changed(os.path.join(dst, 'removed.cc'), 'removed\n')
+        write_if_changed(os.path.join(dst, 'sub/removed.cc'), 'removed\n')
+        write_if_changed(os.path.join(dst, 'regsintr.hh'), 'regs\n')
+
+        self.assertEqual(sync_tree(src, dst, keep=['regsintr.hh']), [])
+
+        self.assertEqual(sorted(os.listdir(dst)), ['regsintr.hh', 'same.cc'])
+
+    def testInserted(self):
+        original = 'a\nb\nc\n'
+
+        self.assertEqual(inserted(original, original), [])
+        self.assertEqual(inserted('a\nx\ny\nb\nc\n', original),
+                         ['x\n', 'y\n'])
+        self.assertIsNone(inserted('a\nx\nc\n', original))
+        self.assertIsNone(inserted('a\nx\nb\ny\nc\n', original))
+
+    def testSnapshotPatched(self):
+        path = os.path.join(self.folderpath, 'opc.h')
+        patched = (lambda content, original:
+                   inserted(content, original) in ([], ['patch\n']))
+        write_if_changed(path, 'first\n')
+
+        self.assertEqual(snapshot(path, patched), 'first\n')
+        write_if_changed(path, 'patch\nfirst\n')
+        self.assertEqual(snapshot(path, patched), 'first\n')
+
+        # updated upstream, the copy is taken again
+        write_if_changed(path, 'second\n')
+        self.assertEqual(snapshot(path, patched), 'second\n')
+        with open(path + '_old', 'r') as fh:
+            self.assertEqual(fh.read(), 'second\n')
@@ -29,6 +29,7 @@
 import os
 import shutil
 import sys
+import threading
 import unittest
 
 from scripts import model_gen
@@ -37,7 +38,7 @@ from mako.template import Template
 
 sys.path.append('..')
 from modelparsing.exceptions import ConsistencyError
-from modelparsing.parser import Parser
+from modelparsing.parser import Parser, run_concurrently
 from tst import folderpath
 sys.path.remove('..')
 
@@ -107,6 +108,9 @@ class TestParser(unittest.TestCase):
                      '{0, 0, 0, 0, 0, 0, 0}\n' +
                      '};')
 
+        self.tc = os.path.join(os.path.expanduser('~'),
+                               'projects/riscv-gnu-toolchain')
+
     def tearDown(self):
         # remove generated file
         if hasattr(self, '_outcome'):  # Python 3.4+
@@ -146,3 +150,156 @@ class TestParser(unittest.TestCase):
 
         with open(filename, 'w') as fh:
             fh.write(modelgen.render(model=self.ccmodel))
+
+    def testLoadModelsParallel(self):
+        # models parsed in a process pool keep the order of the files
+        files = []
+        for i in range(0, 4):
+            name = 'itype{}'.format(i)
+            self.funct3 = i
+            filename = self.folderpath + name + '.cc'
+            self.genModel(name, filename)
+            files.append(filename)
+
+        parser = Parser(self.tc, self.folderpath, jobs=4)
+        models = parser.load_models(files)
+
+        self.assertEqual([model.name for model in models],
+                         ['itype0', 'itype1', 'itype2', 'itype3'])
+        self.assertEqual([model.funct3 for model in models], [0, 1, 2, 3])
+
+    def testLoadModelsParallelError(self):
+        # an inconsistent model is reported, even if others are fine
+        files = []
+        name = 'itype'
+        filename = self.folderpath + name + '.cc'
+        self.genModel(name, filename)
+        files.append(filename)
+
+        name = 'nord'
+        self.funct3 = 0x01
+        filename = self.folderpath + name + '.cc'
+        self.genModel(name, filename, faults=['nord'])
+        files.append(filename)
+
+        parser = Parser(self.tc, self.folderpath, jobs=2)
+
+        with self.assertRaises(ConsistencyError):
+            parser.load_models(files)
+
+    def testLoadModelsMultipleInstructions(self):
+        # all instructions of a file follow each other
+        filename = self.folderpath + 'multi.cc'
+        with open(filename, 'w') as fh:
+            fh.write('#include <cstdint>\n' +
+                     'uint8_t opc = 0x02;\n' +
+                     'uint8_t first_funct3 = 0x1;\n' +
+                     'uint8_t second_funct3 = 0x2;\n' +
+                     'void first(uint32_t Rd, uint32_t Rs1, uint32_t imm)\n' +
+                     '{\n    Rd = Rs1 + imm;\n}\n' +
+                     'void second(uint32_t Rd, uint32_t Rs1, uint32_t imm)\n' +
+                     '{\n    Rd = Rs1 - imm;\n}\n')
+        self.genModel('itype', self.folderpath + 'itype.cc')
+
+        parser = Parser(self.tc, self.folderpath, jobs=2)
+        models = parser.load_models([filename, self.folderpath + 'itype.cc'])
+
+        self.assertEqual([model.name for model in models],
+                         ['first', 'second', 'itype'])
+        self.assertEqual([model.funct3 for model in models], [1, 2, 0])
+
+    def testLoadModelsForget(self):
+        # models are kept by the parser, until their file is forgotten
+        filename = self.folderpath + 'itype.cc'
+        self.genModel('itype', filename)
+
+        parser = Parser(self.tc, self.folderpath, jobs=1)
+        parser.load_models([filename])
+
+        self.funct3 = 0x01
+        self.genModel('itype', filename)
+        models = parser.load_models([filename])
+        self.assertEqual(models[0].funct3, 0)
+
+        parser.forget([filename])
+        models = parser.load_models([filename])
+        self.assertEqual(models[0].funct3, 1)
+
+    def testRegistersOfRoots(self):
+        # the registers of all model roots are merged
+        roots = [os.path.join(self.folderpath, root) for root in 'ab']
+        for (root, reg) in zip(roots, ['c0 0x800', 'c1 0x801']):
+            os.mkdir(root)
+            with open(os.path.join(root, 'registers.hh'), 'w') as fh:
+                fh.write('#define {}\n'.format(reg))
+
+        parser = Parser(self.tc, roots, jobs=1)
+        parser.treewalk(roots)
+        self.assertEqual(parser.regs.regmap, {'c0': 0x800, 'c1': 0x801})
+
+        with open(os.path.join(roots[1], 'registers.hh'), 'a') as fh:
+            fh.write('#define c0 0x802\n')
+        parser = Parser(self.tc, roots, jobs=1)
+        with self.assertRaises(ConsistencyError):
+            parser.treewalk(roots)
+
+    def testPreambleMissingInclude(self):
+        # the precompiled header does not hide a missing include
+        filename = self.folderpath + 'itype.cc'
+        self.genModel('itype', filename)
+        with open(filename, 'r') as fh:
+            source = fh.read()
+        with open(filename, 'w') as fh:
+            fh.write(source.replace('#include <cstdint>', ''))
+
+        parser = Parser(self.tc, self.folderpath,
+                        cachepath=self.folderpath + 'cache', jobs=1)
+        with self.assertRaises(ConsistencyError):
+            parser.load_models([filename])
+
+    def testAllocate(self):
+        # related instructions without encoding share opcode and funct3
+        filename = self.folderpath + 'multi.cc'
+        with open(filename, 'w') as fh:
+            fh.write('#include <cstdint>\n' +
+                     'uint8_t opc = 0x0a;\n' +
+                     'void first(uint32_t Rd, uint32_t Rs1, uint32_t Rs2)\n' +
+                     '{\n    Rd = Rs1 + Rs2;\n}\n' +
+                     'void second(uint32_t Rd, uint32_t Rs1, uint32_t Rs2)\n' +
+                     '{\n    Rd = Rs1 - Rs2;\n}\n')
+        lockfile = self.folderpath + 'opcodes.lock'
+
+        parser = Parser(self.tc, self.folderpath, jobs=1, lockpath=lockfile)
+        parser.parse_models()
+
+        self.assertEqual([(model.name, model.opc, model.funct3, model.funct7)
+                          for model in parser.models],
+                         [('first', 0x0a, 0x0, 0x0),
+                          ('second', 0x0a, 0x0, 0x1),
+                          ('read_custreg', 0x1e, 0x7, 0x7e),
+                          ('write_custreg', 0x1e, 0x7, 0x7f)])
+        self.assertEqual(parser.allocator.locked,
+                         {'first': [0x0a, 0x0, 0x0],
+                          'second': [0x0a, 0x0, 0x1]})
+        self.assertTrue(os.path.exists(lockfile))
+
+    def testRunConcurrently(self):
+        # stages run at the same time, a failing stage does not stop
+        # the others
+        started = threading.Event()
+        done = []
+
+        def compiler():
+            # only returns in time, if gem5 runs at the same time
+            self.assertTrue(started.wait(5))
+            done.append('compiler')
+
+        def gem5():
+            started.set()
+            raise ConsistencyError('gem5', 'failed')
+
+        errors = run_concurrently([('compiler', compiler), ('gem5', gem5)])
+
+        self.assertEqual(done, ['compiler'])
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(isinstance(errors[0], ConsistencyError))
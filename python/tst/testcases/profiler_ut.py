@@ -0,0 +1,173 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+import json
+import os
+import shutil
+import sys
+import unittest
+
+from scripts import model_gen
+from scripts.ccmodel import CCModel
+from mako.template import Template
+
+sys.path.append('..')
+from modelparsing import profiler as profilermodule
+from modelparsing.parser import Parser
+from modelparsing.profiler import Profiler, stage
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestProfiler(unittest.TestCase):
+    '''
+    Tests for the timing of stages and models.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestProfiler, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    def genModel(self, name, funct3):
+        '''
+        Create a cc model.
+        '''
+        filename = os.path.join(self.folderpath, name + '.cc')
+        ccmodel = CCModel(name, 'I', 'uint32_t', 0x02, funct3, 0xff, [])
+        with open(filename, 'w') as fh:
+            fh.write(Template(filename=model_gen).render(model=ccmodel))
+
+        return filename
+
+    def testStage(self):
+        profiler = Profiler()
+        profiler.activate()
+
+        for i in range(0, 2):
+            with stage('outer'):
+                with stage('inner', index=i):
+                    sum(range(10000))
+
+        stages = profiler.timings()['stages']
+        self.assertEqual(stages['outer']['calls'], 2)
+        self.assertEqual(stages['inner']['calls'], 2)
+        self.assertGreaterEqual(stages['outer']['wall'],
+                                stages['inner']['wall'])
+
+    def testParserTimings(self):
+        files = [self.genModel('itype0', 0), self.genModel('itype1', 1)]
+        tc = os.path.join(os.path.expanduser('~'),
+                          'projects/riscv-gnu-toolchain')
+
+        parser = Parser(tc, self.folderpath, jobs=2, profiler=Profiler())
+        parser.load_models(files)
+
+        timings = parser.timings
+        self.assertEqual(sorted(timings['models'].keys()), files)
+        self.assertTrue('parse' in timings['stages'])
+        for model in timings['models'].values():
+            self.assertGreater(model['wall'], 0)
+
+    def testParserWithoutProfiler(self):
+        # nothing is recorded, unless a profile is requested
+        files = [self.genModel('itype0', 0)]
+        tc = os.path.join(os.path.expanduser('~'),
+                          'projects/riscv-gnu-toolchain')
+        profilermodule._active = None
+
+        parser = Parser(tc, self.folderpath, jobs=1)
+        parser.load_models(files)
+
+        self.assertIsNone(parser.timings)
+        self.assertIsNone(profilermodule._active)
+
+    def testReset(self):
+        profiler = Profiler()
+        with profiler.stage('stage'):
+            pass
+        profiler.reset()
+
+        self.assertEqual(profiler.events, [])
+
+    def testWrite(self):
+        profiler = Profiler()
+        with profiler.stage('stage'):
+            pass
+        profiler.add('model.cc', 'model', 0, 0.5, 0.25, 42)
+
+        path = os.path.join(self.folderpath, 'profile.json')
+        profiler.write_json(path)
+        with open(path, 'r') as fh:
+            timings = json.load(fh)
+        self.assertEqual(timings['models']['model.cc'],
+                         {'wall': 0.5, 'cpu': 0.25})
+        self.assertEqual(timings['stages']['stage']['calls'], 1)
+
+        path = os.path.join(self.folderpath, 'trace.json')
+        profiler.write_trace(path)
+        with open(path, 'r') as fh:
+            trace = json.load(fh)
+        self.assertEqual([event['name'] for event in trace['traceEvents']],
+                         ['stage', 'model.cc'])
+        self.assertEqual(trace['traceEvents'][1]['dur'], 500000)
+        self.assertEqual(trace['traceEvents'][1]['pid'], 42)
@@ -0,0 +1,182 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+import os
+import shutil
+import sys
+import unittest
+
+from scripts import model_gen
+from scripts.ccmodel import CCModel
+from mako.template import Template
+
+sys.path.append('..')
+from modelparsing.model import Model
+from modelparsing.parser import parse_model
+from modelparsing.scanner import Scanner
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestScanner(unittest.TestCase):
+    '''
+    Parity tests of the fast scanner and libclang.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestScanner, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    def genModel(self, name, ftype='I', inttype='uint32_t', opc=0x02,
+                 funct3=0x0, funct7=0x0, faults=[], body=None):
+        '''
+        Create a cc model, optionally with a custom body.
+        '''
+        filename = os.path.join(self.folderpath, name + '.cc')
+        ccmodel = CCModel(name, ftype, inttype, opc, funct3, funct7, faults)
+        content = Template(filename=model_gen).render(model=ccmodel)
+        if body is not None:
+            content = content.replace('// function definition', body)
+
+        with open(filename, 'w') as fh:
+            fh.write(content)
+
+        return filename
+
+    def assertParity(self, filename):
+        self.assertEqual(Scanner(filename).scan(),
+                         [model.metadata
+                          for model in Model.from_file(filename)])
+
+    def testExtensions(self):
+        extensions = os.path.join(os.path.dirname(
+            os.path.realpath(__file__)), '../../../extensions')
+        for ext in sorted(os.listdir(extensions)):
+            filename = os.path.join(extensions, ext, ext + '.cc')
+            if os.path.isfile(filename):
+                self.assertParity(filename)
+
+    def testGeneratedModels(self):
+        i = 0
+        for ftype in ['R', 'I']:
+            for inttype in ['uint32_t', 'int32_t', 'uint64_t', 'int64_t']:
+                for opc in [0x02, 0x0a, 0x16, 0x1e]:
+                    for faults in [[], ['nocycles']]:
+                        filename = self.genModel('model{}'.format(i),
+                                                 ftype, inttype, opc,
+                                                 i % 8, i % 128, faults)
+                        self.assertParity(filename)
+                        i += 1
+
+    def testNestedBody(self):
+        body = 'if (Rs1_uw) {\n    /* } */\n    Rd_uw = \'}\';\n}' + \
+            ' else {\n    Rd_uw = sizeof("{");\n}'
+        filename = self.genModel('nested', body=body)
+
+        self.assertParity(filename)
+
+    def testFaultyModels(self):
+        # errors are left to libclang
+        for faults in [['nord'], ['nors1'], ['noop2'], ['nonvoid'],
+                       ['nodef'], ['noclose']]:
+            filename = self.genModel(faults[0], faults=faults)
+            self.assertIsNone(Scanner(filename).scan())
+
+    def testUnknownSyntax(self):
+        filename = self.genModel('macro')
+        with open(filename, 'r') as fh:
+            content = fh.read()
+        with open(filename, 'w') as fh:
+            fh.write('#define opc funct7\n' + content)
+
+        self.assertIsNone(Scanner(filename).scan())
+
+    def testFallback(self):
+        filename = self.genModel('invalid', opc=0x03)
+
+        # no model from the scanner, libclang reports the error
+        (models, error) = parse_model(filename, fast=True)
+        self.assertIsNone(models)
+        self.assertIsInstance(error, ValueError)
+
+        filename = self.genModel('valid')
+        (models, error) = parse_model(filename, fast=True)
+        self.assertIsNone(error)
+        self.assertEqual([model.metadata for model in models],
+                         [Model(filename).metadata])
+
+    def testScanMultipleInstructions(self):
+        filename = os.path.join(self.folderpath, 'multi.cc')
+        with open(filename, 'w') as fh:
+            fh.write('#include <cstdint>\n' +
+                     'uint8_t opc = 0x02;\n' +
+                     'uint8_t add_funct3 = 0x0;\n' +
+                     'uint8_t add_funct7 = 0x0;\n' +
+                     'uint8_t sub_funct3 = 0x1;\n' +
+                     'uint8_t sub_cycles = 2;\n' +
+                     'void add(uint32_t Rd, uint32_t Rs1, uint32_t Rs2)\n' +
+                     '{\n    Rd = Rs1 + Rs2;\n}\n' +
+                     'void sub(uint32_t Rd, uint32_t Rs1, uint32_t imm)\n' +
+                     '{\n    Rd = Rs1 - imm;\n}\n')
+
+        self.assertParity(filename)
@@ -0,0 +1,227 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+import unittest
+
+sys.path.append('..')
+from modelparsing.server import ParseServer, request
+from modelparsing.watcher import Monitor
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestParseServer(unittest.TestCase):
+    '''
+    Tests for the parse server and its client.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestParseServer, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    class Parser:
+        '''
+        Records forgotten files instead of parsing.
+        '''
+
+        def __init__(self, modelpath):
+            self._modelpath = modelpath
+            self.forgotten = []
+
+        def forget(self, files):
+            self.forgotten.append(files)
+
+        @property
+        def modelpath(self):
+            return self._modelpath
+
+        @property
+        def tcpath(self):
+            return '/toolchain'
+
+    def setUp(self):
+        self.sockpath = os.path.join(self.folderpath, 'parse.sock')
+        self.model = os.path.join(self.folderpath, 'itype.cc')
+        with open(self.model, 'w') as fh:
+            fh.write('model')
+        self.builds = []
+        self.updates = []
+
+    def regenerate(self, parser):
+        self.builds.append(len(parser.forgotten))
+
+    def update(self, parser):
+        self.updates.append(len(parser.forgotten))
+
+    def start(self, targets=['compiler', 'gem5']):
+        '''
+        Run a server in a thread.
+        '''
+        self.parser = self.Parser(self.folderpath)
+        monitor = Monitor(self.folderpath, interval=0, inotify=False)
+        self.server = ParseServer(self.parser, self.regenerate,
+                                  self.sockpath, monitor,
+                                  update=self.update, targets=targets)
+        self.thread = threading.Thread(target=self.server.serve)
+        self.thread.start()
+
+        # wait until the server listens
+        for i in range(0, 100):
+            try:
+                request(self.sockpath, 'ping')
+                return
+            except socket.error:
+                time.sleep(0.01)
+        self.fail('Parse server not started')
+
+    def stop(self):
+        request(self.sockpath, 'shutdown')
+        self.thread.join()
+
+    def testNoServer(self):
+        with self.assertRaises(socket.error):
+            request(self.sockpath, 'ping')
+
+    def testParse(self):
+        # only changes lead to a regeneration
+        self.start()
+        try:
+            answer = request(self.sockpath, 'parse',
+                             modelpath=self.folderpath,
+                             toolchain='/toolchain')
+            self.assertEqual(answer['status'], 'ok')
+            self.assertFalse(answer['regenerated'])
+
+            with open(self.model, 'w') as fh:
+                fh.write('changed model')
+            answer = request(self.sockpath, 'parse')
+            self.assertEqual(answer['status'], 'ok')
+            self.assertTrue(answer['regenerated'])
+            self.assertEqual(answer['changed'], [self.model])
+        finally:
+            self.stop()
+
+        self.assertEqual(self.builds, [0, 1])
+        # without changes, the outputs are only brought up to date
+        self.assertEqual(self.updates, [0])
+        self.assertEqual(self.parser.forgotten, [[self.model]])
+        self.assertFalse(os.path.exists(self.sockpath))
+
+    def testParseOtherModels(self):
+        # a server of other models can not be used
+        self.start()
+        try:
+            answer = request(self.sockpath, 'parse',
+                             modelpath=os.path.join(self.folderpath, 'x'))
+            self.assertEqual(answer['status'], 'error')
+            answer = request(self.sockpath, 'parse', toolchain='/other')
+            self.assertEqual(answer['status'], 'error')
+        finally:
+            self.stop()
+
+    def testParseOtherTargets(self):
+        # a server started for the compiler only does not extend gem5
+        self.start(targets=['compiler'])
+        try:
+            answer = request(self.sockpath, 'parse', targets=['compiler'])
+            self.assertEqual(answer['status'], 'ok')
+            answer = request(self.sockpath, 'parse',
+                             targets=['compiler', 'gem5'])
+            self.assertEqual(answer['status'], 'error')
+        finally:
+            self.stop()
+
+    def testTimeout(self):
+        # a server, that does not answer, is given up
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.sockpath)
+        sock.listen(1)
+        try:
+            with self.assertRaises(socket.error):
+                request(self.sockpath, 'ping', timeout=0.05)
+        finally:
+            sock.close()
+
+    def testStaleSocket(self):
+        # a socket without server is replaced
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.sockpath)
+        sock.close()
+
+        self.start()
+        try:
+            self.assertEqual(request(self.sockpath, 'ping')['status'], 'ok')
+            # a second server is refused
+            server = ParseServer(self.parser, self.regenerate, self.sockpath)
+            with self.assertRaises(ValueError):
+                server.bind()
+            server.close()
+        finally:
+            self.stop()
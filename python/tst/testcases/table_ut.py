@@ -0,0 +1,161 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import time
+import unittest
+
+sys.path.append('..')
+from modelparsing.encoder import Encoder
+from modelparsing.instruction import Instruction
+from modelparsing.table import InstructionTable
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestInstructionTable(unittest.TestCase):
+    '''
+    Tests for the instruction table.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestInstructionTable, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    def genTable(self, encodings):
+        encoder = Encoder()
+        for (name, form, opc, funct3, funct7) in encodings:
+            encoder.add(name, form, opc, funct3, funct7)
+        names = encoder.names
+        return InstructionTable(names,
+                                [encoding[1] for encoding in encodings],
+                                [encoder.mask[name] for name in names],
+                                [encoder.match[name] for name in names],
+                                range(1, len(names) + 1))
+
+    def testRows(self):
+        # rows have the properties of an instruction
+        insts = self.genTable([('rtype', 'R', 0x02, 0x1, 0x2),
+                               ('itype', 'I', 0x0a, 0x3, 0xff)])
+        rtype = Instruction(1, 'R',
+                            '#define MASK_RTYPE  0xfe00707f\n',
+                            '#define MATCH_RTYPE 0x400100b\n',
+                            'rtype')
+
+        self.assertEqual(len(insts), 2)
+        for prop in ['cycles', 'form', 'mask', 'maskname', 'maskvalue',
+                     'match', 'matchname', 'matchvalue', 'name',
+                     'operands']:
+            self.assertEqual(getattr(insts[0], prop), getattr(rtype, prop))
+        self.assertEqual((insts[0].opc, insts[0].funct3, insts[0].funct7),
+                         (0x02, 0x1, 0x2))
+        self.assertEqual((insts[-1].opc, insts[-1].funct3,
+                          insts[-1].funct7), (0x0a, 0x3, 0x0))
+        self.assertEqual(insts[-1].operands, 'd,s,j')
+        self.assertEqual([inst.name for inst in insts], ['rtype', 'itype'])
+        with self.assertRaises(IndexError):
+            insts[2]
+        with self.assertRaises(AttributeError):
+            insts[0].other = 1
+
+    def testFromInstructions(self):
+        # a table of instructions, e.g. of a bundle, has the same rows
+        insts = self.genTable([('rtype', 'R', 0x02, 0x1, 0x2),
+                               ('itype', 'I', 0x0a, 0x3, 0xff)])
+        other = InstructionTable.from_instructions(insts)
+
+        self.assertEqual(other.rows('name', 'form', 'mask', 'match',
+                                    'cycles'),
+                         insts.rows('name', 'form', 'mask', 'match',
+                                    'cycles'))
+        self.assertEqual(other.rows('name', 'match', 'cycles'),
+                         [['rtype', 0x400100b, 1], ['itype', 0x302b, 2]])
+
+    def testDefinesBuiltOnce(self):
+        # the defines are built once per row
+        insts = self.genTable([('rtype', 'R', 0x02, 0x1, 0x2),
+                               ('itype', 'I', 0x0a, 0x3, 0xff)])
+
+        self.assertEqual(insts[1].mask, '#define MASK_ITYPE  0x707f\n')
+        self.assertEqual(insts[1].match, '#define MATCH_ITYPE 0x302b\n')
+        self.assertIs(insts[1].mask, insts[1].mask)
+        self.assertIs(insts[1].match, insts[1].match)
+
+    def testTableOfEncodingSpace(self):
+        # the whole custom R-Type encoding space in one table
+        encodings = [('r{}_{}_{}'.format(opc, funct3, funct7), 'R', opc,
+                      funct3, funct7)
+                     for opc in (0x02, 0x0a, 0x16, 0x1e)
+                     for funct3 in range(0, 8)
+                     for funct7 in range(0, 128)]
+        insts = self.genTable(encodings)
+
+        start = time.time()
+        rows = insts.rows('name', 'opc', 'funct3', 'funct7')
+        self.assertTrue(time.time() - start < 1.0)
+        self.assertEqual(len(rows), 4096)
+        self.assertEqual(rows[-1], ['r30_7_127', 0x1e, 0x7, 0x7f])
+        self.assertEqual(insts[-1].matchname, 'MATCH_R30_7_127')
@@ -0,0 +1,176 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import unittest
+
+from scripts import model_gen
+from scripts.ccmodel import CCModel
+from mako.template import Template
+
+sys.path.append('..')
+from modelparsing.exceptions import ConsistencyError
+from modelparsing.unity import UnityCheck
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestUnityCheck(unittest.TestCase):
+    '''
+    Tests for the batched g++ check of all models.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestUnityCheck, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    def genModel(self, name, funct3, body=None):
+        '''
+        Create a cc model, optionally with a custom body.
+        '''
+        filename = os.path.join(self.folderpath, name + '.cc')
+        ccmodel = CCModel(name, 'I', 'uint32_t', 0x02, funct3, 0xff, [])
+        content = Template(filename=model_gen).render(model=ccmodel)
+        if body is not None:
+            content = content.replace('// function definition', body)
+
+        with open(filename, 'w') as fh:
+            fh.write(content)
+
+        return filename
+
+    def testValidModels(self):
+        # all models define the same globals
+        files = [self.genModel('itype0', 0x0),
+                 self.genModel('itype1', 0x1),
+                 self.genModel('itype2', 0x2)]
+
+        self.assertEqual(UnityCheck(files).compile(), {})
+
+    def testDiagnosticLocation(self):
+        files = [self.genModel('itype0', 0x0),
+                 self.genModel('itype1', 0x1, 'uint32_t unused;')]
+
+        diags = UnityCheck(files).compile()
+
+        self.assertEqual(list(diags.keys()), [files[1]])
+
+        with open(files[1], 'r') as fh:
+            lines = fh.read().splitlines()
+        (line, severity, msg) = diags[files[1]][0]
+        self.assertEqual(severity, 'warning')
+        self.assertTrue('unused' in lines[line - 1])
+
+    def testMissingInclude(self):
+        filename = self.genModel('itype', 0x0)
+        with open(filename, 'r') as fh:
+            content = fh.read()
+        with open(filename, 'w') as fh:
+            fh.write('#include "missing.hh"\n' + content)
+
+        diags = UnityCheck([filename]).compile()
+
+        self.assertEqual(diags[filename][0][0], 1)
+        self.assertEqual(diags[filename][0][1], 'error')
+
+    def testCheck(self):
+        files = [self.genModel('itype0', 0x0),
+                 self.genModel('itype1', 0x1, 'return 0;')]
+
+        with self.assertRaises(ConsistencyError):
+            UnityCheck(files).check()
+
+    def testUnbalancedBraces(self):
+        # an unclosed brace does not move the errors to the next model
+        files = [self.genModel('itype0', 0x0, 'if (rs1) {'),
+                 self.genModel('itype1', 0x1)]
+
+        diags = UnityCheck(files).compile()
+
+        self.assertEqual(list(diags.keys()), [files[0]])
+        self.assertEqual(diags[files[0]][0][1], 'error')
+
+    def testExtraBrace(self):
+        files = [self.genModel('itype0', 0x0, 'return 0; }'),
+                 self.genModel('itype1', 0x1)]
+
+        diags = UnityCheck(files).compile()
+
+        self.assertEqual(list(diags.keys()), [files[0]])
+
+    def testIncludesNotShared(self):
+        # the include of one model does not hide a missing one of another
+        files = [self.genModel('itype0', 0x0),
+                 self.genModel('itype1', 0x1)]
+        with open(files[1], 'r') as fh:
+            content = fh.read()
+        with open(files[1], 'w') as fh:
+            fh.write(content.replace('#include <cstdint>', ''))
+
+        diags = UnityCheck(files).compile()
+
+        self.assertEqual(list(diags.keys()), [files[1]])
+        self.assertEqual(diags[files[1]][0][1], 'error')
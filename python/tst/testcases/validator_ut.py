@@ -0,0 +1,266 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import json
+import unittest
+
+from scripts import model_gen
+from scripts.ccmodel import CCModel
+from mako.template import Template
+
+sys.path.append('..')
+from modelparsing.registers import Registers
+from modelparsing.validator import Validator
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestValidator(unittest.TestCase):
+    '''
+    Tests for the validation of a whole extension set.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestValidator, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    def genModel(self, name, opc=0x02, funct3=0x0, faults=[], ftype='I'):
+        '''
+        Create a cc model in its own folder.
+        '''
+        folder = os.path.join(self.folderpath, name)
+        os.mkdir(folder)
+        filename = os.path.join(folder, name + '.cc')
+        ccmodel = CCModel(name, ftype, 'uint32_t', opc, funct3, 0x01, faults)
+        with open(filename, 'w') as fh:
+            fh.write(Template(filename=model_gen).render(model=ccmodel))
+        return filename
+
+    def genRegisters(self, lines):
+        filename = os.path.join(self.folderpath, 'registers.hh')
+        with open(filename, 'w') as fh:
+            fh.write('\n'.join(lines) + '\n')
+        return filename
+
+    def problems(self, validator, check):
+        return [(problem.file, problem.line, problem.severity)
+                for problem in validator.problems if problem.check == check]
+
+    def testValid(self):
+        self.genModel('itype0', funct3=0x0)
+        self.genModel('itype1', funct3=0x1)
+        self.genRegisters(['#ifndef REGISTERS_HH',
+                           '#define REGISTERS_HH',
+                           '#define c0 0x800',
+                           '#define c1 0xcc0',
+                           '#endif'])
+
+        validator = Validator(self.folderpath)
+
+        self.assertEqual(validator.validate(), [])
+        self.assertEqual([model.name for model in validator.models],
+                         ['itype0', 'itype1'])
+
+    def testAllProblems(self):
+        # every broken model is reported, not only the first one
+        nord = self.genModel('nord', funct3=0x1, faults=['nord'])
+        noop2 = self.genModel('noop2', funct3=0x2, faults=['noop2'])
+        invalid = self.genModel('invalid', opc=0x03, funct3=0x3)
+        self.genModel('itype', funct3=0x4)
+
+        validator = Validator(self.folderpath)
+        validator.validate()
+
+        self.assertEqual(
+            sorted(problem.file for problem in validator.errors),
+            sorted([nord, noop2, invalid]))
+        self.assertEqual([model.name for model in validator.models],
+                         ['itype'])
+
+    def testDiagnostics(self):
+        # compile errors are reported with their locations
+        filename = self.genModel('itype')
+        with open(filename, 'a') as fh:
+            fh.write('int broken = ;\n')
+
+        validator = Validator(self.folderpath)
+        validator.validate()
+
+        problems = self.problems(validator, 'diagnostics')
+        self.assertEqual(len(problems), 1)
+        self.assertEqual(problems[0][0], filename)
+        self.assertTrue(problems[0][1] > 1)
+        self.assertEqual(validator.models, [])
+
+    def testOverlap(self):
+        # models with the same encoding fields overlap, also
+        # an I-type with an R-type or the register instructions
+        self.genModel('first', funct3=0x1)
+        second = self.genModel('second', funct3=0x1)
+        third = self.genModel('third', funct3=0x1, ftype='R')
+        custreg = self.genModel('custreg', opc=0x1e, funct3=0x7)
+        self.genModel('other', funct3=0x2)
+
+        validator = Validator(self.folderpath)
+        validator.validate()
+
+        problems = self.problems(validator, 'encoding')
+        self.assertEqual(len(problems), 5)
+        self.assertEqual(sorted(set(problem[0] for problem in problems)),
+                         sorted([second, third, custreg]))
+        self.assertTrue(all(problem[1] is not None for problem in problems))
+
+    def testAllocateFreeEncodings(self):
+        # with a lock file, omitted encodings are assigned before the check
+        filename = os.path.join(self.folderpath, 'add.cc')
+        with open(filename, 'w') as fh:
+            fh.write('#include <cstdint>\n' +
+                     'void add(uint32_t Rd, uint32_t Rs1, uint32_t Rs2)\n' +
+                     '{\n    Rd = Rs1 + Rs2;\n}\n')
+        self.genModel('itype', funct3=0x0)
+        lockfile = os.path.join(self.folderpath, 'opcodes.lock')
+
+        validator = Validator(self.folderpath)
+        validator.validate()
+        self.assertEqual(self.problems(validator, 'consistency'),
+                         [(filename, 2, 'error')])
+
+        validator = Validator(self.folderpath, lockpath=lockfile)
+        self.assertEqual(validator.validate(), [])
+        # packed with the register instructions
+        self.assertEqual([(model.name, model.opc, model.funct3, model.funct7)
+                          for model in validator.models],
+                         [('add', 0x1e, 0x7, 0x0),
+                          ('itype', 0x02, 0x0, 0xff)])
+        # the lock file is only written by the parser
+        self.assertFalse(os.path.exists(lockfile))
+
+    def testRegisters(self):
+        filename = self.genRegisters(['#define REGISTERS_HH',
+                                      '#define c0 0x800',
+                                      '#define c1 0x900',
+                                      '#define c0 0x801',
+                                      '#define c2 0x800',
+                                      '#define c3 0x8000'])
+
+        validator = Validator(self.folderpath)
+        validator.validate()
+
+        self.assertEqual(self.problems(validator, 'registers'),
+                         [(filename, 3, 'error'),
+                          (filename, 4, 'error'),
+                          (filename, 5, 'error'),
+                          (filename, 6, 'warning')])
+        self.assertEqual(len(validator.errors), 3)
+
+    def testRegistersLikeParser(self):
+        # defines, that the register parser ignores, are reported
+        filename = self.genRegisters(['#define c0 0x800',
+                                      '#define  c1 0x801',
+                                      '#define c2 0x802 ',
+                                      '#define c3 C0'])
+
+        validator = Validator(self.folderpath)
+        validator.validate()
+        registers = Registers()
+        registers.parse_file(filename)
+
+        self.assertEqual(self.problems(validator, 'registers'),
+                         [(filename, 2, 'warning'),
+                          (filename, 3, 'warning')])
+        self.assertEqual(registers.regmap, {'c0': 0x800})
+
+    def testRegistersOfSeveralRoots(self):
+        roots = [os.path.join(self.folderpath, root) for root in 'ab']
+        for root in roots:
+            os.mkdir(root)
+            with open(os.path.join(root, 'registers.hh'), 'w') as fh:
+                fh.write('#define c0 0x800\n')
+
+        validator = Validator(roots)
+        validator.validate()
+
+        self.assertEqual(self.problems(validator, 'registers'),
+                         [(os.path.join(roots[1], 'registers.hh'), 1,
+                           'error')] * 2)
+
+    def testReport(self):
+        nord = self.genModel('nord', faults=['nord'])
+
+        validator = Validator(self.folderpath)
+        validator.validate()
+
+        report = validator.report().splitlines()
+        self.assertTrue(report[0].startswith(nord + ':'))
+        self.assertTrue('requires parameter Rd' in report[0])
+        self.assertEqual(report[-1], '1 error(s), 0 warning(s) in ' +
+                         '0 instruction(s)')
+
+        data = json.loads(validator.report_json())
+        self.assertEqual(data['instructions'], [])
+        self.assertEqual(data['problems'][0]['file'], nord)
+        self.assertEqual(data['problems'][0]['check'], 'consistency')
@@ -0,0 +1,205 @@
+# Copyright (c) 2018 TU Dresden
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Authors: Robert Scheffel
+
+import os
+import shutil
+import sys
+import unittest
+
+sys.path.append('..')
+from modelparsing.watcher import Monitor, Watcher, changes, snapshot
+from tst import folderpath
+sys.path.remove('..')
+
+
+class TestWatcher(unittest.TestCase):
+    '''
+    Tests for regenerating after changed model files.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TestWatcher, self).__init__(*args, **kwargs)
+        # create temp folder
+        if not os.path.isdir(folderpath):
+            os.mkdir(folderpath)
+        # test specific folder in temp folder
+        test = self._testMethodName + '/'
+        self.folderpath = os.path.join(folderpath, test)
+        if not os.path.isdir(self.folderpath):
+            os.mkdir(self.folderpath)
+
+    def __del__(self):
+        if os.path.isdir(folderpath) and not os.listdir(folderpath):
+            try:
+                os.rmdir(folderpath)
+            except OSError:
+                pass
+
+    def tearDown(self):
+        # remove generated file
+        if hasattr(self, '_outcome'):  # Python 3.4+
+            # these 2 methods have no side effects
+            result = self.defaultTestResult()
+            self._feedErrorsToResult(result, self._outcome.errors)
+        else:
+            # Python 3.2 - 3.3 or 3.0 - 3.1 and 2.7
+            result = getattr(self, '_outcomeForDoCleanups',
+                             self._resultForDoCleanups)
+
+        error = ''
+        if result.errors and result.errors[-1][0] is self:
+            error = result.errors[-1][1]
+
+        failure = ''
+        if result.failures and result.failures[-1][0] is self:
+            failure = result.failures[-1][1]
+
+        if not error and not failure:
+            shutil.rmtree(self.folderpath)
+
+    class Parser:
+        '''
+        Records forgotten files instead of parsing.
+        '''
+
+        def __init__(self, modelpath):
+            self._modelpath = modelpath
+            self.forgotten = []
+
+        def forget(self, files):
+            self.forgotten.append(files)
+
+        @property
+        def modelpath(self):
+            return self._modelpath
+
+    class Monitor:
+        '''
+        Reports prepared changes.
+        '''
+
+        def __init__(self, changed):
+            self._changed = changed
+            self.closed = False
+
+        def wait(self, timeout=None):
+            return self._changed.pop(0)
+
+        def close(self):
+            self.closed = True
+
+    def write(self, name, content):
+        path = os.path.join(self.folderpath, name)
+        with open(path, 'w') as fh:
+            fh.write(content)
+        return path
+
+    def testChanges(self):
+        old = {'a.cc': (1, 1, 1), 'b.cc': (1, 1, 2), 'c.cc': (1, 1, 3)}
+        new = {'a.cc': (1, 1, 1), 'b.cc': (2, 2, 2), 'd.cc': (1, 1, 4)}
+        self.assertEqual(changes(old, new), ['b.cc', 'c.cc', 'd.cc'])
+
+    def testSnapshot(self):
+        # only model and register files are part of a snapshot
+        model = self.write('itype.cc', 'model')
+        regs = self.write('registers.hh', 'regs')
+        self.write('README', 'text')
+
+        (files, directories, includers) = snapshot(self.folderpath)
+
+        self.assertEqual(sorted(files), [model, regs])
+        self.assertEqual(directories, [os.path.abspath(self.folderpath)])
+        self.assertEqual(includers, {})
+
+    def testSnapshotIncludes(self):
+        # headers included by the models are part of a snapshot
+        os.mkdir(os.path.join(self.folderpath, 'inc'))
+        header = self.write('inc/util.hh', '#include "nested.hh"\n')
+        nested = self.write('inc/nested.hh', '')
+        model = self.write('itype.cc', '#include "inc/util.hh"\n')
+
+        (files, directories, includers) = snapshot(self.folderpath)
+
+        self.assertEqual(sorted(files), sorted([model, header, nested]))
+        self.assertEqual(includers, {header: [model], nested: [model]})
+
+    def testPolling(self):
+        model = self.write('itype.cc', 'model')
+        monitor = Monitor(self.folderpath, interval=0.01, inotify=False)
+        self.assertFalse(monitor.inotify)
+        self.assertEqual(monitor.wait(0.05), [])
+
+        self.write('itype.cc', 'changed model')
+        added = self.write('rtype.cc', 'model')
+        self.assertEqual(monitor.wait(1), [model, added])
+        monitor.close()
+
+    def testPollingIncludes(self):
+        # a changed header changes the models including it
+        header = self.write('util.hh', '')
+        model = self.write('itype.cc', '#include "util.hh"\n')
+        self.write('rtype.cc', 'model')
+        monitor = Monitor(self.folderpath, interval=0.01, inotify=False)
+
+        self.write('util.hh', 'changed header')
+        self.assertEqual(monitor.wait(1), sorted([header, model]))
+        monitor.close()
+
+    def testInotify(self):
+        model = self.write('itype.cc', 'model')
+        os.mkdir(os.path.join(self.folderpath, 'sub'))
+        monitor = Monitor(self.folderpath)
+        if not monitor.inotify:
+            self.skipTest('inotify not available')
+        self.assertEqual(monitor.wait(0.05), [])
+
+        self.write('itype.cc', 'changed model')
+        self.assertEqual(monitor.wait(1), [model])
+
+        added = self.write('sub/rtype.cc', 'model')
+        self.assertEqual(monitor.wait(1), [added])
+        monitor.close()
+
+    def testWatcher(self):
+        # changed files are forgotten and the artifacts regenerated,
+        # also after a failed regeneration
+        parser = self.Parser(self.folderpath)
+        monitor = self.Monitor([['a.cc'], ['b.cc', 'registers.hh']])
+        calls = []
+
+        def regenerate(parser):
+            calls.append(len(parser.forgotten))
+            if len(calls) == 2:
+                raise ValueError('invalid model')
+
+        Watcher(parser, regenerate, monitor).run(rounds=2)
+
+        self.assertEqual(calls, [0, 1, 2])
+        self.assertEqual(parser.forgotten, [['a.cc'], ['b.cc',
+                                                       'registers.hh']])
+        self.assertTrue(monitor.closed)